@@ -1,8 +1,18 @@
 import os
 from celery import Celery
+from celery.signals import worker_ready
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_service.settings')
 
 app = Celery('auth_service', broker=f'redis://{os.environ.get("REDIS_HOST")}:6379/0')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+
+@worker_ready.connect
+def start_metrics_server(**kwargs) -> None:
+    from django.conf import settings
+    from prometheus_client import start_http_server
+
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT)
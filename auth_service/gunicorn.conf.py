@@ -0,0 +1,49 @@
+import glob
+import multiprocessing
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')
+
+
+def on_starting(server) -> None:
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def when_ready(server) -> None:
+    # Приложение уже загружено в мастере (preload_app), прогреваем то, что воркеры унаследуют после fork.
+    from users.warmup import preload
+    preload()
+
+
+def post_worker_init(worker) -> None:
+    from users.warmup import mark_ready, warm_up
+    if os.environ.get('WARMUP', '1') == '0':
+        mark_ready()
+        return
+    warm_up()
+
+
+def worker_exit(server, worker) -> None:
+    # Дописываем накопленные события входа до выхода воркера.
+    from users.audit import drain_login_events
+    drain_login_events()
+
+
+def child_exit(server, worker) -> None:
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы отсекать лишние запросы до сессий, CSRF и DRF.
+    'users.ratelimit.RateLimitMiddleware',
+    'users.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +91,23 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения при входе: DB_REPLICA_HOSTS=replica-1:5432,replica-2:5432.
+for index, address in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2))},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['users.db_router.PrimaryReplicaRouter']
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 2))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+# Сколько секунд после записи пользователя чтения его имени или телефона идут в основную базу.
+DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,7 +168,7 @@ AUTH_PASSWORD_VALIDATORS = [
         "OPTIONS": {"min_length": 8},
     },
     {
-        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
+        "NAME": "users.validators.BreachedPasswordValidator",
     },
     {
         "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
@@ -156,7 +176,113 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 SECRET_KEY_JWT = os.environ.get('SECRET_KEY_JWT')
+# Каталог с ключами подписи <kid>.pem (Ed25519 или RSA) и выведенными из оборота <kid>.pub.pem.
+# Пустой — токены подписываются HS256 общим SECRET_KEY_JWT.
+JWT_KEYS_DIR = os.environ.get('JWT_KEYS_DIR', '')
+# Ключ для подписи; по умолчанию последний по имени закрытый ключ.
+JWT_ACTIVE_KID = os.environ.get('JWT_ACTIVE_KID', '')
+JWKS_MAX_AGE = int(os.environ.get('JWKS_MAX_AGE', 300))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', 60))
+INTROSPECTION_MAX_TOKENS = int(os.environ.get('INTROSPECTION_MAX_TOKENS', 100))
+# /api/users/bulk/: максимум id в запросе и сколько id читается за раз при потоковой выдаче.
+USERS_BULK_MAX_IDS = int(os.environ.get('USERS_BULK_MAX_IDS', 5000))
+USERS_BULK_STREAM_CHUNK = int(os.environ.get('USERS_BULK_STREAM_CHUNK', 500))
+
+# Процессов хеширования на каждый веб-воркер. На хосте их GUNICORN_WORKERS × PASSWORD_HASHING_WORKERS,
+# поэтому по умолчанию ядра делятся между воркерами, а не отдаются каждому целиком.
+GUNICORN_WORKERS = int(os.environ.get('GUNICORN_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', max(1, (os.cpu_count() or 1) // GUNICORN_WORKERS)))
+PASSWORD_HASHING_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASHING_QUEUE_DEPTH', 64))
+
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_DB = int(os.environ.get('REDIS_DB', 0))
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 2))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 1))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', 1))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+# Узлы для кодов подтверждения, например redis://redis-otp-1:6379/0,redis://redis-otp-2:6379/0.
+# Пустой список — коды хранятся в основном Redis.
+OTP_REDIS_NODES = [url.strip() for url in os.environ.get('OTP_REDIS_NODES', '').split(',') if url.strip()]
+OTP_RING_VNODES = int(os.environ.get('OTP_RING_VNODES', 160))
+
+# users.otp_backends.RedisOTPBackend или users.otp_backends.LocalOTPBackend (один процесс, тесты).
+OTP_BACKEND = os.environ.get('OTP_BACKEND', 'users.otp_backends.RedisOTPBackend')
+OTP_LOCAL_MAX_ENTRIES = int(os.environ.get('OTP_LOCAL_MAX_ENTRIES', 100000))
+
+SMS_API_URL = os.environ.get('SMS_API_URL', 'https://lcab.smsprofi.ru/json/v1.0/sms/send/text')
+SMS_HTTP_TIMEOUT = float(os.environ.get('SMS_HTTP_TIMEOUT', 5))
+SMS_HTTP_POOL_SIZE = int(os.environ.get('SMS_HTTP_POOL_SIZE', 4))
+SMS_BATCH_SIZE = int(os.environ.get('SMS_BATCH_SIZE', 50))
+SMS_BATCH_WINDOW = float(os.environ.get('SMS_BATCH_WINDOW', 0.05))
+
+# Общий для всех воркеров лимит провайдера: сообщений в секунду и допустимый всплеск. 0 — без лимита.
+SMS_RATE_PER_SECOND = float(os.environ.get('SMS_RATE_PER_SECOND', 20))
+SMS_RATE_BURST = int(os.environ.get('SMS_RATE_BURST', SMS_BATCH_SIZE))
+SMS_RATE_MAX_WAIT = float(os.environ.get('SMS_RATE_MAX_WAIT', 2))
+SMS_RETRY_BACKOFF = float(os.environ.get('SMS_RETRY_BACKOFF', 1))
+SMS_RETRY_BACKOFF_MAX = float(os.environ.get('SMS_RETRY_BACKOFF_MAX', 30))
+SMS_MAX_RETRIES = int(os.environ.get('SMS_MAX_RETRIES', 8))
+# Сколько секунд код должен оставаться действительным после доставки, чтобы его успели ввести.
+SMS_MIN_CODE_LIFETIME = float(os.environ.get('SMS_MIN_CODE_LIFETIME', 15))
+
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))
+USER_CACHE_NEGATIVE_TTL = int(os.environ.get('USER_CACHE_NEGATIVE_TTL', 30))
+USER_CACHE_LOCAL_SIZE = int(os.environ.get('USER_CACHE_LOCAL_SIZE', 10000))
+USER_CACHE_LOCAL_TTL = float(os.environ.get('USER_CACHE_LOCAL_TTL', 5))
+
+USER_BLOOM_BITS = int(os.environ.get('USER_BLOOM_BITS', 1 << 24))
+USER_BLOOM_HASHES = int(os.environ.get('USER_BLOOM_HASHES', 7))
+USER_BLOOM_LOCAL_TTL = float(os.environ.get('USER_BLOOM_LOCAL_TTL', 5))
+
+# Лимиты вида «запросов/секунд» на IP, на логин или телефон и на весь сервис; пустая строка — без лимита.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_PATHS = ['/api/login/', '/api/register/', '/api/sms/', '/api/async/login/', '/api/async/sms/']
+RATE_LIMIT_IP = os.environ.get('RATE_LIMIT_IP', '30/60')
+RATE_LIMIT_IDENTIFIER = os.environ.get('RATE_LIMIT_IDENTIFIER', '10/60')
+RATE_LIMIT_GLOBAL = os.environ.get('RATE_LIMIT_GLOBAL', '2000/1')
+RATE_LIMIT_LOCAL_SIZE = int(os.environ.get('RATE_LIMIT_LOCAL_SIZE', 100000))
+# Заголовок с адресом клиента за прокси, например HTTP_X_FORWARDED_FOR; пустой — REMOTE_ADDR.
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER', '')
+# Сколько наших прокси дописывают адрес в этот заголовок: клиент — столько-то адресов справа.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+
+# Профилирование выбранных эндпоинтов: доля случайных запросов или запросы с заголовком
+# X-Profile: <PROFILING_TOKEN>. PROFILING_AGGREGATE > 1 — один дамп на столько запросов.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILING_URL_NAMES = os.environ.get('PROFILING_URL_NAMES', 'register,login,sms').split(',')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/auth_profiles')
+PROFILING_AGGREGATE = int(os.environ.get('PROFILING_AGGREGATE', 1))
+
+# Сколько секунд повтор того же входа получает прежний ответ; 0 — отключить.
+LOGIN_REPLAY_TTL = int(os.environ.get('LOGIN_REPLAY_TTL', 10))
+# Сколько секунд хранится ответ на запрос с заголовком Idempotency-Key.
+LOGIN_IDEMPOTENCY_KEY_TTL = int(os.environ.get('LOGIN_IDEMPOTENCY_KEY_TTL', 60))
+
+# События входа копятся в памяти процесса и пишутся в базу пакетами: по размеру или по времени.
+LOGIN_EVENTS_BATCH_SIZE = int(os.environ.get('LOGIN_EVENTS_BATCH_SIZE', 500))
+LOGIN_EVENTS_FLUSH_INTERVAL = float(os.environ.get('LOGIN_EVENTS_FLUSH_INTERVAL', 1))
+LOGIN_EVENTS_MAX_PENDING = int(os.environ.get('LOGIN_EVENTS_MAX_PENDING', 20000))
+LOGIN_EVENTS_PUT_TIMEOUT = float(os.environ.get('LOGIN_EVENTS_PUT_TIMEOUT', 0.05))
+
+PASSWORD_BLOCKLIST_PATH = os.environ.get('PASSWORD_BLOCKLIST_PATH', '')
+
+# Импорт через API: файл сохраняется в общий с воркером Celery каталог и обрабатывается задачей.
+USER_IMPORT_DIR = os.environ.get('USER_IMPORT_DIR', '/tmp/user_imports')
+USER_IMPORT_REPORT_TTL = int(os.environ.get('USER_IMPORT_REPORT_TTL', 86400))
+# Свой пул хеширования для импорта, чтобы не отнимать процессы у входа.
+USER_IMPORT_HASHING_WORKERS = int(os.environ.get('USER_IMPORT_HASHING_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
 
 CELERY_BROKER_URL = f'redis://{os.environ.get("REDIS_HOST")}:{os.environ.get("REDIS_PORT")}/0'
+# Коды подтверждения идут в отдельную очередь со своим воркером и не ждут прочие задачи.
+CELERY_TASK_ROUTES = {'users.tasks.send_sms_task': {'queue': 'otp'}}
+
+# Порт, на котором воркер Celery отдаёт свои метрики. 0 — не отдавать.
+WORKER_METRICS_PORT = int(os.environ.get('WORKER_METRICS_PORT', 0))
 
 
@@ -17,7 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from users.views import JWKSView, MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('.well-known/jwks.json', JWKSView.as_view(), name='jwks'),
 ]
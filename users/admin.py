@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import User
+from .models import LoginEvent, User
 
 admin.site.register(User)
+admin.site.register(LoginEvent)
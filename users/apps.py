@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self) -> None:
+        from django.core.signals import request_finished
+
+        from . import signals  # noqa: F401
+        from .metrics import record_redis_pool
+
+        # Каждый воркер обновляет занятость своего пула Redis после запроса, а не только при отдаче /metrics.
+        request_finished.connect(record_redis_pool, dispatch_uid='users.record_redis_pool')
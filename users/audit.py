@@ -0,0 +1,184 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .metrics import LOGIN_EVENTS
+from .models import LoginEvent, User
+from .ratelimit import client_ip
+
+
+logger = logging.getLogger(__name__)
+
+
+def login_event(request, outcome: str, user: Optional[User] = None, login: str = '') -> Dict[str, Any]:
+    return {
+        'user_id': user.pk if user is not None else None,
+        'login': str(login or '')[:150],
+        'created_at': timezone.now(),
+        # Тот же адрес клиента, что видит ограничитель частоты, а не адрес прокси.
+        'ip': client_ip(request) or None,
+        'user_agent': request.headers.get('User-Agent', '')[:256],
+        'outcome': outcome,
+    }
+
+
+class LoginEventBuffer:
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int, put_timeout: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.condition = threading.Condition()
+        # Запись в базу идёт под отдельной блокировкой, чтобы drain дождался пакета, который уже пишется.
+        self.write_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = False
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, name='login-events', daemon=True)
+        self.thread.start()
+        atexit.register(self.drain)
+
+    def submit(self, event: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        accepted = self.enqueue(event, self.put_timeout if timeout is None else timeout)
+        if accepted is None:
+            # Процесс уже завершается и фоновый поток остановлен, пишем сразу.
+            return self.flush([event])
+        return accepted
+
+    async def asubmit(self, event: Dict[str, Any]) -> bool:
+        # Цикл событий не ждёт ни места в очереди, ни записи в базу при остановке воркера.
+        accepted = self.enqueue(event, 0)
+        if accepted is None:
+            return await sync_to_async(self.flush)([event])
+        return accepted
+
+    def enqueue(self, event: Dict[str, Any], timeout: float) -> Optional[bool]:
+        # None — буфер остановлен и событие в очередь не попало.
+        with self.condition:
+            if self.stopped:
+                return None
+            if self.thread is None:
+                self.start()
+            deadline = time.monotonic() + timeout
+            # Очередь полна: запрос ждёт, пока пакет запишется, но не дольше timeout, затем событие теряется.
+            while len(self.pending) >= self.max_pending:
+                self.condition.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    LOGIN_EVENTS.labels('dropped').inc()
+                    return False
+                self.condition.wait(remaining)
+            self.pending.append(event)
+            if len(self.pending) == 1 or len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+        return True
+
+    def take(self) -> List[Dict[str, Any]]:
+        return [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.stopped and not self.pending:
+                    self.condition.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while not self.stopped and len(self.pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.stopped:
+                    return
+                batch = self.take()
+                self.condition.notify_all()
+            close_old_connections()
+            if not self.flush(batch):
+                time.sleep(self.flush_interval)
+
+    def flush(self, batch: List[Dict[str, Any]]) -> bool:
+        if not batch:
+            return True
+        with self.write_lock:
+            try:
+                self.write(batch)
+            except DatabaseError as exc:
+                logger.warning('Login events flush failed: %s', exc)
+                self.requeue(batch)
+                return False
+        LOGIN_EVENTS.labels('written').inc(len(batch))
+        return True
+
+    def requeue(self, batch: List[Dict[str, Any]]) -> None:
+        with self.condition:
+            room = max(0, self.max_pending - len(self.pending))
+            kept = batch[len(batch) - room:] if room < len(batch) else batch
+            self.pending.extendleft(reversed(kept))
+            if len(kept) < len(batch):
+                LOGIN_EVENTS.labels('dropped').inc(len(batch) - len(kept))
+
+    @staticmethod
+    def write(batch: List[Dict[str, Any]]) -> None:
+        user_ids = {event['user_id'] for event in batch if event['user_id'] is not None}
+        # Пользователя могли удалить, пока событие ждало в очереди.
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+        last_login: Dict[int, Any] = {}
+        events = []
+        for event in batch:
+            user_id = event['user_id'] if event['user_id'] in existing else None
+            events.append(LoginEvent(**{**event, 'user_id': user_id}))
+            if user_id is not None and event['outcome'] == 'ok':
+                last_login[user_id] = max(last_login.get(user_id, event['created_at']), event['created_at'])
+        with transaction.atomic():
+            LoginEvent.objects.bulk_create(events)
+            if last_login:
+                User.objects.bulk_update(
+                    [User(pk=user_id, last_login=logged_in) for user_id, logged_in in last_login.items()],
+                    ['last_login'],
+                )
+
+    def drain(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        while True:
+            with self.condition:
+                batch = self.take()
+            if not batch or not self.flush(batch):
+                return
+
+
+_login_events: Optional[LoginEventBuffer] = None
+_login_events_pid: Optional[int] = None
+_login_events_lock = threading.Lock()
+
+
+def get_login_events() -> LoginEventBuffer:
+    global _login_events, _login_events_pid
+    pid = os.getpid()
+    if _login_events is None or _login_events_pid != pid:
+        with _login_events_lock:
+            if _login_events is None or _login_events_pid != pid:
+                _login_events = LoginEventBuffer(
+                    batch_size=settings.LOGIN_EVENTS_BATCH_SIZE,
+                    flush_interval=settings.LOGIN_EVENTS_FLUSH_INTERVAL,
+                    max_pending=settings.LOGIN_EVENTS_MAX_PENDING,
+                    put_timeout=settings.LOGIN_EVENTS_PUT_TIMEOUT,
+                )
+                _login_events_pid = pid
+    return _login_events
+
+
+def drain_login_events() -> None:
+    if _login_events is not None and _login_events_pid == os.getpid():
+        _login_events.drain()
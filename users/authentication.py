@@ -0,0 +1,48 @@
+from typing import Any, Dict, Optional, Tuple
+
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from .tokens import TokenService
+
+
+class TokenPrincipal:
+    # Владелец токена без похода в базу: сервисам достаточно проверенных claims.
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims: Dict[str, Any]) -> None:
+        self.claims = claims
+        self.id = self.pk = claims.get('user_id')
+        self.username = claims.get('username') or claims.get('service', '')
+
+    def __str__(self) -> str:
+        return self.username
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    keyword = b'bearer'
+
+    def authenticate(self, request) -> Optional[Tuple[TokenPrincipal, Dict[str, Any]]]:
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Некорректный заголовок Authorization.')
+        claims = TokenService.verify_access(header[1].decode('latin-1'))
+        if claims is None:
+            raise AuthenticationFailed('Токен недействителен или истёк.')
+        return TokenPrincipal(claims), claims
+
+    def authenticate_header(self, request) -> str:
+        return 'Bearer realm="api"'
+
+
+class HasTokenScope(BasePermission):
+    # Пользовательские токены scope не содержат, поэтому проходят только токены сервисов.
+    message = 'Недостаточно прав для этого токена.'
+
+    def has_permission(self, request, view) -> bool:
+        claims = request.auth if isinstance(request.auth, dict) else {}
+        return view.required_scope in claims.get('scope', '').split()
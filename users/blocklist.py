@@ -0,0 +1,105 @@
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+
+MAGIC = b'PWBLOCK1'
+HEADER = struct.Struct('>8sQ')
+RECORD_SIZE = 8
+
+
+def password_digest(password: str) -> bytes:
+    return hashlib.sha1(password.encode('utf-8')).digest()[:RECORD_SIZE]
+
+
+class PasswordBlocklist:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.count * RECORD_SIZE:
+            self.data.close()
+            raise ValueError(f'{path} is not a password blocklist')
+
+    def record(self, index: int) -> bytes:
+        offset = HEADER.size + index * RECORD_SIZE
+        return self.data[offset:offset + RECORD_SIZE]
+
+    def contains_digest(self, digest: bytes) -> bool:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle) < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self.record(low) == digest
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains_digest(password_digest(password))
+
+    def close(self) -> None:
+        self.data.close()
+
+
+def _write_run(digests: List[bytes], directory: str) -> str:
+    digests.sort()
+    descriptor, path = tempfile.mkstemp(dir=directory, suffix='.run')
+    with os.fdopen(descriptor, 'wb') as run:
+        run.write(b''.join(digests))
+    return path
+
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, 'rb') as run:
+        while True:
+            digest = run.read(RECORD_SIZE)
+            if not digest:
+                return
+            yield digest
+
+
+def build_blocklist(digests: Iterable[bytes], output: BinaryIO, run_size: int = 5_000_000) -> int:
+    # Внешняя сортировка: память ограничена run_size записями при любом размере списка.
+    with tempfile.TemporaryDirectory() as directory:
+        runs: List[str] = []
+        chunk: List[bytes] = []
+        for digest in digests:
+            chunk.append(digest)
+            if len(chunk) >= run_size:
+                runs.append(_write_run(chunk, directory))
+                chunk = []
+        if chunk:
+            runs.append(_write_run(chunk, directory))
+
+        output.write(HEADER.pack(MAGIC, 0))
+        count = 0
+        previous: Optional[bytes] = None
+        for digest in heapq.merge(*(_read_run(run) for run in runs)):
+            if digest != previous:
+                output.write(digest)
+                previous = digest
+                count += 1
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, count))
+    return count
+
+
+_blocklists = {}
+_blocklists_lock = threading.Lock()
+
+
+def get_password_blocklist(path: str) -> PasswordBlocklist:
+    blocklist = _blocklists.get(path)
+    if blocklist is None:
+        with _blocklists_lock:
+            blocklist = _blocklists.get(path)
+            if blocklist is None:
+                blocklist = _blocklists[path] = PasswordBlocklist(path)
+    return blocklist
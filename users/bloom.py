@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional
+
+import redis
+from django.conf import settings
+from redis.client import NEVER_DECODE
+
+from .redis_client import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+for i = 1, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+redis.call('INCR', KEYS[2])
+return 1
+"""
+
+
+class UserBloomFilter:
+    KEY = 'bloom:users'
+    VERSION_KEY = 'bloom:users:version'
+
+    def __init__(self, size: int, hashes: int, local_ttl: float) -> None:
+        self.size = size
+        self.hashes = hashes
+        self.local_ttl = local_ttl
+        self.bits: Optional[bytearray] = None
+        self.version: Optional[str] = None
+        self.checked_at = float('-inf')
+        self.lock = threading.Lock()
+
+    def positions(self, value: str) -> List[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    @staticmethod
+    def set_bits(bits: bytearray, positions: Iterable[int]) -> None:
+        # Порядок битов как у SETBIT: смещение 0 — старший бит первого байта.
+        for position in positions:
+            bits[position >> 3] |= 0x80 >> (position & 7)
+
+    @staticmethod
+    def has_bits(bits: bytearray, positions: Iterable[int]) -> bool:
+        return all(bits[position >> 3] & (0x80 >> (position & 7)) for position in positions)
+
+    def empty_bits(self) -> bytearray:
+        return bytearray((self.size + 7) // 8)
+
+    def refresh(self) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.checked_at < self.local_ttl:
+                return
+            self.checked_at = now
+        try:
+            client = get_redis_client()
+            version = client.get(self.VERSION_KEY)
+            if version is None:
+                bits = None
+            elif version == self.version:
+                return
+            else:
+                raw = client.execute_command('GET', self.KEY, **{NEVER_DECODE: []}) or b''
+                bits = self.empty_bits()
+                bits[:len(raw)] = raw[:len(bits)]
+        except redis.RedisError as exc:
+            logger.warning('User bloom filter is unavailable: %s', exc)
+            bits, version = None, None
+        with self.lock:
+            self.bits, self.version = bits, version
+
+    def might_contain(self, value: str) -> bool:
+        self.refresh()
+        positions = self.positions(value)
+        with self.lock:
+            return self.bits is None or self.has_bits(self.bits, positions)
+
+    def add(self, values: Iterable[str]) -> None:
+        positions = sorted({position for value in values if value for position in self.positions(value)})
+        if not positions:
+            return
+        with self.lock:
+            if self.bits is not None:
+                self.set_bits(self.bits, positions)
+        try:
+            client = get_redis_client()
+            client.register_script(ADD_SCRIPT)(keys=[self.KEY, self.VERSION_KEY], args=positions)
+        except redis.RedisError as exc:
+            logger.warning('User bloom filter update failed: %s', exc)
+
+    def rebuild(self, values: Iterable[str]) -> int:
+        bits = self.empty_bits()
+        count = 0
+        for value in values:
+            if value:
+                self.set_bits(bits, self.positions(value))
+                count += 1
+        client = get_redis_client()
+        pipeline = client.pipeline(transaction=True)
+        pipeline.set(f'{self.KEY}:building', bytes(bits))
+        pipeline.rename(f'{self.KEY}:building', self.KEY)
+        pipeline.incr(self.VERSION_KEY)
+        pipeline.execute()
+        with self.lock:
+            self.bits = bits
+            self.version = None
+            self.checked_at = float('-inf')
+        return count
+
+
+_user_bloom: Optional[UserBloomFilter] = None
+_user_bloom_lock = threading.Lock()
+
+
+def get_user_bloom() -> UserBloomFilter:
+    global _user_bloom
+    if _user_bloom is None:
+        with _user_bloom_lock:
+            if _user_bloom is None:
+                _user_bloom = UserBloomFilter(settings.USER_BLOOM_BITS, settings.USER_BLOOM_HASHES, settings.USER_BLOOM_LOCAL_TTL)
+    return _user_bloom
@@ -0,0 +1,254 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+
+from .models import User
+from .redis_client import get_async_redis_client, get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self.lock:
+            self.entries[key] = (deadline, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+
+class UserCache:
+    FIELDS = ('id', 'username', 'phone_number', 'password', 'is_active')
+    NEGATIVE = '0'
+
+    def __init__(self) -> None:
+        self.local = LRUCache(settings.USER_CACHE_LOCAL_SIZE, settings.USER_CACHE_LOCAL_TTL)
+        self.ttl = settings.USER_CACHE_TTL
+        self.negative_ttl = settings.USER_CACHE_NEGATIVE_TTL
+
+    @staticmethod
+    def get_key(identifier: str) -> str:
+        return f'user:{identifier}'
+
+    @classmethod
+    def project(cls, user: User) -> Tuple[Any, ...]:
+        return tuple(getattr(user, field) for field in cls.FIELDS)
+
+    @classmethod
+    def build_user(cls, projection: Iterable[Any]) -> User:
+        values = dict(zip(cls.FIELDS, projection))
+        return User.from_db(
+            'default',
+            cls.FIELDS,
+            [values[field.attname] for field in User._meta.concrete_fields if field.attname in values],
+        )
+
+    @staticmethod
+    def identifiers(user: User) -> Tuple[str, str]:
+        return user.username, user.phone_number
+
+    @classmethod
+    def projection_identifiers(cls, projection: Tuple[Any, ...]) -> Tuple[str, str]:
+        return projection[cls.FIELDS.index('username')], projection[cls.FIELDS.index('phone_number')]
+
+    def decode(self, raw: Optional[str]) -> Any:
+        if raw is None:
+            return MISSING
+        if raw == self.NEGATIVE:
+            return None
+        projection = tuple(json.loads(raw))
+        for identifier in self.projection_identifiers(projection):
+            self.local.set(identifier, projection)
+        return self.build_user(projection)
+
+    def get(self, identifier: str) -> Any:
+        projection = self.local.get(identifier)
+        if projection is not None:
+            return self.build_user(projection)
+        try:
+            raw = get_redis_client().get(self.get_key(identifier))
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+            return MISSING
+        return self.decode(raw)
+
+    async def aget(self, identifier: str) -> Any:
+        projection = self.local.get(identifier)
+        if projection is not None:
+            return self.build_user(projection)
+        try:
+            raw = await get_async_redis_client().get(self.get_key(identifier))
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+            return MISSING
+        return self.decode(raw)
+
+    def entries(self, identifier: str, user: Optional[User]) -> Dict[str, Tuple[str, int]]:
+        if user is None:
+            return {self.get_key(identifier): (self.NEGATIVE, self.negative_ttl)}
+        projection = self.project(user)
+        for key in self.identifiers(user):
+            self.local.set(key, projection)
+        raw = json.dumps(projection)
+        return {self.get_key(key): (raw, self.ttl) for key in self.identifiers(user)}
+
+    def set(self, identifier: str, user: Optional[User]) -> None:
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for key, (value, ttl) in self.entries(identifier, user).items():
+                pipeline.set(key, value, ex=ttl)
+            pipeline.execute()
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+
+    async def aset(self, identifier: str, user: Optional[User]) -> None:
+        try:
+            pipeline = get_async_redis_client().pipeline(transaction=False)
+            for key, (value, ttl) in self.entries(identifier, user).items():
+                pipeline.set(key, value, ex=ttl)
+            await pipeline.execute()
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+
+    def invalidate(self, identifiers: Iterable[str]) -> None:
+        keys = [identifier for identifier in set(identifiers) if identifier]
+        for identifier in keys:
+            self.local.delete(identifier)
+        if not keys:
+            return
+        try:
+            get_redis_client().delete(*(self.get_key(identifier) for identifier in keys))
+        except redis.RedisError as exc:
+            logger.warning('User cache invalidation failed: %s', exc)
+
+
+class UserIdCache:
+    # Только имя и телефон по id, без хеша пароля: для выдачи другим сервисам.
+    # Префикс не начинается с user:, иначе логин вида id:5 попадал бы в те же ключи.
+    PREFIX = 'uid:'
+
+    def __init__(self) -> None:
+        self.local = LRUCache(settings.USER_CACHE_LOCAL_SIZE, settings.USER_CACHE_LOCAL_TTL)
+        self.ttl = settings.USER_CACHE_TTL
+
+    def get_many(self, user_ids: List[int]) -> Dict[int, Tuple[str, str]]:
+        found: Dict[int, Tuple[str, str]] = {}
+        remote: List[int] = []
+        for user_id in user_ids:
+            entry = self.local.get(user_id)
+            if entry is None:
+                remote.append(user_id)
+            else:
+                found[user_id] = entry
+        if not remote:
+            return found
+        try:
+            values = get_redis_client().mget([self.PREFIX + str(user_id) for user_id in remote])
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+            return found
+        for user_id, raw in zip(remote, values):
+            if raw is not None:
+                entry = tuple(json.loads(raw))
+                self.local.set(user_id, entry)
+                found[user_id] = entry
+        return found
+
+    def set_many(self, entries: Dict[int, Tuple[str, str]]) -> None:
+        if not entries:
+            return
+        for user_id, entry in entries.items():
+            self.local.set(user_id, entry)
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for user_id, entry in entries.items():
+                pipeline.set(self.PREFIX + str(user_id), json.dumps(entry), ex=self.ttl)
+            pipeline.execute()
+        except redis.RedisError as exc:
+            logger.warning('User cache is unavailable: %s', exc)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        keys = [user_id for user_id in set(user_ids) if user_id is not None]
+        for user_id in keys:
+            self.local.delete(user_id)
+        if not keys:
+            return
+        try:
+            get_redis_client().delete(*(self.PREFIX + str(user_id) for user_id in keys))
+        except redis.RedisError as exc:
+            logger.warning('User cache invalidation failed: %s', exc)
+
+
+_user_cache: Optional[UserCache] = None
+_user_id_cache: Optional[UserIdCache] = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache() -> UserCache:
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                _user_cache = UserCache()
+    return _user_cache
+
+
+def get_user_id_cache() -> UserIdCache:
+    global _user_id_cache
+    if _user_id_cache is None:
+        with _user_cache_lock:
+            if _user_id_cache is None:
+                _user_id_cache = UserIdCache()
+    return _user_id_cache
@@ -0,0 +1,183 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import redis
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .cache import LRUCache
+from .redis_client import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# Отставание реплики в секундах; если реплика догнала основную базу, последняя транзакция
+# могла быть давно, поэтому время воспроизведения не учитываем.
+POSTGRES_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def replica_aliases() -> List[str]:
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class ReplicaMonitor:
+    def __init__(self, aliases: List[str], interval: float, max_lag: float) -> None:
+        self.aliases = aliases
+        self.interval = interval
+        self.max_lag = max_lag
+        # alias -> отставание в секундах или None, если реплика недоступна.
+        self.lags: Dict[str, Optional[float]] = {}
+        self.checked_at = float('-inf')
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def measure(alias: str) -> float:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_QUERY if connection.vendor == 'postgresql' else 'SELECT 1')
+            value = cursor.fetchone()[0]
+        return float(value) if connection.vendor == 'postgresql' else 0.0
+
+    def refresh(self) -> None:
+        if time.monotonic() - self.checked_at < self.interval:
+            return
+        # Проверяет один поток, остальные пока пользуются прежним состоянием.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            lags: Dict[str, Optional[float]] = {}
+            for alias in self.aliases:
+                try:
+                    lags[alias] = self.measure(alias)
+                except DatabaseError as exc:
+                    logger.warning('Replica %s is unavailable: %s', alias, exc)
+                    lags[alias] = None
+            self.lags = lags
+            self.checked_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def mark_down(self, alias: str) -> None:
+        self.lags = {**self.lags, alias: None}
+
+    def choose(self) -> Optional[str]:
+        self.refresh()
+        healthy = [alias for alias, lag in self.lags.items() if lag is not None and lag <= self.max_lag]
+        return random.choice(healthy) if healthy else None
+
+
+class ReadYourWritesPins:
+    PREFIX = 'db:pin:'
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        # Свои записи процесс видит без Redis, записи других воркеров — через Redis.
+        self.local = LRUCache(10000, seconds)
+
+    def pin(self, identifiers: Iterable[str]) -> None:
+        identifiers = [identifier for identifier in identifiers if identifier]
+        if not replica_aliases():
+            return
+        for identifier in identifiers:
+            self.local.set(identifier, True)
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for identifier in identifiers:
+                pipeline.set(self.PREFIX + identifier, 1, px=int(self.seconds * 1000))
+            pipeline.execute()
+        except redis.RedisError as exc:
+            logger.warning('Read-your-writes pin failed: %s', exc)
+
+    def is_pinned(self, identifiers: Iterable[str]) -> bool:
+        identifiers = [identifier for identifier in identifiers if identifier]
+        if not identifiers:
+            return False
+        if any(self.local.get(identifier) for identifier in identifiers):
+            return True
+        try:
+            return bool(get_redis_client().exists(*(self.PREFIX + identifier for identifier in identifiers)))
+        except redis.RedisError as exc:
+            # Без Redis не узнать о недавних записях других воркеров, поэтому читаем с основной базы.
+            logger.warning('Read-your-writes check failed: %s', exc)
+            return True
+
+
+class ReplicaReads:
+    def __init__(self, identifiers: List[str]) -> None:
+        self.identifiers = identifiers
+        self.alias: Optional[str] = None
+        self.resolved = False
+
+    def resolve(self) -> Optional[str]:
+        # Решение принимается один раз на блок: все запросы внутри идут в одну базу.
+        if not self.resolved:
+            self.resolved = True
+            if not get_read_pins().is_pinned(self.identifiers):
+                self.alias = get_replica_monitor().choose()
+        return self.alias
+
+
+_replica_reads: ContextVar[Optional[ReplicaReads]] = ContextVar('replica_reads', default=None)
+
+
+@contextmanager
+def replica_reads(*identifiers: str) -> Iterator[ReplicaReads]:
+    reads = ReplicaReads([identifier for identifier in identifiers if identifier])
+    token = _replica_reads.set(reads if replica_aliases() else None)
+    try:
+        yield reads
+    except DatabaseError:
+        if reads.alias is not None:
+            get_replica_monitor().mark_down(reads.alias)
+        raise
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        reads = _replica_reads.get()
+        # Внутри транзакции на основной базе читаем оттуда же, иначе не увидим свои изменения.
+        if reads is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return reads.resolve()
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+
+_replica_monitor: Optional[ReplicaMonitor] = None
+_read_pins: Optional[ReadYourWritesPins] = None
+_singletons_lock = threading.Lock()
+
+
+def get_replica_monitor() -> ReplicaMonitor:
+    global _replica_monitor
+    if _replica_monitor is None:
+        with _singletons_lock:
+            if _replica_monitor is None:
+                _replica_monitor = ReplicaMonitor(replica_aliases(), settings.DB_REPLICA_CHECK_INTERVAL, settings.DB_REPLICA_MAX_LAG)
+    return _replica_monitor
+
+
+def get_read_pins() -> ReadYourWritesPins:
+    global _read_pins
+    if _read_pins is None:
+        with _singletons_lock:
+            if _read_pins is None:
+                _read_pins = ReadYourWritesPins(settings.DB_READ_YOUR_WRITES_SECONDS)
+    return _read_pins
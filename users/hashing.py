@@ -0,0 +1,211 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import HASHING_COMPUTE_SECONDS, HASHING_REJECTED, HASHING_WAIT_SECONDS
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис перегружен, повторите попытку позже.'
+    default_code = 'hashing_unavailable'
+    wait = 1
+
+
+def _init_worker() -> None:
+    import django
+    django.setup()
+
+
+def _timed_check_password(password: str, encoded: str) -> Tuple[bool, float]:
+    started = time.perf_counter()
+    return hashers.check_password(password, encoded), time.perf_counter() - started
+
+
+def _timed_make_password(password: str) -> Tuple[str, float]:
+    started = time.perf_counter()
+    return hashers.make_password(password), time.perf_counter() - started
+
+
+class HashingStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.compute_seconds_total = 0.0
+        self.compute_seconds_max = 0.0
+
+    def observe(self, wait: float, compute: float) -> None:
+        HASHING_WAIT_SECONDS.observe(wait)
+        HASHING_COMPUTE_SECONDS.observe(compute)
+        with self.lock:
+            self.completed += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self.compute_seconds_total += compute
+            self.compute_seconds_max = max(self.compute_seconds_max, compute)
+
+    def reject(self) -> None:
+        HASHING_REJECTED.inc()
+        with self.lock:
+            self.rejected += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            completed = self.completed or 1
+            return {
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'wait_seconds_avg': self.wait_seconds_total / completed,
+                'wait_seconds_max': self.wait_seconds_max,
+                'compute_seconds_avg': self.compute_seconds_total / completed,
+                'compute_seconds_max': self.compute_seconds_max,
+            }
+
+
+class HashingPool:
+    def __init__(self, workers: int, queue_depth: int) -> None:
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers + queue_depth) if workers > 0 else None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.executor_lock = threading.Lock()
+        self.stats = HashingStats()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            with self.executor_lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                    )
+        return self.executor
+
+    def warm_up(self) -> None:
+        if self.workers <= 0:
+            return
+        # Процессы запускаются заранее: spawn и django.setup() в каждом стоят сотни миллисекунд.
+        executor = self.get_executor()
+        wait([executor.submit(os.getpid) for _ in range(self.workers)])
+
+    def shutdown(self) -> None:
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+
+    def discard(self, executor: ProcessPoolExecutor) -> None:
+        # Процесс пула упал (OOM, kill): сломанный пул больше не принимает задач, следующая получит новый.
+        with self.executor_lock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, function: Callable[..., Tuple[Any, float]], *args: Any, block: bool = False) -> Future:
+        if self.slots is None:
+            result, compute = function(*args)
+            self.stats.observe(0.0, compute)
+            future: Future = Future()
+            future.set_result(result)
+            return future
+
+        if not self.slots.acquire(blocking=block):
+            self.stats.reject()
+            raise HashingUnavailable()
+
+        submitted = time.perf_counter()
+        outer: Future = Future()
+
+        def done(inner: Future) -> None:
+            self.slots.release()
+            error = inner.exception()
+            if isinstance(error, BrokenProcessPool):
+                self.discard(executor)
+                outer.set_exception(HashingUnavailable())
+                return
+            if error is not None:
+                outer.set_exception(error)
+                return
+            result, compute = inner.result()
+            self.stats.observe(max(time.perf_counter() - submitted - compute, 0.0), compute)
+            outer.set_result(result)
+
+        try:
+            executor = self.get_executor()
+            try:
+                inner = executor.submit(function, *args)
+            except BrokenProcessPool:
+                self.discard(executor)
+                executor = self.get_executor()
+                inner = executor.submit(function, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        inner.add_done_callback(done)
+        return outer
+
+    def check_password(self, password: str, encoded: str) -> bool:
+        return self.submit(_timed_check_password, password, encoded).result()
+
+    def make_password(self, password: str) -> str:
+        return self.submit(_timed_make_password, password).result()
+
+    def make_passwords(self, passwords: List[str]) -> List[str]:
+        # Пакетное хеширование ждёт свободный слот, но держит в работе не больше задач, чем процессов.
+        window = max(self.workers, 1)
+        hashed: List[str] = []
+        for start in range(0, len(passwords), window):
+            futures = [self.submit(_timed_make_password, password, block=True) for password in passwords[start:start + window]]
+            hashed.extend(future.result() for future in futures)
+        return hashed
+
+    async def acheck_password(self, password: str, encoded: str) -> bool:
+        return await asyncio.wrap_future(self.submit(_timed_check_password, password, encoded))
+
+    async def amake_password(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(_timed_make_password, password))
+
+
+_hashing_pool: Optional[HashingPool] = None
+_hashing_pool_pid: Optional[int] = None
+_hashing_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> HashingPool:
+    global _hashing_pool, _hashing_pool_pid
+    pid = os.getpid()
+    if _hashing_pool is None or _hashing_pool_pid != pid:
+        with _hashing_pool_lock:
+            if _hashing_pool is None or _hashing_pool_pid != pid:
+                _hashing_pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_DEPTH)
+                _hashing_pool_pid = pid
+    return _hashing_pool
+
+
+_import_hashing_pool: Optional[HashingPool] = None
+_import_hashing_pool_pid: Optional[int] = None
+
+
+def get_import_hashing_pool() -> HashingPool:
+    # Отдельный небольшой пул для импорта: пакетное хеширование не занимает слоты входа и регистрации.
+    global _import_hashing_pool, _import_hashing_pool_pid
+    pid = os.getpid()
+    if _import_hashing_pool is None or _import_hashing_pool_pid != pid:
+        with _hashing_pool_lock:
+            if _import_hashing_pool is None or _import_hashing_pool_pid != pid:
+                _import_hashing_pool = HashingPool(settings.USER_IMPORT_HASHING_WORKERS, 0)
+                _import_hashing_pool_pid = pid
+    return _import_hashing_pool
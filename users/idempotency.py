@@ -0,0 +1,158 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+import redis
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .redis_client import get_async_redis_client, get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# Возвращает сохранённое значение или занимает ключ отметкой «в работе» и возвращает nil.
+BEGIN_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    return current
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return false
+"""
+
+
+class RequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Такой запрос уже обрабатывается, повторите через секунду.'
+    default_code = 'request_in_progress'
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Ключ идемпотентности уже использован с другими данными.'
+    default_code = 'idempotency_key_reused'
+
+
+@dataclass(frozen=True)
+class ReplayKey:
+    redis_key: str
+    fingerprint: str
+    ttl: int
+
+
+class LoginReplayStore:
+    PREFIX = 'idem:login:'
+
+    @staticmethod
+    def fingerprint(data: Mapping[str, Any]) -> str:
+        # В Redis попадает только HMAC, пароль из него без SECRET_KEY не восстановить.
+        message = f"{data.get('username_or_phone', '')}\0{data.get('password', '')}".encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def key_for(self, data: Any, idempotency_key: Optional[str]) -> Optional[ReplayKey]:
+        # Тело не объект (например, JSON-массив): повторять нечего, ошибку вернёт сериализатор.
+        if not isinstance(data, Mapping):
+            return None
+        fingerprint = self.fingerprint(data)
+        if idempotency_key:
+            if not settings.LOGIN_IDEMPOTENCY_KEY_TTL:
+                return None
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]
+            return ReplayKey(f'{self.PREFIX}key:{digest}', fingerprint, settings.LOGIN_IDEMPOTENCY_KEY_TTL)
+        if not settings.LOGIN_REPLAY_TTL:
+            return None
+        return ReplayKey(f'{self.PREFIX}fp:{fingerprint}', fingerprint, settings.LOGIN_REPLAY_TTL)
+
+    @staticmethod
+    def pending(key: ReplayKey) -> str:
+        return json.dumps({'fingerprint': key.fingerprint})
+
+    @staticmethod
+    def check_stored(key: ReplayKey, stored: Optional[str]) -> Optional[Dict[str, Any]]:
+        if stored is None:
+            return None
+        entry = json.loads(stored)
+        if not hmac.compare_digest(entry['fingerprint'], key.fingerprint):
+            raise IdempotencyKeyReused()
+        if 'status' not in entry:
+            raise RequestInProgress()
+        return entry
+
+    @staticmethod
+    def entry(key: ReplayKey, status_code: int, body: Any) -> str:
+        return json.dumps({'fingerprint': key.fingerprint, 'status': status_code, 'body': body}, ensure_ascii=False)
+
+    def begin(self, key: Optional[ReplayKey]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        try:
+            script = get_redis_client().register_script(BEGIN_SCRIPT)
+            stored = script(keys=[key.redis_key], args=[self.pending(key), key.ttl])
+        except redis.RedisError as exc:
+            logger.warning('Login replay store is unavailable: %s', exc)
+            return None
+        return self.check_stored(key, stored)
+
+    def finish(self, key: Optional[ReplayKey], status_code: int, body: Any) -> None:
+        if key is None:
+            return
+        try:
+            get_redis_client().set(key.redis_key, self.entry(key, status_code, body), ex=key.ttl)
+        except redis.RedisError as exc:
+            logger.warning('Login replay store update failed: %s', exc)
+
+    def abort(self, key: Optional[ReplayKey]) -> None:
+        if key is None:
+            return
+        try:
+            get_redis_client().delete(key.redis_key)
+        except redis.RedisError as exc:
+            logger.warning('Login replay store update failed: %s', exc)
+
+    async def abegin(self, key: Optional[ReplayKey]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        try:
+            script = get_async_redis_client().register_script(BEGIN_SCRIPT)
+            stored = await script(keys=[key.redis_key], args=[self.pending(key), key.ttl])
+        except redis.RedisError as exc:
+            logger.warning('Login replay store is unavailable: %s', exc)
+            return None
+        return self.check_stored(key, stored)
+
+    async def afinish(self, key: Optional[ReplayKey], status_code: int, body: Any) -> None:
+        if key is None:
+            return
+        try:
+            await get_async_redis_client().set(key.redis_key, self.entry(key, status_code, body), ex=key.ttl)
+        except redis.RedisError as exc:
+            logger.warning('Login replay store update failed: %s', exc)
+
+    async def aabort(self, key: Optional[ReplayKey]) -> None:
+        if key is None:
+            return
+        try:
+            await get_async_redis_client().delete(key.redis_key)
+        except redis.RedisError as exc:
+            logger.warning('Login replay store update failed: %s', exc)
+
+
+_login_replay_store: Optional[LoginReplayStore] = None
+_login_replay_store_lock = threading.Lock()
+
+
+def get_login_replay_store() -> LoginReplayStore:
+    global _login_replay_store
+    if _login_replay_store is None:
+        with _login_replay_store_lock:
+            if _login_replay_store is None:
+                _login_replay_store = LoginReplayStore()
+    return _login_replay_store
@@ -0,0 +1,185 @@
+import csv
+import json
+import logging
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+import redis
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .bloom import get_user_bloom
+from .cache import get_user_cache
+from .db_router import get_read_pins
+from .hashing import get_import_hashing_pool
+from .models import User
+from .redis_client import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+class ImportRowSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    phone_number = serializers.RegexField(r'^8\d{10}$', error_messages={'invalid': 'Введен некорректный номер телефона. Формат: 8XXXXXXXXXX'})
+    password = serializers.CharField(required=False, allow_blank=False)
+    password_hash = serializers.CharField(required=False, allow_blank=False)
+
+    def validate_password_hash(self, value: str) -> str:
+        try:
+            identify_hasher(value)
+        except ValueError:
+            raise serializers.ValidationError('Неизвестный формат хеша пароля.')
+        return value
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        if bool(attrs.get('password')) == bool(attrs.get('password_hash')):
+            raise serializers.ValidationError({'password': 'Укажите либо password, либо password_hash.'})
+        if attrs.get('password'):
+            # Те же правила, что при регистрации, включая список утёкших паролей.
+            try:
+                validate_password(attrs['password'])
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError({'password': list(exc.messages)})
+        return attrs
+
+
+class UserImporter:
+    def __init__(self, chunk_size: int = 1000, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.seen_usernames: Set[str] = set()
+        self.seen_phones: Set[str] = set()
+        self.report: Dict[str, Any] = {'total': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+    @staticmethod
+    def read_rows(stream: TextIO, data_format: str) -> Iterator[Dict[str, Any]]:
+        if data_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row if isinstance(row, dict) else {}
+
+    def run(self, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+            if self.progress is not None:
+                self.progress(self.report)
+        return self.report
+
+    def fail(self, row_number: int, errors: Any) -> None:
+        self.report['failed'] += 1
+        self.report['errors'].append({'row': row_number, 'errors': errors})
+
+    def import_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        self.report['total'] += len(chunk)
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for row_number, row in chunk:
+            serializer = ImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.fail(row_number, serializer.errors)
+                continue
+            valid.append((row_number, serializer.validated_data))
+
+        usernames = {User.normalize_username(data['username']) for _, data in valid}
+        phones = {data['phone_number'] for _, data in valid}
+        taken_usernames = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        taken_phones = set(User.objects.filter(phone_number__in=phones).values_list('phone_number', flat=True))
+
+        accepted: List[Tuple[int, Dict[str, Any]]] = []
+        for row_number, data in valid:
+            username = User.normalize_username(data['username'])
+            errors: Dict[str, List[str]] = {}
+            if username in taken_usernames or username in self.seen_usernames:
+                errors['username'] = ['Пользователь с таким именем уже существует.']
+            if data['phone_number'] in taken_phones or data['phone_number'] in self.seen_phones:
+                errors['phone_number'] = ['Пользователь с таким номером уже существует.']
+            if errors:
+                self.fail(row_number, errors)
+                continue
+            self.seen_usernames.add(username)
+            self.seen_phones.add(data['phone_number'])
+            accepted.append((row_number, {**data, 'username': username}))
+
+        plain = [data['password'] for _, data in accepted if data.get('password')]
+        hashed = iter(get_import_hashing_pool().make_passwords(plain))
+        now = timezone.now()
+        users = [
+            User(
+                username=data['username'],
+                phone_number=data['phone_number'],
+                password=data.get('password_hash') or next(hashed),
+                date_joined=now,
+            )
+            for _, data in accepted
+        ]
+        self.save(list(zip((row_number for row_number, _ in accepted), users)))
+
+    def save(self, rows: List[Tuple[int, User]]) -> None:
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user in rows], batch_size=self.chunk_size)
+            created = rows
+        except IntegrityError:
+            # Параллельная регистрация успела занять имя или номер: сохраняем по одному, чтобы найти строку.
+            created = []
+            for row_number, user in rows:
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                    created.append((row_number, user))
+                except IntegrityError as exc:
+                    self.fail(row_number, {'detail': [str(exc)]})
+        self.report['created'] += len(created)
+        identifiers = [identifier for _, user in created for identifier in (user.username, user.phone_number)]
+        # bulk_create не вызывает сигналы, поэтому закрепляем чтения за основной базой здесь.
+        get_read_pins().pin(identifiers)
+        get_user_cache().invalidate(identifiers)
+        get_user_bloom().add(identifiers)
+
+
+def import_users(
+    stream: TextIO, data_format: str, chunk_size: int = 1000, progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    importer = UserImporter(chunk_size=chunk_size, progress=progress)
+    return importer.run(importer.read_rows(stream, data_format))
+
+
+class ImportJobStore:
+    PREFIX = 'import:job:'
+
+    def get_key(self, job_id: str) -> str:
+        return self.PREFIX + job_id
+
+    def set(self, job_id: str, status: str, report: Optional[Dict[str, Any]] = None) -> None:
+        # Пока импорт идёт, храним только счётчики; ошибки по строкам — в итоговом отчёте.
+        state: Dict[str, Any] = {'status': status}
+        if report is not None:
+            state.update(report if status in ('done', 'failed') else {key: report[key] for key in ('total', 'created', 'failed')})
+        try:
+            get_redis_client().set(self.get_key(job_id), json.dumps(state, ensure_ascii=False), ex=settings.USER_IMPORT_REPORT_TTL)
+        except redis.RedisError as exc:
+            logger.warning('Import job state update failed: %s', exc)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = get_redis_client().get(self.get_key(job_id))
+        return json.loads(raw) if raw is not None else None
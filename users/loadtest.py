@@ -0,0 +1,206 @@
+import asyncio
+import json
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+
+from .models import User
+from .utils import OTPManager
+
+
+class HTTPTarget:
+    def __init__(self, base_url: str, timeout: float = 30) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+
+    async def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        body = json.dumps(payload).encode() if payload is not None else b''
+        head = (
+            f'{method} {self.prefix}{path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            writer.write(head + body)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+        status_line, _, rest = raw.partition(b'\r\n')
+        _, _, response_body = rest.partition(b'\r\n\r\n')
+        return int(status_line.split(b' ', 2)[1]), response_body
+
+    async def post_json(self, path: str, payload: Dict[str, Any]) -> Tuple[int, bytes]:
+        return await self.request('POST', path, payload)
+
+    async def get(self, path: str) -> Tuple[int, bytes]:
+        return await self.request('GET', path)
+
+
+class LatencyRecorder:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+        self.started = 0.0
+        self.finished = 0.0
+
+    def add(self, latency: float, status_code: int) -> None:
+        self.latencies.append(latency)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def percentile(self, value: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(value / 100 * len(ordered))) - 1))
+        return ordered[index] * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(self.finished - self.started, 1e-9)
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'statuses': {str(code): count for code, count in sorted(self.statuses.items())},
+            'rps': len(self.latencies) / elapsed,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
+
+
+async def run_requests(
+    recorder: LatencyRecorder,
+    calls: Iterable[Callable[[], Awaitable[Tuple[int, bytes]]]],
+    concurrency: int,
+) -> List[Tuple[int, bytes]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(call: Callable[[], Awaitable[Tuple[int, bytes]]]) -> Tuple[int, bytes]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status_code, body = await call()
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                recorder.errors += 1
+                return 0, b''
+            recorder.add(time.perf_counter() - started, status_code)
+            return status_code, body
+
+    recorder.started = time.perf_counter()
+    results = await asyncio.gather(*(timed(call) for call in calls))
+    recorder.finished = time.perf_counter()
+    return list(results)
+
+
+def format_summary(name: str, summary: Dict[str, Any]) -> str:
+    return (
+        f"{name:<14} {summary['requests']:>7} req  {summary['errors']:>5} err  "
+        f"{summary['rps']:>9.1f} rps  p50 {summary['p50_ms']:>8.2f} ms  "
+        f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  {summary['statuses']}"
+    )
+
+
+def rate_limited_endpoints(summaries: Dict[str, Dict[str, Any]], max_share: float) -> List[str]:
+    # Все запросы идут с одного IP: при включённом RATE_LIMIT_IP стенд быстро отвечает одними 429,
+    # и задержки показывают скорость отказа, а не входа.
+    return [
+        name for name, summary in summaries.items()
+        if summary['requests'] and summary['statuses'].get('429', 0) / summary['requests'] > max_share
+    ]
+
+
+def rate_limit_error(endpoints: List[str], max_share: float) -> str:
+    return (
+        f"Больше {max_share:.0%} ответов 429 ({', '.join(endpoints)}): стенд ограничивает частоту запросов. "
+        'Запустите его с RATE_LIMIT_ENABLED=0 или с пустыми RATE_LIMIT_IP и RATE_LIMIT_IDENTIFIER.'
+    )
+
+
+def compare_summaries(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    # Относительное изменение: для rps рост — улучшение, для задержек — регрессия.
+    return {
+        metric: (current[metric] - baseline[metric]) / baseline[metric] if baseline.get(metric) else None
+        for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms')
+    }
+
+
+def phone_numbers(prefix: str, count: int) -> List[str]:
+    phone_base = 80000000000 + zlib.crc32(prefix.encode()) % 90 * 100000000
+    return [str(phone_base + index) for index in range(count)]
+
+
+def seed_users(prefix: str, count: int, password: str) -> List[str]:
+    User.objects.filter(username__startswith=prefix).delete()
+    encoded = make_password(password)
+    users = [
+        User(username=f'{prefix}{index}', phone_number=phone_number, password=encoded)
+        for index, phone_number in enumerate(phone_numbers(prefix, count))
+    ]
+    User.objects.bulk_create(users, batch_size=1000)
+    return [user.username for user in users]
+
+
+def read_codes(usernames: List[str]) -> Dict[str, str]:
+    manager = OTPManager()
+    return {username: manager.get_otp(username) for username in usernames}
+
+
+def cleanup_users(usernames: List[str]) -> None:
+    manager = OTPManager()
+    for username in usernames:
+        manager.delete_otp(username)
+    User.objects.filter(username__in=usernames).delete()
+
+
+class StubSMSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.payloads.append(payload)
+        self.server.connections.add(self.client_address)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({
+            'messages': [{'recipient': message['recipient'], 'status': 'ok'} for message in payload['messages']]
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class StubSMSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0, status: int = 200) -> None:
+        super().__init__((host, port), StubSMSHandler)
+        self.delay = delay
+        self.status = status
+        self.payloads: List[Dict[str, Any]] = []
+        self.connections = set()
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_port}/sms/send/text'
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.loadtest import (
+    HTTPTarget, LatencyRecorder, StubSMSServer, cleanup_users, compare_summaries, format_summary, phone_numbers,
+    rate_limit_error, rate_limited_endpoints, read_codes, run_requests, seed_users,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест /api/register/, /api/login/ и /api/sms/ против запущенного стенда '
+        '(реальные Postgres и Redis, заглушка SMS-провайдера). Результаты сохраняются в JSON.'
+    )
+
+    PASSWORD = 'Bench-auth-password-2024'
+    ENDPOINTS = ('register', 'login', 'sms')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+        parser.add_argument('--users', type=int, default=500, help='Сколько пользователей создать для входа')
+        parser.add_argument('--registrations', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--prefix', default='bench_auth')
+        parser.add_argument('--output', help='Файл результатов (по умолчанию bench_results/auth-<время>.json)')
+        parser.add_argument('--compare', help='Файл результатов прошлого запуска для сравнения')
+        parser.add_argument('--max-regression', type=float, default=0.2, help='Допустимый рост p99 при --compare')
+        parser.add_argument('--sms-stub-port', type=int, help='Поднять заглушку SMS-провайдера на этом порту (SMS_API_URL стенда)')
+        parser.add_argument('--sms-stub-delay', type=float, default=0.0)
+        parser.add_argument('--max-rate-limited', type=float, default=0.05, help='Допустимая доля ответов 429')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        stub = None
+        if options['sms_stub_port'] is not None:
+            stub = StubSMSServer(host='0.0.0.0', port=options['sms_stub_port'], delay=options['sms_stub_delay'])
+            threading.Thread(target=stub.serve_forever, daemon=True).start()
+            self.stdout.write(f'SMS stub: {stub.url}')
+
+        prefix = options['prefix']
+        usernames = seed_users(f'{prefix}_login_', options['users'], self.PASSWORD)
+        registered = [f"{prefix}_register_{index}" for index in range(options['registrations'])]
+        try:
+            results = asyncio.run(self.run_flows(HTTPTarget(options['base_url']), usernames, registered, options))
+        finally:
+            cleanup_users(usernames + registered)
+            if stub is not None:
+                stub.shutdown()
+                stub.server_close()
+
+        for endpoint in self.ENDPOINTS:
+            self.stdout.write(format_summary(endpoint, results[endpoint]))
+
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'base_url': options['base_url'],
+            'users': options['users'],
+            'registrations': options['registrations'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }
+        output = options['output'] or os.path.join(
+            'bench_results', f"auth-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        self.stdout.write(f'results: {output}')
+
+        limited = rate_limited_endpoints(results, options['max_rate_limited'])
+        if limited:
+            raise CommandError(rate_limit_error(limited, options['max_rate_limited']))
+        if options['compare']:
+            self.compare(options['compare'], results, options['max_regression'])
+
+    async def run_flows(self, target: HTTPTarget, usernames: List[str], registered: List[str], options: Dict[str, Any]) -> Dict[str, Any]:
+        concurrency = options['concurrency']
+        register = LatencyRecorder('register')
+        phones = phone_numbers(f"{options['prefix']}_register_", len(registered))
+        await run_requests(register, [
+            (lambda username=username, phone_number=phone_number: target.post_json('/register/', {
+                'username': username,
+                'password': self.PASSWORD,
+                'password2': self.PASSWORD,
+                'phone_number': phone_number,
+            }))
+            for username, phone_number in zip(registered, phones)
+        ], concurrency)
+
+        login = LatencyRecorder('login')
+        await run_requests(login, [
+            (lambda username=username: target.post_json('/login/', {
+                'username_or_phone': username,
+                'password': self.PASSWORD,
+            }))
+            for username in usernames
+        ], concurrency)
+
+        codes = read_codes(usernames)
+        sms = LatencyRecorder('sms')
+        await run_requests(sms, [
+            (lambda username=username: target.post_json('/sms/', {
+                'username_or_phone': username,
+                'sms_code': codes[username],
+            }))
+            for username in usernames if codes.get(username)
+        ], concurrency)
+        return {'register': register.summary(), 'login': login.summary(), 'sms': sms.summary()}
+
+    def compare(self, path: str, results: Dict[str, Any], max_regression: float) -> None:
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = []
+        for endpoint in self.ENDPOINTS:
+            if endpoint not in baseline:
+                continue
+            changes = compare_summaries(baseline[endpoint], results[endpoint])
+            self.stdout.write(f'{endpoint:<14} ' + '  '.join(
+                f'{metric} {change:+.1%}' if change is not None else f'{metric} n/a'
+                for metric, change in changes.items()
+            ))
+            if changes['p99_ms'] is not None and changes['p99_ms'] > max_regression:
+                regressions.append(endpoint)
+        if regressions:
+            raise CommandError(f"p99 вырос больше чем на {max_regression:.0%}: {', '.join(regressions)}")
@@ -0,0 +1,45 @@
+import time
+from typing import Any, Callable, Dict
+
+from django.core.management.base import BaseCommand
+
+from users.signing import KeyRing, SigningKey, generate_private_key
+from users.tokens import TokenService
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость подписи и проверки токенов для HS256, RS256 и EdDSA'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--algorithms', nargs='+', choices=['HS256', 'RS256', 'EdDSA'], default=['HS256', 'RS256', 'EdDSA'])
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        claims = {'user_id': 1, 'username': 'bench_jwt', 'phone_number': '80000000000'}
+        for algorithm in options['algorithms']:
+            keyring = self.make_keyring(algorithm)
+            token = keyring.sign(self.payload(claims))
+            sign = self.measure(lambda: keyring.sign(self.payload(claims)), options['iterations'])
+            verify = self.measure(lambda: keyring.decode(token, issuer='auth_service'), options['iterations'])
+            self.stdout.write(
+                f'{algorithm:>6}: sign {sign:>9.0f}/s, verify {verify:>9.0f}/s, token {len(token)} bytes'
+            )
+
+    @staticmethod
+    def make_keyring(algorithm: str) -> KeyRing:
+        if algorithm == 'HS256':
+            return KeyRing({}, secret='bench-jwt-secret-' + '0' * 32)
+        private_key = generate_private_key(algorithm)
+        return KeyRing({'bench': SigningKey('bench', algorithm, private_key.public_key(), private_key)})
+
+    @staticmethod
+    def payload(claims: Dict[str, Any]) -> Dict[str, Any]:
+        return {**claims, 'exp': int(time.time()) + int(TokenService.ACCESS_TOKEN_LIFETIME.total_seconds()),
+                'iss': 'auth_service', 'token_type': 'access'}
+
+    @staticmethod
+    def measure(operation: Callable[[], Any], iterations: int) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        return iterations / (time.perf_counter() - started)
@@ -0,0 +1,102 @@
+import statistics
+import time
+from typing import Any, Dict, List
+
+import redis
+from django.core.management.base import BaseCommand
+
+from users.otp_backends import RedisOTPBackend
+from users.redis_client import get_redis_pool
+from users.utils import OTPManager, OTPSendError
+
+
+class CountingRedis(redis.Redis):
+    round_trips = 0
+
+    def execute_command(self, *args, **options):
+        self.round_trips += 1
+        return super().execute_command(*args, **options)
+
+
+class LegacyOTPFlow:
+    def __init__(self, client: CountingRedis, manager: OTPManager) -> None:
+        self.client = client
+        self.manager = manager
+
+    def login(self, username: str, otp: str) -> None:
+        key = f'sms_limit:{username}'
+        sent = self.client.incr(key)
+        if sent == 1:
+            self.client.expire(key, self.manager.sms_interval)
+        if sent > self.manager.sms_limit:
+            raise OTPSendError(f'Новый код можно получить через {self.client.ttl(key)} сек.')
+        self.client.set(username, otp, ex=self.manager.otp_expire)
+
+    def verify(self, username: str, otp: str) -> bool:
+        if self.client.get(username) != otp:
+            return False
+        self.client.delete(username)
+        return True
+
+
+class CountingRedisBackend(RedisOTPBackend):
+    def __init__(self, client: CountingRedis) -> None:
+        self.client = client
+
+    def client_for(self, key: str) -> CountingRedis:
+        return self.client
+
+
+class ScriptedOTPFlow:
+    def __init__(self, client: CountingRedis, manager: OTPManager) -> None:
+        self.manager = OTPManager(backend=CountingRedisBackend(client))
+
+    def login(self, username: str, otp: str) -> None:
+        self.manager.save_otp(username, otp)
+
+    def verify(self, username: str, otp: str) -> bool:
+        return self.manager.verify_otp(username, otp)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает число обращений к Redis и задержку выдачи/проверки OTP'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--prefix', default='bench-otp')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        iterations: int = options['iterations']
+        for name, flow_class in (('legacy', LegacyOTPFlow), ('scripted', ScriptedOTPFlow)):
+            client = CountingRedis(connection_pool=get_redis_pool())
+            flow = flow_class(client, OTPManager())
+            result = self.run_flow(flow, client, f"{options['prefix']}:{name}", iterations)
+            self.stdout.write(
+                f"{name:>9}: {result['round_trips']:.1f} round trips/login, "
+                f"mean {result['mean_ms']:.3f} ms, p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms"
+            )
+
+    def run_flow(self, flow: Any, client: CountingRedis, prefix: str, iterations: int) -> Dict[str, float]:
+        latencies: List[float] = []
+        for index in range(iterations):
+            username = f'{prefix}:{index}'
+            started = time.perf_counter()
+            flow.login(username, '1234')
+            flow.verify(username, '1234')
+            latencies.append((time.perf_counter() - started) * 1000)
+        round_trips = client.round_trips / iterations
+        self.cleanup(client, prefix)
+        latencies.sort()
+        return {
+            'round_trips': round_trips,
+            'mean_ms': statistics.fmean(latencies),
+            'p50_ms': latencies[len(latencies) // 2],
+            'p99_ms': latencies[int(len(latencies) * 0.99) - 1],
+        }
+
+    @staticmethod
+    def cleanup(client: redis.Redis, prefix: str) -> None:
+        for pattern in (f'{prefix}:*', f'sms_limit:{prefix}:*', f'otp:{{{prefix}:*'):
+            keys = list(client.scan_iter(match=pattern, count=1000))
+            for start in range(0, len(keys), 1000):
+                client.delete(*keys[start:start + 1000])
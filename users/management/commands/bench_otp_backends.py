@@ -0,0 +1,57 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from users.otp_backends import BaseOTPBackend
+from users.utils import OTPManager
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность хранилищ кодов подтверждения (операций в секунду)'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--backends', nargs='+',
+            default=['users.otp_backends.LocalOTPBackend', 'users.otp_backends.RedisOTPBackend'],
+        )
+        parser.add_argument('--iterations', type=int, default=10000)
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--prefix', default='bench-otp-backend')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        for path in options['backends']:
+            backend = import_string(path)()
+            result = self.run_backend(backend, options['prefix'], options['iterations'], options['threads'])
+            self.stdout.write(
+                f"{path.rsplit('.', 1)[-1]:>16}: " + '  '.join(f'{operation} {rate:,.0f} ops/s' for operation, rate in result.items())
+            )
+
+    def run_backend(self, backend: BaseOTPBackend, prefix: str, iterations: int, threads: int) -> Dict[str, float]:
+        keys = [[OTPManager.get_key(f'{prefix}:{thread}:{index}') for index in range(iterations)] for thread in range(threads)]
+        operations = {
+            'issue': lambda key: backend.issue(key, '1234', 120, 0, 1),
+            'get': backend.get,
+            'consume': lambda key: backend.consume(key, '1234'),
+            'delete': backend.delete,
+        }
+        rates: Dict[str, float] = {}
+        for name, operation in operations.items():
+            rates[name] = threads * iterations / self.timed(operation, keys)
+        return rates
+
+    @staticmethod
+    def timed(operation, keys: List[List[str]]) -> float:
+        def worker(chunk: List[str]) -> None:
+            for key in chunk:
+                operation(key)
+
+        workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in keys]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started
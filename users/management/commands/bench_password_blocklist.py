@@ -0,0 +1,75 @@
+import multiprocessing
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.management.base import BaseCommand
+
+from users.blocklist import PasswordBlocklist
+
+
+def memory_usage() -> Dict[str, int]:
+    usage = {'rss_kb': 0, 'rss_anon_kb': 0, 'rss_file_kb': 0}
+    fields = {'VmRSS:': 'rss_kb', 'RssAnon:': 'rss_anon_kb', 'RssFile:': 'rss_file_kb'}
+    with open('/proc/self/status') as status:
+        for line in status:
+            parts = line.split()
+            if parts and parts[0] in fields:
+                usage[fields[parts[0]]] = int(parts[1])
+    return usage
+
+
+def measure(lookup, passwords: List[str]) -> Dict[str, float]:
+    latencies = []
+    for password in passwords:
+        started = time.perf_counter()
+        lookup(password)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+    latencies.sort()
+    return {
+        'mean_us': statistics.fmean(latencies),
+        'p50_us': latencies[len(latencies) // 2],
+        'p99_us': latencies[max(0, int(len(latencies) * 0.99) - 1)],
+    }
+
+
+def run_worker(kind: str, path: str, passwords: List[str]) -> Dict[str, Any]:
+    before = memory_usage()
+    if kind == 'mmap':
+        blocklist = PasswordBlocklist(path)
+        result = measure(blocklist.__contains__, passwords)
+    else:
+        validator = CommonPasswordValidator()
+        result = measure(validator.passwords.__contains__, passwords)
+    after = memory_usage()
+    result.update({f'{name}_delta': after[name] - before[name] for name in after})
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку и память на воркер: mmap-файл утечек и стандартный CommonPasswordValidator'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('path', help='Файл, собранный build_password_blocklist')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--lookups', type=int, default=100_000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        sample = random.Random(0)
+        passwords = [f'candidate-{sample.getrandbits(48):x}' for _ in range(options['lookups'])]
+        blocklist = PasswordBlocklist(options['path'])
+        self.stdout.write(f"{options['path']}: {blocklist.count} entries")
+        blocklist.close()
+
+        context = multiprocessing.get_context('spawn')
+        for kind in ('common', 'mmap'):
+            with context.Pool(options['workers']) as pool:
+                results = pool.starmap(run_worker, [(kind, options['path'], passwords)] * options['workers'])
+            for index, result in enumerate(results):
+                self.stdout.write(
+                    f"{kind:>6} worker {index}: p50 {result['p50_us']:.2f} us, p99 {result['p99_us']:.2f} us, "
+                    f"rss +{result['rss_kb_delta']} kB (anon +{result['rss_anon_kb_delta']} kB, "
+                    f"shared file +{result['rss_file_kb_delta']} kB)"
+                )
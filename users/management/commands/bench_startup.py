@@ -0,0 +1,102 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.loadtest import HTTPTarget, cleanup_users, seed_users
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время запуска serve и время до первого быстрого запроса с прогревом и без'
+
+    PASSWORD = 'bench_startup_password'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=40)
+        parser.add_argument('--startup-timeout', type=float, default=60)
+        parser.add_argument('--modes', nargs='+', choices=['warm', 'cold'], default=['cold', 'warm'])
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        usernames = seed_users('bench_startup_', 1, self.PASSWORD)
+        try:
+            for mode in options['modes']:
+                result = self.run_mode(mode, usernames[0], options)
+                self.stdout.write(
+                    f"{mode:>5}: ready in {result['startup_s']:.2f} s, first request {result['first_ms']:.1f} ms, "
+                    f"steady p50 {result['steady_p50_ms']:.1f} ms, first fast request after {result['time_to_fast_s']:.2f} s"
+                )
+        finally:
+            cleanup_users(usernames)
+
+    @staticmethod
+    def free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def run_mode(self, mode: str, username: str, options: Dict[str, Any]) -> Dict[str, float]:
+        port = self.free_port()
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'serve',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+        ]
+        if mode == 'cold':
+            command.append('--no-warmup')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'auth_service.settings')}
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            target = HTTPTarget(f'http://127.0.0.1:{port}/api')
+            startup = asyncio.run(self.wait_ready(target, options['startup_timeout'], options['workers']))
+            timings = asyncio.run(self.drive(target, username, options['requests'], options['workers']))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        latencies = [latency for _, latency in timings]
+        steady = statistics.median(latencies[len(latencies) // 2:])
+        fast_at = next((finished for finished, latency in timings if latency <= steady * 2), timings[-1][0])
+        return {
+            'startup_s': startup - started,
+            'first_ms': latencies[0] * 1000,
+            'steady_p50_ms': steady * 1000,
+            'time_to_fast_s': fast_at - started,
+        }
+
+    @staticmethod
+    async def wait_ready(target: HTTPTarget, timeout: float, workers: int) -> float:
+        deadline = time.perf_counter() + timeout
+        ready = 0
+        # Готовность каждого воркера видна только через его собственный ответ, поэтому ждём несколько подряд.
+        while ready < workers:
+            if time.perf_counter() > deadline:
+                raise CommandError('Сервер не стал готов за отведённое время')
+            try:
+                status_code, _ = await target.get('/ready/')
+            except OSError:
+                status_code = 0
+            ready = ready + 1 if status_code == 200 else 0
+            if status_code != 200:
+                await asyncio.sleep(0.05)
+        return time.perf_counter()
+
+    async def drive(self, target: HTTPTarget, username: str, count: int, concurrency: int) -> List[Tuple[float, float]]:
+        timings: List[Tuple[float, float]] = []
+        payload = {'username_or_phone': username, 'password': f'{self.PASSWORD}-wrong'}
+        for start in range(0, count, concurrency):
+            async def timed() -> None:
+                sent = time.perf_counter()
+                await target.post_json('/login/', payload)
+                finished = time.perf_counter()
+                timings.append((finished, finished - sent))
+            await asyncio.gather(*(timed() for _ in range(min(concurrency, count - start))))
+        timings.sort()
+        return timings
@@ -0,0 +1,106 @@
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+from users.services import UserService
+
+
+PHONE_BASE = 80000000000
+
+
+def legacy_lookup(username_or_phone: str) -> Optional[User]:
+    with transaction.atomic():
+        return User.objects.filter(Q(username=username_or_phone) | Q(phone_number=username_or_phone)).first()
+
+
+class Command(BaseCommand):
+    help = 'Показывает план и задержку поиска пользователя по имени или телефону до и после оптимизации'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--users', type=int, default=2_000_000)
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--prefix', default='bench_lookup_')
+        parser.add_argument('--cleanup', action='store_true')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        prefix: str = options['prefix']
+        count: int = options['users']
+        self.seed(prefix, count)
+
+        sample = random.Random(0)
+        identifiers = [
+            str(PHONE_BASE + index) if index % 2 else f'{prefix}{index}'
+            for index in (sample.randint(1, count) for _ in range(options['iterations']))
+        ]
+
+        self.stdout.write('== legacy plan ==')
+        self.stdout.write(self.explain(User.objects.filter(Q(username=identifiers[0]) | Q(phone_number=identifiers[0])).order_by('pk')[:1]))
+        self.stdout.write('== planned lookups ==')
+        for identifier in (str(PHONE_BASE + 1), f'{prefix}2'):
+            lookup = UserService.plan_user_lookup(identifier)[0]
+            self.stdout.write(self.explain(User.objects.only(*UserService.LOOKUP_FIELDS).filter(**lookup)))
+
+        for name, function in (('legacy', legacy_lookup), ('planned', UserService.find_user)):
+            result = self.measure(function, identifiers)
+            self.stdout.write(
+                f"{name:>8}: mean {result['mean_ms']:.3f} ms, p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms"
+            )
+
+        if options['cleanup']:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {User._meta.db_table} WHERE username LIKE %s', [f'{prefix}%'])
+
+    @staticmethod
+    def explain(queryset) -> str:
+        if connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    @staticmethod
+    def measure(function: Callable[[str], Optional[User]], identifiers: List[str]) -> Dict[str, float]:
+        latencies = []
+        for identifier in identifiers:
+            started = time.perf_counter()
+            function(identifier)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        return {
+            'mean_ms': statistics.fmean(latencies),
+            'p50_ms': latencies[len(latencies) // 2],
+            'p99_ms': latencies[max(0, int(len(latencies) * 0.99) - 1)],
+        }
+
+    def seed(self, prefix: str, count: int) -> None:
+        existing = User.objects.filter(username__startswith=prefix).count()
+        if existing >= count:
+            return
+        password = make_password('bench_lookup_password')
+        self.stdout.write(f'seeding users {existing + 1}..{count}')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    INSERT INTO {User._meta.db_table}
+                        (password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined, phone_number)
+                    SELECT %s, false, %s || g, '', '', '', false, true, now(), (%s + g)::text
+                    FROM generate_series(%s, %s) AS g
+                    ON CONFLICT DO NOTHING
+                    ''',
+                    [password, prefix, PHONE_BASE, existing + 1, count],
+                )
+                cursor.execute(f'ANALYZE {User._meta.db_table}')
+            return
+        now = timezone.now()
+        for start in range(existing + 1, count + 1, 10000):
+            User.objects.bulk_create([
+                User(username=f'{prefix}{index}', phone_number=str(PHONE_BASE + index), password=password, date_joined=now)
+                for index in range(start, min(start + 10000, count + 1))
+            ], ignore_conflicts=True)
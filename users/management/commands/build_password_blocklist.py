@@ -0,0 +1,38 @@
+import os
+from typing import Any, Iterator, TextIO
+
+from django.core.management.base import BaseCommand
+
+from users.blocklist import RECORD_SIZE, build_blocklist, password_digest
+
+
+class Command(BaseCommand):
+    help = 'Собирает отсортированный файл хешей паролей из утечек для BreachedPasswordValidator'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('source', help='Текстовый файл: один пароль на строку')
+        parser.add_argument('output', help='Куда записать файл (PASSWORD_BLOCKLIST_PATH)')
+        parser.add_argument('--sha1', action='store_true', help='Строки уже содержат SHA-1 в hex (формат "HASH:count")')
+        parser.add_argument('--run-size', type=int, default=5_000_000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        temporary = f"{options['output']}.tmp"
+        with open(options['source'], encoding='utf-8', errors='ignore') as source, open(temporary, 'wb') as output:
+            digests = self.sha1_digests(source) if options['sha1'] else self.password_digests(source)
+            count = build_blocklist(digests, output, run_size=options['run_size'])
+        os.replace(temporary, options['output'])
+        self.stdout.write(f"{count} entries, {os.path.getsize(options['output'])} bytes")
+
+    @staticmethod
+    def password_digests(source: TextIO) -> Iterator[bytes]:
+        for line in source:
+            password = line.rstrip('\r\n')
+            if password:
+                yield password_digest(password)
+
+    @staticmethod
+    def sha1_digests(source: TextIO) -> Iterator[bytes]:
+        for line in source:
+            prefix = line[:RECORD_SIZE * 2]
+            if len(prefix) == RECORD_SIZE * 2:
+                yield bytes.fromhex(prefix)
@@ -0,0 +1,47 @@
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.signing import PRIVATE_SUFFIX, PUBLIC_SUFFIX, generate_private_key, private_key_pem, public_key_pem
+
+
+class Command(BaseCommand):
+    help = 'Создаёт новый ключ подписи токенов и выводит из оборота прежние'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--algorithm', choices=['EdDSA', 'RS256'], default='EdDSA')
+        parser.add_argument('--kid', help='По умолчанию текущее время, чтобы новый ключ был последним по имени')
+        parser.add_argument('--keys-dir', default=settings.JWT_KEYS_DIR)
+        parser.add_argument('--retire', action='store_true', help='Оставить от прежних ключей только открытую часть')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        keys_dir = options['keys_dir']
+        if not keys_dir:
+            raise CommandError('Укажите --keys-dir или JWT_KEYS_DIR')
+        os.makedirs(keys_dir, exist_ok=True)
+        kid = options['kid'] or datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        path = os.path.join(keys_dir, kid + PRIVATE_SUFFIX)
+        if os.path.exists(path):
+            raise CommandError(f'Ключ {kid} уже существует')
+
+        private_key = generate_private_key(options['algorithm'])
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(private_key_pem(private_key))
+
+        if options['retire']:
+            for name in sorted(os.listdir(keys_dir)):
+                if not name.endswith(PRIVATE_SUFFIX) or name.endswith(PUBLIC_SUFFIX) or name == kid + PRIVATE_SUFFIX:
+                    continue
+                old_path = os.path.join(keys_dir, name)
+                with open(old_path, 'rb') as file:
+                    old_key = serialization.load_pem_private_key(file.read(), password=None)
+                with open(os.path.join(keys_dir, name[:-len(PRIVATE_SUFFIX)] + PUBLIC_SUFFIX), 'wb') as file:
+                    file.write(public_key_pem(old_key.public_key()))
+                os.remove(old_path)
+                self.stdout.write(f'retired {name[:-len(PRIVATE_SUFFIX)]}')
+        self.stdout.write(f'{kid} ({options["algorithm"]}) -> {path}')
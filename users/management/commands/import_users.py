@@ -0,0 +1,35 @@
+import json
+import sys
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import import_users
+
+
+class Command(BaseCommand):
+    help = 'Импортирует пользователей из NDJSON или CSV (username, phone_number, password или password_hash)'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('path', help='Путь к файлу или "-" для чтения из stdin')
+        parser.add_argument('--format', choices=['ndjson', 'csv'])
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--report', help='Куда записать отчёт об ошибках в формате JSON')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: str = options['path']
+        data_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            report = import_users(stream, data_format, chunk_size=options['chunk_size'])
+
+        self.stdout.write(f"total {report['total']}, created {report['created']}, failed {report['failed']}")
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, ensure_ascii=False, indent=2)
+        else:
+            for error in report['errors']:
+                self.stdout.write(json.dumps(error, ensure_ascii=False))
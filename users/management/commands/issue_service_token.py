@@ -0,0 +1,19 @@
+from datetime import timedelta
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from users.tokens import TokenService
+
+
+class Command(BaseCommand):
+    help = 'Выпускает access-токен для другого сервиса с заданными scope'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('service', help='Имя сервиса, попадает в claims sub и service')
+        parser.add_argument('--scope', action='append', required=True, help='Например users:bulk; можно несколько раз')
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        token = TokenService.issue_service_token(options['service'], options['scope'], timedelta(days=options['days']))
+        self.stdout.write(token)
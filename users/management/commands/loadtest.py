@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.loadtest import (
+    HTTPTarget, LatencyRecorder, cleanup_users, format_summary, rate_limit_error, rate_limited_endpoints, read_codes,
+    run_requests, seed_users,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность синхронных (/api/login/, /api/sms/) '
+        'и асинхронных (/api/async/login/, /api/async/sms/) представлений. '
+        'Запускать против стенда с заглушкой SMS-провайдера.'
+    )
+
+    PASSWORD = 'loadtest_password'
+    MODES = {'sync': '', 'async': '/async'}
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--modes', nargs='+', choices=sorted(self.MODES), default=['sync', 'async'])
+        parser.add_argument('--prefix', default='loadtest')
+        parser.add_argument('--max-rate-limited', type=float, default=0.05, help='Допустимая доля ответов 429')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        target = HTTPTarget(options['base_url'])
+        summaries = {}
+        for mode in options['modes']:
+            usernames = seed_users(f"{options['prefix']}_{mode}_", options['users'], self.PASSWORD)
+            try:
+                for name, summary in asyncio.run(self.run_mode(target, self.MODES[mode], usernames, options['concurrency'])):
+                    self.stdout.write(format_summary(f'{mode} {name}', summary))
+                    summaries[f'{mode} {name}'] = summary
+            finally:
+                cleanup_users(usernames)
+        limited = rate_limited_endpoints(summaries, options['max_rate_limited'])
+        if limited:
+            raise CommandError(rate_limit_error(limited, options['max_rate_limited']))
+
+    async def run_mode(self, target: HTTPTarget, prefix: str, usernames: List[str], concurrency: int) -> List[Any]:
+        login = LatencyRecorder('login')
+        await run_requests(login, [
+            (lambda username=username: target.post_json(f'{prefix}/login/', {
+                'username_or_phone': username,
+                'password': self.PASSWORD,
+            }))
+            for username in usernames
+        ], concurrency)
+
+        codes = read_codes(usernames)
+        sms = LatencyRecorder('sms')
+        await run_requests(sms, [
+            (lambda username=username: target.post_json(f'{prefix}/sms/', {
+                'username_or_phone': username,
+                'sms_code': codes[username],
+            }))
+            for username in usernames if codes.get(username)
+        ], concurrency)
+        return [('login', login.summary()), ('sms', sms.summary())]
@@ -0,0 +1,29 @@
+import glob
+import os
+import pstats
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.profiling import PROFILE_SUFFIX, dump_samples
+
+
+class Command(BaseCommand):
+    help = 'Сводка самых затратных функций по собранным дампам профилировщика'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--dir', default=settings.PROFILING_DIR)
+        parser.add_argument('--url-name', default='', help='Только дампы этого эндпоинта (register, login, sms)')
+        parser.add_argument('--sort', choices=['cumulative', 'tottime', 'ncalls'], default='cumulative')
+        parser.add_argument('--limit', type=int, default=25)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        prefix = f"{options['url_name']}-" if options['url_name'] else ''
+        paths = sorted(glob.glob(os.path.join(options['dir'], f'{prefix}*{PROFILE_SUFFIX}')))
+        if not paths:
+            raise CommandError(f"Нет дампов в {options['dir']}")
+        stats = pstats.Stats(*paths, stream=self.stdout)
+        samples = sum(dump_samples(path) for path in paths)
+        self.stdout.write(f'Дампов: {len(paths)}, запросов: {samples}')
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
@@ -0,0 +1,31 @@
+from typing import Any, Iterator
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from users.bloom import get_user_bloom
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает Bloom-фильтр занятых имён и номеров телефонов'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        bloom = get_user_bloom()
+        last_pk = User.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        count = bloom.rebuild(self.identifiers(User.objects.filter(pk__lte=last_pk), options['chunk_size']))
+        # Пользователи, созданные во время перестройки, могли попасть в старый ключ до RENAME.
+        late = list(self.identifiers(User.objects.filter(pk__gt=last_pk), options['chunk_size']))
+        bloom.add(late)
+        self.stdout.write(
+            f'{count + len(late)} identifiers, {bloom.size} bits, {bloom.hashes} hashes'
+        )
+
+    @staticmethod
+    def identifiers(queryset, chunk_size: int) -> Iterator[str]:
+        for username, phone_number in queryset.values_list('username', 'phone_number').iterator(chunk_size=chunk_size):
+            yield username
+            yield phone_number
@@ -0,0 +1,43 @@
+import os
+import runpy
+from typing import Any, Dict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from gunicorn.app.base import BaseApplication
+
+
+class GunicornApplication(BaseApplication):
+    def __init__(self, options: Dict[str, Any]) -> None:
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        config = runpy.run_path(os.path.join(settings.BASE_DIR, 'auth_service', 'gunicorn.conf.py'))
+        for key, value in config.items():
+            if key in self.cfg.settings:
+                self.cfg.set(key, value)
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from auth_service.asgi import application
+        return application
+
+
+class Command(BaseCommand):
+    help = 'Запускает сервис под gunicorn с воркерами uvicorn, предзагрузкой приложения и прогревом'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--bind')
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--no-warmup', action='store_true', help='Не прогревать воркеры (для сравнения)')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['no_warmup']:
+            os.environ['WARMUP'] = '0'
+        if options['workers'] and 'PASSWORD_HASHING_WORKERS' not in os.environ:
+            # Пул хеширования создаётся позже, в воркерах: делим ядра на заданное здесь число воркеров.
+            settings.PASSWORD_HASHING_WORKERS = max(1, (os.cpu_count() or 1) // options['workers'])
+        GunicornApplication({'bind': options['bind'], 'workers': options['workers']}).run()
@@ -0,0 +1,84 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from .redis_client import get_pool_stats
+
+
+STAGES = ('user_lookup', 'check_password', 'make_password', 'otp_issue', 'otp_verify', 'sms_enqueue', 'jwt_issue')
+
+STAGE_SECONDS = Histogram(
+    'auth_stage_seconds',
+    'Длительность этапов регистрации, входа и проверки кода',
+    ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+# Время хеширования пароля делится на ожидание свободного процесса пула и само вычисление.
+HASHING_WAIT_SECONDS = Histogram(
+    'password_hashing_queue_wait_seconds',
+    'Ожидание свободного процесса пула хеширования паролей',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+HASHING_COMPUTE_SECONDS = Histogram(
+    'password_hashing_compute_seconds',
+    'Вычисление хеша пароля в процессе пула',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2.5),
+)
+HASHING_REJECTED = Counter('password_hashing_rejected_total', 'Запросы, отклонённые из-за переполненного пула хеширования')
+OUTCOMES = Counter('auth_outcomes_total', 'Исходы запросов по сценариям', ['flow', 'outcome'])
+
+# sent, failed, retried, expired (код истёк до отправки), exhausted (кончились попытки),
+# unknown (нет ответа, а сообщение уже могло уйти).
+SMS_MESSAGES = Counter('sms_messages_total', 'Исходы отправки смс с кодами', ['outcome'])
+# allowed, error (Redis недоступен) или <local|redis>_<ip|identifier|global> для отказов.
+RATE_LIMIT_REQUESTS = Counter('rate_limit_requests_total', 'Решения ограничителя частоты запросов', ['result'])
+LOGIN_EVENTS = Counter('login_events_total', 'События входа, записанные в базу или потерянные', ['result'])
+SMS_RATE_WAIT = Histogram(
+    'sms_rate_limit_wait_seconds',
+    'Ожидание токенов общего лимита отправки смс',
+    buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+# max, created, in_use, idle; в режиме нескольких процессов складываются по живым воркерам.
+REDIS_POOL_CONNECTIONS = Gauge(
+    'redis_pool_connections', 'Соединения общего пула Redis', ['state'], multiprocess_mode='livesum',
+)
+
+# Дочерние метрики создаются заранее, чтобы на запросе не искать их по меткам.
+_stage_histograms = {name: STAGE_SECONDS.labels(name) for name in STAGES}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_histograms[name].observe(time.perf_counter() - started)
+
+
+def record_outcome(flow: str, outcome: str) -> None:
+    OUTCOMES.labels(flow, outcome).inc()
+
+
+def record_sms(outcome: str, count: int = 1) -> None:
+    SMS_MESSAGES.labels(outcome).inc(count)
+
+
+def record_redis_pool(**kwargs: Any) -> None:
+    for state, value in get_pool_stats().items():
+        REDIS_POOL_CONNECTIONS.labels(state).set(value)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    record_redis_pool()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Каждый воркер пишет свои значения в файлы каталога, при отдаче они суммируются.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
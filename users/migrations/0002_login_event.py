@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('login', models.CharField(blank=True, max_length=150)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('ip', models.GenericIPAddressField(null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=256)),
+                ('outcome', models.CharField(max_length=32)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='login_events', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -4,5 +4,24 @@ from django.contrib.auth.models import AbstractUser
 class User(AbstractUser):
     phone_number = models.CharField(max_length=20, unique=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Имя и телефон на момент загрузки: по ним сигналы сбрасывают кеши без лишнего SELECT.
+        if not {'username', 'phone_number'} & instance.get_deferred_fields():
+            instance._loaded_identifiers = (instance.username, instance.phone_number)
+        return instance
+
+    def __str__(self):
+        return self.phone_number
+
+class LoginEvent(models.Model):
+    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='login_events')
+    login = models.CharField(max_length=150, blank=True)
+    created_at = models.DateTimeField(db_index=True)
+    ip = models.GenericIPAddressField(null=True)
+    user_agent = models.CharField(max_length=256, blank=True)
+    outcome = models.CharField(max_length=32)
+
     def __str__(self):
-        return self.phone_number
\ No newline at end of file
+        return f'{self.login} {self.outcome} {self.created_at}'
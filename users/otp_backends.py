@@ -0,0 +1,225 @@
+import heapq
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .redis_client import get_async_node_redis_client, get_async_redis_client, get_node_redis_client, get_redis_client
+from .sharding import get_otp_ring
+
+
+ISSUE_OTP_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'sent', 'window_end')
+local sent = tonumber(state[1]) or 0
+local window_end = tonumber(state[2]) or 0
+if now_ms >= window_end then
+    sent = 0
+    window_end = now_ms + tonumber(ARGV[3]) * 1000
+end
+if sent >= tonumber(ARGV[4]) then
+    return math.ceil((window_end - now_ms) / 1000)
+end
+local expires_at = now_ms + tonumber(ARGV[2]) * 1000
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'expires_at', expires_at, 'sent', sent + 1, 'window_end', window_end)
+redis.call('PEXPIREAT', KEYS[1], math.max(expires_at, window_end))
+return 0
+"""
+
+CONSUME_OTP_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'code', 'expires_at')
+if not state[1] then
+    return -1
+end
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+if now_ms >= tonumber(state[2]) then
+    redis.call('HDEL', KEYS[1], 'code', 'expires_at')
+    return -1
+end
+if state[1] ~= ARGV[1] then
+    return 0
+end
+redis.call('HDEL', KEYS[1], 'code', 'expires_at')
+return 1
+"""
+
+GET_OTP_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'code', 'expires_at')
+if not state[1] then
+    return false
+end
+local now = redis.call('TIME')
+if tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000) >= tonumber(state[2]) then
+    return false
+end
+return state[1]
+"""
+
+
+class BaseOTPBackend:
+    # issue возвращает 0 или число секунд до следующей попытки;
+    # consume: 1 — код верный и удалён, 0 — неверный, -1 — кода нет или он истёк.
+    def issue(self, key: str, code: str, ttl: int, interval: int, limit: int) -> int:
+        raise NotImplementedError
+
+    def consume(self, key: str, code: str) -> int:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def aissue(self, key: str, code: str, ttl: int, interval: int, limit: int) -> int:
+        return self.issue(key, code, ttl, interval, limit)
+
+    async def aconsume(self, key: str, code: str) -> int:
+        return self.consume(key, code)
+
+    async def aget(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+
+class RedisOTPBackend(BaseOTPBackend):
+    @staticmethod
+    def get_node(key: str) -> Optional[str]:
+        ring = get_otp_ring()
+        return ring.get_node(key) if ring is not None else None
+
+    def client_for(self, key: str):
+        node = self.get_node(key)
+        return get_redis_client() if node is None else get_node_redis_client(node)
+
+    def async_client_for(self, key: str):
+        node = self.get_node(key)
+        return get_async_redis_client() if node is None else get_async_node_redis_client(node)
+
+    def issue(self, key: str, code: str, ttl: int, interval: int, limit: int) -> int:
+        script = self.client_for(key).register_script(ISSUE_OTP_SCRIPT)
+        return script(keys=[key], args=[code, ttl, interval, limit])
+
+    def consume(self, key: str, code: str) -> int:
+        return self.client_for(key).register_script(CONSUME_OTP_SCRIPT)(keys=[key], args=[code])
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client_for(key).register_script(GET_OTP_SCRIPT)(keys=[key])
+
+    def delete(self, key: str) -> None:
+        self.client_for(key).hdel(key, 'code', 'expires_at')
+
+    async def aissue(self, key: str, code: str, ttl: int, interval: int, limit: int) -> int:
+        script = self.async_client_for(key).register_script(ISSUE_OTP_SCRIPT)
+        return await script(keys=[key], args=[code, ttl, interval, limit])
+
+    async def aconsume(self, key: str, code: str) -> int:
+        return await self.async_client_for(key).register_script(CONSUME_OTP_SCRIPT)(keys=[key], args=[code])
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await self.async_client_for(key).register_script(GET_OTP_SCRIPT)(keys=[key])
+
+    async def adelete(self, key: str) -> None:
+        await self.async_client_for(key).hdel(key, 'code', 'expires_at')
+
+
+class LocalOTPBackend(BaseOTPBackend):
+    # Та же логика, что в Lua-скриптах, но в памяти процесса. Подходит для одного процесса и тестов.
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self.max_entries = max_entries or settings.OTP_LOCAL_MAX_ENTRIES
+        # key -> [code, expires_at, sent, window_end, deadline]
+        self.entries: Dict[str, List] = {}
+        self.deadlines: List[Tuple[float, str]] = []
+        self.lock = threading.Lock()
+
+    def purge(self, now: float) -> None:
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, key = heapq.heappop(self.deadlines)
+            entry = self.entries.get(key)
+            if entry is not None and entry[4] == deadline:
+                del self.entries[key]
+
+    def evict(self) -> None:
+        # Память ограничена: вытесняем записи, которые истекут раньше всех.
+        while len(self.entries) > self.max_entries and self.deadlines:
+            deadline, key = heapq.heappop(self.deadlines)
+            entry = self.entries.get(key)
+            if entry is not None and entry[4] == deadline:
+                del self.entries[key]
+
+    def compact(self) -> None:
+        # При частой перевыдаче в куче копятся устаревшие сроки, перестраиваем её по живым записям.
+        if len(self.deadlines) > 2 * len(self.entries) + 1024:
+            self.deadlines = [(entry[4], key) for key, entry in self.entries.items()]
+            heapq.heapify(self.deadlines)
+
+    def issue(self, key: str, code: str, ttl: int, interval: int, limit: int) -> int:
+        now = time.time()
+        with self.lock:
+            self.purge(now)
+            entry = self.entries.get(key)
+            sent, window_end = (entry[2], entry[3]) if entry is not None else (0, 0.0)
+            if now >= window_end:
+                sent, window_end = 0, now + interval
+            if sent >= limit:
+                return math.ceil(window_end - now)
+            expires_at = now + ttl
+            deadline = max(expires_at, window_end)
+            self.entries[key] = [code, expires_at, sent + 1, window_end, deadline]
+            heapq.heappush(self.deadlines, (deadline, key))
+            self.evict()
+            self.compact()
+            return 0
+
+    def consume(self, key: str, code: str) -> int:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] is None:
+                return -1
+            if now >= entry[1]:
+                entry[0] = None
+                return -1
+            if entry[0] != code:
+                return 0
+            entry[0] = None
+            return 1
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] is None or now >= entry[1]:
+                return None
+            return entry[0]
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[0] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+_otp_backend: Optional[BaseOTPBackend] = None
+_otp_backend_path: Optional[str] = None
+_otp_backend_lock = threading.Lock()
+
+
+def get_otp_backend() -> BaseOTPBackend:
+    global _otp_backend, _otp_backend_path
+    if _otp_backend is None or _otp_backend_path != settings.OTP_BACKEND:
+        with _otp_backend_lock:
+            if _otp_backend is None or _otp_backend_path != settings.OTP_BACKEND:
+                _otp_backend = import_string(settings.OTP_BACKEND)()
+                _otp_backend_path = settings.OTP_BACKEND
+    return _otp_backend
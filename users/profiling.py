@@ -0,0 +1,119 @@
+import atexit
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_SUFFIX = '.prof'
+
+
+def dump_samples(path: str) -> int:
+    # <url_name>-<время>-<pid>-<номер>-x<запросов>.prof
+    name = os.path.basename(path)[:-len(PROFILE_SUFFIX)]
+    count = name.rpartition('-x')[2]
+    return int(count) if count.isdigit() else 1
+
+
+class ProfileCollector:
+    def __init__(self, directory: str, aggregate: int) -> None:
+        self.directory = directory
+        self.aggregate = aggregate
+        # url_name -> (накопленная статистика, число запросов в ней)
+        self.pending: Dict[str, Tuple[pstats.Stats, int]] = {}
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def path(self, url_name: str, samples: int) -> str:
+        name = f'{url_name}-{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}-{next(self.counter)}-x{samples}'
+        return os.path.join(self.directory, name + PROFILE_SUFFIX)
+
+    def add(self, url_name: str, profile: cProfile.Profile) -> Optional[str]:
+        if self.aggregate <= 1:
+            return self.write(url_name, pstats.Stats(profile), 1)
+        with self.lock:
+            stats, samples = self.pending.get(url_name, (None, 0))
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            samples += 1
+            if samples < self.aggregate:
+                self.pending[url_name] = (stats, samples)
+                return None
+            del self.pending[url_name]
+        return self.write(url_name, stats, samples)
+
+    def write(self, url_name: str, stats: pstats.Stats, samples: int) -> Optional[str]:
+        path = self.path(url_name, samples)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stats.dump_stats(path)
+        except OSError as exc:
+            logger.warning('Profile dump failed: %s', exc)
+            return None
+        return path
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for url_name, (stats, samples) in pending.items():
+            self.write(url_name, stats, samples)
+
+
+class ProfilingMiddleware:
+    HEADER = 'X-Profile'
+
+    def __init__(self, get_response) -> None:
+        # Выключенный профилировщик не попадает в цепочку и ничего не стоит.
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.url_names = set(settings.PROFILING_URL_NAMES)
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.token = settings.PROFILING_TOKEN
+        self.collector = ProfileCollector(settings.PROFILING_DIR, settings.PROFILING_AGGREGATE)
+        atexit.register(self.collector.flush)
+
+    def requested(self, request) -> bool:
+        header = request.headers.get(self.HEADER)
+        return bool(header and self.token and hmac.compare_digest(header, self.token))
+
+    def url_name(self, request) -> Optional[str]:
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        return url_name if url_name in self.url_names else None
+
+    def __call__(self, request):
+        requested = self.requested(request)
+        # Адрес разбираем только для запросов, которые и так выбраны для профилирования.
+        if not requested and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return self.get_response(request)
+        url_name = self.url_name(request)
+        if url_name is None:
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        path = self.collector.add(url_name, profile)
+        if requested and path is not None:
+            response['X-Profile-Dump'] = os.path.basename(path)
+        return response
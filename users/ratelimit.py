@@ -0,0 +1,248 @@
+import json
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from .cache import LRUCache
+from .metrics import RATE_LIMIT_REQUESTS
+from .redis_client import get_async_redis_client, get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# Скользящее окно из двух корзин: прошлая учитывается с весом, убывающим по мере хода текущей.
+# Запрос засчитывается во все окна, только если не превышено ни одно; иначе возвращается
+# номер окна и через сколько секунд в нём освободится место.
+SLIDING_WINDOW_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local counters = {}
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i]) * 1000
+    local bucket = math.floor(now_ms / window)
+    local elapsed = now_ms - bucket * window
+    local key = KEYS[i] .. ':' .. bucket
+    local current = tonumber(redis.call('GET', key)) or 0
+    local previous = tonumber(redis.call('GET', KEYS[i] .. ':' .. (bucket - 1))) or 0
+    if previous * (1 - elapsed / window) + current + 1 > limit then
+        local wait = window - elapsed
+        if current + 1 <= limit and previous > 0 then
+            wait = window * (1 - (limit - 1 - current) / previous) - elapsed
+        end
+        return {0, math.max(1, math.ceil(wait / 1000)), i}
+    end
+    counters[i] = {key, window}
+end
+for i = 1, #counters do
+    redis.call('INCR', counters[i][1])
+    redis.call('PEXPIRE', counters[i][1], counters[i][2] * 2)
+end
+return {1, 0, 0}
+"""
+
+IDENTIFIER_FIELDS = ('username_or_phone', 'phone_number', 'username')
+MAX_IDENTIFIER_BODY = 4096
+
+
+def parse_rate(rate: str) -> Optional[Tuple[int, int]]:
+    # «30/60» — не больше 30 запросов за 60 секунд; пустая строка — без лимита.
+    if not rate:
+        return None
+    count, _, seconds = rate.partition('/')
+    return int(count), int(seconds or 1)
+
+
+def client_ip(request) -> str:
+    if settings.RATE_LIMIT_IP_HEADER:
+        # Левые адреса в X-Forwarded-For задаёт сам клиент; доверяем только тем, что дописали
+        # наши прокси, то есть RATE_LIMIT_TRUSTED_PROXIES-му адресу справа.
+        forwarded = [part.strip() for part in request.META.get(settings.RATE_LIMIT_IP_HEADER, '').split(',') if part.strip()]
+        if forwarded:
+            return forwarded[-min(max(1, settings.RATE_LIMIT_TRUSTED_PROXIES), len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_identifier(request) -> str:
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return ''
+    if content_length > MAX_IDENTIFIER_BODY:
+        return ''
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return ''
+        if not isinstance(data, dict):
+            return ''
+    else:
+        data = request.POST
+    for field in IDENTIFIER_FIELDS:
+        value = data.get(field)
+        if value:
+            return str(value)[:150]
+    return ''
+
+
+class SlidingWindowLimiter:
+    PREFIX = 'rl:'
+
+    def __init__(self, ip_rate: str, identifier_rate: str, global_rate: str, local_size: int) -> None:
+        self.rates = {
+            'ip': parse_rate(ip_rate),
+            'identifier': parse_rate(identifier_rate),
+            'global': parse_rate(global_rate),
+        }
+        # Уже заблокированные IP и идентификаторы отсекаются в процессе, без запроса в Redis.
+        self.blocked = LRUCache(local_size, float('inf'))
+
+    def scopes(self, ip: str, identifier: str) -> List[Tuple[str, str]]:
+        values = {'ip': ip, 'identifier': identifier, 'global': 'all'}
+        return [
+            (scope, f'{self.PREFIX}{scope}:{values[scope]}')
+            for scope, rate in self.rates.items() if rate is not None and values[scope]
+        ]
+
+    def check_local(self, ip: str, identifier: str) -> Optional[Tuple[str, int]]:
+        now = time.time()
+        for scope, key in self.scopes(ip, identifier):
+            blocked_until = self.blocked.get(key)
+            if blocked_until is not None:
+                return scope, max(1, int(blocked_until - now + 0.999))
+        return None
+
+    def script_args(self, scopes: List[Tuple[str, str]]) -> Tuple[List[str], List[int]]:
+        args: List[int] = []
+        for scope, _ in scopes:
+            args.extend(self.rates[scope])
+        return [key for _, key in scopes], args
+
+    def result(self, scopes: List[Tuple[str, str]], reply: List[int]) -> Optional[Tuple[str, int]]:
+        allowed, retry_after, index = reply
+        if allowed:
+            return None
+        scope, key = scopes[index - 1]
+        if scope != 'global':
+            self.blocked.set(key, time.time() + retry_after, time.time() + retry_after)
+        return scope, retry_after
+
+    def hit(self, ip: str, identifier: str) -> Optional[Tuple[str, int]]:
+        scopes = self.scopes(ip, identifier)
+        if not scopes:
+            return None
+        keys, args = self.script_args(scopes)
+        try:
+            reply = get_redis_client().register_script(SLIDING_WINDOW_SCRIPT)(keys=keys, args=args)
+        except redis.RedisError as exc:
+            # Без Redis лимиты не считаются, но вход продолжает работать.
+            logger.warning('Rate limiter is unavailable: %s', exc)
+            RATE_LIMIT_REQUESTS.labels('error').inc()
+            return None
+        return self.result(scopes, reply)
+
+    async def ahit(self, ip: str, identifier: str) -> Optional[Tuple[str, int]]:
+        scopes = self.scopes(ip, identifier)
+        if not scopes:
+            return None
+        keys, args = self.script_args(scopes)
+        try:
+            reply = await get_async_redis_client().register_script(SLIDING_WINDOW_SCRIPT)(keys=keys, args=args)
+        except redis.RedisError as exc:
+            logger.warning('Rate limiter is unavailable: %s', exc)
+            RATE_LIMIT_REQUESTS.labels('error').inc()
+            return None
+        return self.result(scopes, reply)
+
+
+_limiter: Optional[SlidingWindowLimiter] = None
+_limiter_config: Optional[Tuple] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> SlidingWindowLimiter:
+    global _limiter, _limiter_config
+    config = (settings.RATE_LIMIT_IP, settings.RATE_LIMIT_IDENTIFIER, settings.RATE_LIMIT_GLOBAL, settings.RATE_LIMIT_LOCAL_SIZE)
+    if _limiter is None or _limiter_config != config:
+        with _limiter_lock:
+            if _limiter is None or _limiter_config != config:
+                _limiter = SlidingWindowLimiter(*config)
+                _limiter_config = config
+    return _limiter
+
+
+def too_many_requests(retry_after: int) -> JsonResponse:
+    response = JsonResponse(
+        {'detail': f'Слишком много запросов. Повторите через {retry_after} сек.'},
+        status=429,
+        json_dumps_params={'ensure_ascii': False},
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class RateLimitMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def applies(request) -> bool:
+        return settings.RATE_LIMIT_ENABLED and request.method == 'POST' and request.path in settings.RATE_LIMIT_PATHS
+
+    @staticmethod
+    def reject(rejected: Tuple[str, int], source: str) -> JsonResponse:
+        scope, retry_after = rejected
+        RATE_LIMIT_REQUESTS.labels(f'{source}_{scope}').inc()
+        return too_many_requests(retry_after)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.applies(request):
+            return self.get_response(request)
+        limiter = get_rate_limiter()
+        ip = client_ip(request)
+        rejected = limiter.check_local(ip, '')
+        if rejected is not None:
+            return self.reject(rejected, 'local')
+        identifier = request_identifier(request)
+        rejected = limiter.check_local(ip, identifier)
+        if rejected is not None:
+            return self.reject(rejected, 'local')
+        rejected = limiter.hit(ip, identifier)
+        if rejected is not None:
+            return self.reject(rejected, 'redis')
+        RATE_LIMIT_REQUESTS.labels('allowed').inc()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.applies(request):
+            return await self.get_response(request)
+        limiter = get_rate_limiter()
+        ip = client_ip(request)
+        rejected = limiter.check_local(ip, '')
+        if rejected is not None:
+            return self.reject(rejected, 'local')
+        identifier = request_identifier(request)
+        rejected = limiter.check_local(ip, identifier)
+        if rejected is not None:
+            return self.reject(rejected, 'local')
+        rejected = await limiter.ahit(ip, identifier)
+        if rejected is not None:
+            return self.reject(rejected, 'redis')
+        RATE_LIMIT_REQUESTS.labels('allowed').inc()
+        return await self.get_response(request)
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+
+_pool: Optional[redis.BlockingConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+_async_pools: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.asyncio.BlockingConnectionPool]' = weakref.WeakKeyDictionary()
+_node_pools: Dict[str, redis.BlockingConnectionPool] = {}
+_node_pools_pid: Optional[int] = None
+_async_node_pools: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, redis.asyncio.BlockingConnectionPool]]' = weakref.WeakKeyDictionary()
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return dict(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
+    )
+
+
+def _node_pool_kwargs() -> Dict[str, Any]:
+    # Адрес, порт и номер базы узла берутся из его URL.
+    kwargs = _pool_kwargs()
+    for key in ('host', 'port', 'db'):
+        kwargs.pop(key)
+    return kwargs
+
+
+def _build_pool() -> redis.BlockingConnectionPool:
+    return redis.BlockingConnectionPool(**_pool_kwargs())
+
+
+def get_redis_pool() -> redis.BlockingConnectionPool:
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = _build_pool()
+                _pool_pid = pid
+    return _pool
+
+
+def get_redis_client() -> redis.Redis:
+    return redis.Redis(connection_pool=get_redis_pool())
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    # Асинхронные соединения привязаны к циклу событий, поэтому пул свой у каждого цикла.
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = redis.asyncio.BlockingConnectionPool(**_pool_kwargs())
+        _async_pools[loop] = pool
+    return redis.asyncio.Redis(connection_pool=pool)
+
+
+def get_node_redis_client(url: str) -> redis.Redis:
+    global _node_pools, _node_pools_pid
+    pid = os.getpid()
+    pool = _node_pools.get(url) if _node_pools_pid == pid else None
+    if pool is None:
+        with _pool_lock:
+            if _node_pools_pid != pid:
+                _node_pools = {}
+                _node_pools_pid = pid
+            pool = _node_pools.get(url)
+            if pool is None:
+                pool = _node_pools[url] = redis.BlockingConnectionPool.from_url(url, **_node_pool_kwargs())
+    return redis.Redis(connection_pool=pool)
+
+
+def get_async_node_redis_client(url: str) -> redis.asyncio.Redis:
+    loop = asyncio.get_running_loop()
+    pools = _async_node_pools.setdefault(loop, {})
+    pool = pools.get(url)
+    if pool is None:
+        pool = pools[url] = redis.asyncio.BlockingConnectionPool.from_url(url, **_node_pool_kwargs())
+    return redis.asyncio.Redis(connection_pool=pool)
+
+
+def reset_redis_pool() -> None:
+    global _pool, _pool_pid, _pool_lock, _node_pools, _node_pools_pid
+    # После fork соединения родителя не закрываем: сокеты принадлежат ему.
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+    _async_pools.clear()
+    _node_pools = {}
+    _node_pools_pid = None
+    _async_node_pools.clear()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    pool = _pool
+    if pool is None or _pool_pid != os.getpid():
+        return {"max": settings.REDIS_MAX_CONNECTIONS, "created": 0, "in_use": 0, "idle": 0}
+    created = len(pool._connections)
+    idle = sum(1 for connection in list(pool.pool.queue) if connection is not None)
+    return {
+        "max": pool.max_connections,
+        "created": created,
+        "in_use": created - idle,
+        "idle": idle,
+    }
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_redis_pool)
@@ -1,16 +1,18 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import re
 
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.db import IntegrityError
-from django.contrib.auth.hashers import check_password
 
 from rest_framework import serializers
-from rest_framework.validators import UniqueValidator
 
+from .hashing import HashingUnavailable, get_hashing_pool
+from .metrics import record_outcome, stage
 from .models import User
 from .services import UserService
 from .utils import OTPManager, OTPSendError
+from .validators import BloomUniqueValidator
 from .tasks import send_sms_task
 
 
@@ -22,8 +24,8 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ["username", "password", "password2", "phone_number"]
         extra_kwargs = {
             "password": {"write_only": True},
-            "username": {"validators": [UniqueValidator(queryset=UserService.get_users(), message="Пользователь с таким именем уже существует.")]},
-            "phone_number": {"validators": [UniqueValidator(queryset=UserService.get_users(), message="Пользователь с таким номером уже существует.")]},
+            "username": {"validators": [BloomUniqueValidator(queryset=UserService.get_users(), message="Пользователь с таким именем уже существует.")]},
+            "phone_number": {"validators": [BloomUniqueValidator(queryset=UserService.get_users(), message="Пользователь с таким номером уже существует.")]},
         }
 
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
@@ -45,65 +47,127 @@ class RegisterSerializer(serializers.ModelSerializer):
         try:
             user: User = UserService.register_user({"password": password, **validated_data})
             return user
+        except HashingUnavailable:
+            raise
+        except IntegrityError:
+            raise serializers.ValidationError({'detail': 'Пользователь с таким именем или номером уже существует.'})
         except Exception as e:
             raise serializers.ValidationError({'detail': str(e)})
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginRequestSerializer(serializers.Serializer):
     username_or_phone = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+
+class LoginSerializer(LoginRequestSerializer):
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         username_or_phone : str = attrs.get("username_or_phone")
         password: str = attrs.get("password")
         try:
-            user: Optional[User] = UserService.get_user_by_phone_or_name(username_or_phone)
+            with stage('user_lookup'):
+                user: Optional[User] = UserService.get_user_by_phone_or_name(username_or_phone)
         except Exception:
+            record_outcome('login', 'lookup_error')
             raise serializers.ValidationError({"detail": "Ошибка при поиске пользователя."})
 
         if not user:
+            record_outcome('login', 'user_not_found')
             raise serializers.ValidationError({"detail": "Пользователь не существует, пройдите регистрацию."})
 
-        if not check_password(password, user.password):
+        with stage('check_password'):
+            is_valid_password: bool = get_hashing_pool().check_password(password, user.password)
+        if not is_valid_password:
+            record_outcome('login', 'wrong_password')
             raise serializers.ValidationError({"detail": "Введён неправильный пароль."})
         
         otp_manager = OTPManager()
         try:
             otp_code: str = otp_manager.create_otp()
-            otp_manager.save_otp(username_or_phone, otp_code)
+            with stage('otp_issue'):
+                otp_manager.save_otp(username_or_phone, otp_code)
         except OTPSendError as e:
+            record_outcome('login', 'rate_limited')
             raise serializers.ValidationError({"detail": str(e)})
         except Exception:
+            record_outcome('login', 'otp_error')
             raise serializers.ValidationError({"detail": "Не удалось подготовить код подтверждения."})
             
         if user and getattr(user, "phone_number", None):
-            send_sms_task.delay(user.phone_number, otp_code)
+            with stage('sms_enqueue'):
+                send_sms_task.delay(user.phone_number, otp_code, otp_manager.expires_at())
 
+        record_outcome('login', 'ok')
         return attrs
 
-class SMSSerializer(serializers.Serializer):
+class SMSRequestSerializer(serializers.Serializer):
     username_or_phone = serializers.CharField()
     sms_code = serializers.CharField(write_only=True)
 
+
+class SMSSerializer(SMSRequestSerializer):
     def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
         username_or_phone: str = attrs.get("username_or_phone")
         sms_code: str = attrs.get("sms_code")
 
         otp_manager = OTPManager()
         try:
-            otp_code = otp_manager.get_otp(username_or_phone)
+            with stage('otp_verify'):
+                is_valid_code: bool = otp_manager.verify_otp(username_or_phone, sms_code)
         except OTPSendError as e:
+            record_outcome('sms', 'expired_code')
             raise serializers.ValidationError({'detail': str(e)})
         
-        if otp_code != sms_code:
+        if not is_valid_code:
+            record_outcome('sms', 'bad_code')
             raise serializers.ValidationError({'detail': 'Введён неверный код.'})
 
-        user: Optional[User] = UserService.get_user_by_phone_or_name(username_or_phone)
+        with stage('user_lookup'):
+            user: Optional[User] = UserService.get_user_by_phone_or_name(username_or_phone)
         if not user:
+            record_outcome('sms', 'user_not_found')
             raise serializers.ValidationError({'detail': 'Не удалось найти данные пользователя. Попробуйте войти заново.'})
 
-        otp_manager.delete_otp(username_or_phone)
-
         attrs['user'] = user
-        return attrs     
+        return attrs
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField()
+
+
+class IntrospectSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=settings.INTROSPECTION_MAX_TOKENS,
+    )
+
+
+class UserIdsField(serializers.Field):
+    # Тысячи id проверяются одним проходом, без отдельного IntegerField на каждый элемент.
+    default_error_messages = {
+        'not_a_list': 'Ожидается список id пользователей.',
+        'empty': 'Список id не может быть пустым.',
+        'max_length': 'Не больше {max_length} id за запрос.',
+        'invalid': 'id пользователя должен быть положительным целым числом.',
+    }
+
+    def __init__(self, max_length: int, **kwargs: Any) -> None:
+        self.max_length = max_length
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data: Any) -> List[int]:
+        if not isinstance(data, list):
+            self.fail('not_a_list')
+        if not data:
+            self.fail('empty')
+        if len(data) > self.max_length:
+            self.fail('max_length', max_length=self.max_length)
+        if not all(type(user_id) is int and user_id > 0 for user_id in data):
+            self.fail('invalid')
+        return list(dict.fromkeys(data))
+
 
+class BulkUserSerializer(serializers.Serializer):
+    ids = UserIdsField(max_length=settings.USERS_BULK_MAX_IDS)
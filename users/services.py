@@ -1,36 +1,126 @@
-from typing import Any, Dict, Optional
+import re
+from typing import Any, Dict, List, Optional, Tuple
 
-from django.db import IntegrityError, transaction
-
-from django.db.models import Q
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import QuerySet
 
+from .cache import MISSING, UserCache, get_user_cache, get_user_id_cache
+from .db_router import replica_reads
+from .hashing import get_hashing_pool
+from .metrics import stage
 from .models import User
 
 
+PHONE_PATTERN = re.compile(r'^8\d{10}$')
+
+
 class UserService:
+    LOOKUP_FIELDS = UserCache.FIELDS
+
     @staticmethod
     def register_user(validated_data: Dict[str, Any]) -> User:
         try:
+            data = dict(validated_data)
+            password = data.pop('password')
+            user = User(**data)
+            user.username = User.normalize_username(user.username)
+            with stage('make_password'):
+                user.password = get_hashing_pool().make_password(password)
             with transaction.atomic():
-                user = User.objects.create_user(**validated_data)
-                return user
+                user.save()
+            return user
         except IntegrityError as exc:
             raise exc
 
     @staticmethod
-    def get_users() -> User:
+    def get_users() -> QuerySet:
+        # Только ленивый queryset: сериализаторы берут его при импорте, в том числе в мастере gunicorn до fork.
+        return User.objects.all()
+
+    @staticmethod
+    def plan_user_lookup(username_or_phone: str) -> List[Dict[str, str]]:
+        if PHONE_PATTERN.match(username_or_phone):
+            return [{'phone_number': username_or_phone}, {'username': username_or_phone}]
+        return [{'username': username_or_phone}]
+
+    @staticmethod
+    def lookup_user(username_or_phone: str) -> Optional[User]:
+        for lookup in UserService.plan_user_lookup(username_or_phone):
+            try:
+                return User.objects.only(*UserService.LOOKUP_FIELDS).get(**lookup)
+            except User.DoesNotExist:
+                continue
+        return None
+
+    @staticmethod
+    async def alookup_user(username_or_phone: str) -> Optional[User]:
+        for lookup in UserService.plan_user_lookup(username_or_phone):
+            try:
+                return await User.objects.only(*UserService.LOOKUP_FIELDS).aget(**lookup)
+            except User.DoesNotExist:
+                continue
+        return None
+
+    @staticmethod
+    def find_user(username_or_phone: str) -> Optional[User]:
         try:
-            with transaction.atomic():
-                user = User.objects.all()
-                return user
-        except Exception as exc:
-            raise exc
+            with replica_reads(username_or_phone) as reads:
+                return UserService.lookup_user(username_or_phone)
+        except DatabaseError:
+            if reads.alias is None:
+                raise
+        # Реплика отказала посреди запроса, повторяем на основной базе.
+        return UserService.lookup_user(username_or_phone)
+
+    @staticmethod
+    async def afind_user(username_or_phone: str) -> Optional[User]:
+        try:
+            with replica_reads(username_or_phone) as reads:
+                return await UserService.alookup_user(username_or_phone)
+        except DatabaseError:
+            if reads.alias is None:
+                raise
+        return await UserService.alookup_user(username_or_phone)
 
     @staticmethod
     def get_user_by_phone_or_name(username_or_phone: str) -> Optional[User]:
+        user_cache = get_user_cache()
+        user = user_cache.get(username_or_phone)
+        if user is not MISSING:
+            return user
+        user = UserService.find_user(username_or_phone)
+        user_cache.set(username_or_phone, user)
+        return user
+
+    @staticmethod
+    async def aget_user_by_phone_or_name(username_or_phone: str) -> Optional[User]:
+        user_cache = get_user_cache()
+        user = await user_cache.aget(username_or_phone)
+        if user is not MISSING:
+            return user
+        user = await UserService.afind_user(username_or_phone)
+        await user_cache.aset(username_or_phone, user)
+        return user
+
+    @staticmethod
+    def load_users_by_ids(user_ids: List[int]) -> Dict[int, Tuple[str, str]]:
+        users = User.objects.only('id', 'username', 'phone_number').in_bulk(user_ids)
+        return {user_id: (user.username, user.phone_number) for user_id, user in users.items()}
+
+    @staticmethod
+    def get_users_by_ids(user_ids: List[int]) -> Dict[int, Tuple[str, str]]:
+        user_id_cache = get_user_id_cache()
+        found = user_id_cache.get_many(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if not missing:
+            return found
         try:
-            with transaction.atomic():
-                user = User.objects.filter(Q(username=username_or_phone) | Q(phone_number=username_or_phone)).first()
-                return user
-        except IntegrityError as exc:
-            raise exc
\ No newline at end of file
+            with replica_reads() as reads:
+                loaded = UserService.load_users_by_ids(missing)
+        except DatabaseError:
+            if reads.alias is None:
+                raise
+            loaded = UserService.load_users_by_ids(missing)
+        user_id_cache.set_many(loaded)
+        found.update(loaded)
+        return found
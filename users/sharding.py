@@ -0,0 +1,58 @@
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+
+def hash_tag(key: str) -> str:
+    # Как в Redis Cluster: если в ключе есть {...}, узел выбирается только по этой части.
+    start = key.find('{')
+    if start != -1:
+        end = key.find('}', start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str], vnodes: int = 160) -> None:
+        self.nodes = list(dict.fromkeys(nodes))
+        self.vnodes = vnodes
+        points: List[Tuple[int, str]] = sorted(
+            (ring_hash(f'{node}#{index}'), node) for node in self.nodes for index in range(vnodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def get_node(self, key: str) -> str:
+        if not self.hashes:
+            raise ValueError('Hash ring has no nodes')
+        index = bisect.bisect(self.hashes, ring_hash(hash_tag(key)))
+        return self.owners[index % len(self.owners)]
+
+    def group(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.get_node(key), []).append(key)
+        return groups
+
+
+_otp_ring: Optional[HashRing] = None
+_otp_ring_lock = threading.Lock()
+
+
+def get_otp_ring() -> Optional[HashRing]:
+    global _otp_ring
+    if not settings.OTP_REDIS_NODES:
+        return None
+    if _otp_ring is None or _otp_ring.nodes != settings.OTP_REDIS_NODES:
+        with _otp_ring_lock:
+            if _otp_ring is None or _otp_ring.nodes != settings.OTP_REDIS_NODES:
+                _otp_ring = HashRing(settings.OTP_REDIS_NODES, settings.OTP_RING_VNODES)
+    return _otp_ring
@@ -0,0 +1,91 @@
+import logging
+from typing import Optional, Tuple
+
+import redis
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .bloom import get_user_bloom
+from .cache import get_user_cache, get_user_id_cache
+from .db_router import get_read_pins
+from .models import User
+from .tokens import TokenService
+
+
+logger = logging.getLogger(__name__)
+
+
+def revoke_refresh_tokens(user_id: int) -> None:
+    try:
+        TokenService.revoke_sessions(user_id)
+    except redis.RedisError as exc:
+        # Refresh в базу не ходит, поэтому такие сессии доживут до своего срока.
+        logger.warning('Refresh token revocation failed: %s', exc)
+
+
+def invalidate_user_caches(identifiers: Tuple[str, ...], user_id: Optional[int]) -> None:
+    get_user_cache().invalidate(identifiers)
+    if user_id is not None:
+        get_user_id_cache().invalidate([user_id])
+
+
+@receiver(pre_save, sender=User)
+def remember_user_identifiers(sender, instance: User, update_fields=None, **kwargs) -> None:
+    if instance._state.adding or instance.pk is None:
+        instance._previous_identifiers = ()
+    elif update_fields is not None and not {'username', 'phone_number'} & set(update_fields):
+        instance._previous_identifiers = (instance.username, instance.phone_number)
+    elif hasattr(instance, '_loaded_identifiers'):
+        instance._previous_identifiers = instance._loaded_identifiers
+    else:
+        # Объект собран не из базы (например, User(pk=...)): прежние значения узнать больше негде.
+        previous = sender.objects.filter(pk=instance.pk).values_list('username', 'phone_number').first()
+        instance._previous_identifiers = previous or ()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_cache_on_save(sender, instance: User, **kwargs) -> None:
+    current = (instance.username, instance.phone_number)
+    previous = tuple(getattr(instance, '_previous_identifiers', ()))
+    instance._loaded_identifiers = current
+    # Сбрасываем после коммита: иначе параллельный запрос успеет снова закешировать старую строку.
+    user_id = instance.pk if previous not in ((), current) else None
+    transaction.on_commit(lambda: invalidate_user_caches(current + previous, user_id))
+
+
+@receiver(post_save, sender=User)
+def pin_reads_of_saved_user(sender, instance: User, **kwargs) -> None:
+    # Любая запись (пароль, is_active, имя) закрепляет чтения за основной базой: иначе отстающая
+    # реплика вернёт старую строку, и она снова попадёт в общий кеш. Закрепляем сразу, ещё до коммита,
+    # и повторно после него, чтобы окно отсчитывалось от момента, когда запись видна.
+    identifiers = (instance.username, instance.phone_number) + tuple(getattr(instance, '_previous_identifiers', ()))
+    get_read_pins().pin(identifiers)
+    transaction.on_commit(lambda: get_read_pins().pin(identifiers))
+
+
+@receiver(post_save, sender=User)
+def add_user_to_bloom(sender, instance: User, created: bool, **kwargs) -> None:
+    if created or tuple(getattr(instance, '_previous_identifiers', ())) != (instance.username, instance.phone_number):
+        get_user_bloom().add((instance.username, instance.phone_number))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_cache_on_delete(sender, instance: User, **kwargs) -> None:
+    identifiers, user_id = (instance.username, instance.phone_number), instance.pk
+    get_read_pins().pin(identifiers)
+    transaction.on_commit(lambda: get_read_pins().pin(identifiers))
+    transaction.on_commit(lambda: invalidate_user_caches(identifiers, user_id))
+
+
+@receiver(post_save, sender=User)
+def revoke_sessions_of_inactive_user(sender, instance: User, **kwargs) -> None:
+    if not instance.is_active:
+        user_id = instance.pk
+        transaction.on_commit(lambda: revoke_refresh_tokens(user_id))
+
+
+@receiver(post_delete, sender=User)
+def revoke_sessions_of_deleted_user(sender, instance: User, **kwargs) -> None:
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_refresh_tokens(user_id))
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+
+PRIVATE_SUFFIX = '.pem'
+PUBLIC_SUFFIX = '.pub.pem'
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+    private_key: Any = None
+
+    def jwk(self) -> Dict[str, Any]:
+        algorithm = OKPAlgorithm if self.algorithm == 'EdDSA' else RSAAlgorithm
+        return {**algorithm.to_jwk(self.public_key, as_dict=True), 'kid': self.kid, 'alg': self.algorithm, 'use': 'sig'}
+
+
+def key_algorithm(key: Any) -> str:
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return 'EdDSA'
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return 'RS256'
+    raise ValueError(f'Unsupported signing key type: {type(key).__name__}')
+
+
+def generate_private_key(algorithm: str) -> Any:
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == 'RS256':
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f'Unsupported algorithm: {algorithm}')
+
+
+def private_key_pem(private_key: Any) -> bytes:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+
+
+def public_key_pem(public_key: Any) -> bytes:
+    return public_key.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+
+def load_keys_dir(path: str) -> Dict[str, SigningKey]:
+    # <kid>.pem — закрытый ключ, которым можно подписывать; <kid>.pub.pem — выведенный
+    # из оборота ключ: им только проверяют ещё не истёкшие токены.
+    keys: Dict[str, SigningKey] = {}
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), 'rb') as file:
+            data = file.read()
+        if name.endswith(PUBLIC_SUFFIX):
+            kid = name[:-len(PUBLIC_SUFFIX)]
+            public_key = serialization.load_pem_public_key(data)
+            keys.setdefault(kid, SigningKey(kid, key_algorithm(public_key), public_key))
+        elif name.endswith(PRIVATE_SUFFIX):
+            kid = name[:-len(PRIVATE_SUFFIX)]
+            private_key = serialization.load_pem_private_key(data, password=None)
+            keys[kid] = SigningKey(kid, key_algorithm(private_key), private_key.public_key(), private_key)
+    return keys
+
+
+class KeyRing:
+    def __init__(self, keys: Dict[str, SigningKey], active_kid: Optional[str] = None, secret: Optional[str] = None) -> None:
+        self.keys = keys
+        self.secret = secret
+        signing = sorted(kid for kid, key in keys.items() if key.private_key is not None)
+        self.active_kid = active_kid or (signing[-1] if signing else None)
+        if self.active_kid is not None and self.active_kid not in signing:
+            raise ValueError(f'No private key for kid {self.active_kid}')
+        if self.active_kid is None and not secret:
+            raise ValueError('Neither signing keys nor SECRET_KEY_JWT are configured')
+        self.jwks_body = json.dumps({'keys': [key.jwk() for key in keys.values()]}).encode()
+        self.jwks_etag = '"' + hashlib.sha256(self.jwks_body).hexdigest()[:32] + '"'
+
+    @property
+    def algorithm(self) -> str:
+        return self.keys[self.active_kid].algorithm if self.active_kid is not None else 'HS256'
+
+    def sign(self, payload: Dict[str, Any]) -> str:
+        if self.active_kid is None:
+            return jwt.encode(payload, self.secret, algorithm='HS256')
+        key = self.keys[self.active_kid]
+        return jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers={'kid': key.kid})
+
+    def verification_key(self, token: str) -> Tuple[Any, str]:
+        # Алгоритм берём из ключа, а не из заголовка токена.
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            # Токены без kid подписаны общим секретом, они принимаются, пока секрет задан.
+            if not self.secret:
+                raise jwt.InvalidTokenError('Token has no kid')
+            return self.secret, 'HS256'
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f'Unknown kid {kid}')
+        return key.public_key, key.algorithm
+
+    def decode(self, token: str, **kwargs: Any) -> Dict[str, Any]:
+        key, algorithm = self.verification_key(token)
+        return jwt.decode(token, key, algorithms=[algorithm], **kwargs)
+
+
+_keyring: Optional[KeyRing] = None
+_keyring_config: Optional[Tuple] = None
+_keyring_lock = threading.Lock()
+
+
+def get_keyring() -> KeyRing:
+    # Ключи читаются с диска один раз на процесс; при смене настроек (тесты) связка собирается заново.
+    global _keyring, _keyring_config
+    config = (settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID, settings.SECRET_KEY_JWT)
+    if _keyring is None or _keyring_config != config:
+        with _keyring_lock:
+            if _keyring is None or _keyring_config != config:
+                keys = load_keys_dir(settings.JWT_KEYS_DIR) if settings.JWT_KEYS_DIR else {}
+                _keyring = KeyRing(keys, settings.JWT_ACTIVE_KID or None, settings.SECRET_KEY_JWT)
+                _keyring_config = config
+    return _keyring
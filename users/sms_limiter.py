@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import redis
+from django.conf import settings
+
+from .redis_client import get_redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# Корзина пополняется непрерывно со скоростью ARGV[1] токенов в секунду до ARGV[2].
+# Возвращает 0, если ARGV[3] токенов выдано, иначе сколько миллисекунд ждать.
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now_ms
+tokens = math.min(burst, tokens + math.max(0, now_ms - updated_at) * rate / 1000)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', now_ms)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class SMSRateLimiter:
+    KEY = 'sms:bucket'
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+
+    def try_acquire(self, count: int) -> float:
+        if self.rate <= 0:
+            return 0.0
+        try:
+            script = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+            wait_ms = script(keys=[self.KEY], args=[self.rate, self.burst, min(count, self.burst)])
+        except redis.RedisError as exc:
+            # Без Redis лимит не соблюсти, но терять коды из-за этого хуже, поэтому отправляем.
+            logger.warning('SMS rate limiter is unavailable: %s', exc)
+            return 0.0
+        return wait_ms / 1000
+
+    def acquire(self, count: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(count)
+            if not wait:
+                return True
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+
+_sms_limiter: Optional[SMSRateLimiter] = None
+_sms_limiter_lock = threading.Lock()
+
+
+def get_sms_limiter() -> SMSRateLimiter:
+    global _sms_limiter
+    if _sms_limiter is None:
+        with _sms_limiter_lock:
+            if _sms_limiter is None:
+                _sms_limiter = SMSRateLimiter(settings.SMS_RATE_PER_SECOND, settings.SMS_RATE_BURST)
+    return _sms_limiter
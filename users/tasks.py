@@ -1,42 +1,225 @@
 from celery import shared_task
-from typing import Any, Dict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
 import json
-import requests
 import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import requests
+
+from .importer import ImportJobStore, import_users
+from .metrics import SMS_RATE_WAIT, record_sms
+from .sms_limiter import SMSRateLimiter, get_sms_limiter
+
 
 class SMSSender:
     def __init__(self) -> None:
         self.api_key = os.getenv('SMS_API_KEY')
-        self.api_url = "https://lcab.smsprofi.ru/json/v1.0/sms/send/text"
+        self.api_url = settings.SMS_API_URL
         self.sender = os.getenv('SMS_SENDER')
-    
-    def send_sms(self, phone_number, otp_code) -> Dict[str, Any]:
-
-        headers = {
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.SMS_HTTP_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
             "X-Token": self.api_key,
             "Content-Type": "application/json"
-        }
+        })
 
-        message = {
+    @staticmethod
+    def build_message(phone_number, otp_code) -> Dict[str, Any]:
+        return {
             "recipient": phone_number,
             "text": f"Код для входа в личный кабинет - {otp_code}",
-            "source": "auth_service" 
+            "source": "auth_service"
         }
 
+    def send_batch(self, messages: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
         validate_payload = {
-            "messages": [message],
+            "messages": [self.build_message(phone_number, otp_code) for phone_number, otp_code in messages],
             "validate": True
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, data=json.dumps(validate_payload), timeout=5)
+            response = self.session.post(self.api_url, data=json.dumps(validate_payload), timeout=settings.SMS_HTTP_TIMEOUT)
             response.raise_for_status()
-            print(f"Код для входа в личный кабинет - {otp_code}")
-            return response.json()
         except requests.RequestException as e:
-            return {"detail": str(e)}
+            # Сетевые ошибки, 429 и 5xx временные, остальные ответы повторять бессмысленно.
+            status_code = e.response.status_code if e.response is not None else None
+            retryable = status_code is None or status_code == 429 or status_code >= 500
+            return [{"detail": str(e), "retryable": retryable} for _ in messages]
+        try:
+            data = response.json()
+        except ValueError as e:
+            return [{"detail": str(e)} for _ in messages]
+        return self.split_results(data, len(messages))
+
+    @staticmethod
+    def split_results(data: Any, count: int) -> List[Dict[str, Any]]:
+        # Провайдер отвечает по сообщениям в том же порядке, в котором они были переданы.
+        results = data.get("messages") if isinstance(data, dict) else None
+        if isinstance(results, list) and len(results) == count:
+            return results
+        return [data for _ in range(count)]
+
+    def send_sms(self, phone_number, otp_code) -> Dict[str, Any]:
+        return self.send_batch([(phone_number, otp_code)])[0]
+
+
+class SMSBatcher:
+    def __init__(
+        self, sender: SMSSender, max_batch: int, max_wait: float, max_inflight: int,
+        limiter: Optional[SMSRateLimiter] = None, max_rate_wait: float = 0.0,
+    ) -> None:
+        self.sender = sender
+        self.limiter = limiter
+        self.max_rate_wait = max_rate_wait
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending: List[Tuple[str, str, Future]] = []
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='sms-dispatch')
+        self.thread = threading.Thread(target=self.run, name='sms-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, phone_number, otp_code) -> Future:
+        future: Future = Future()
+        with self.condition:
+            self.pending.append((phone_number, otp_code, future))
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+                self.condition.notify()
+        return future
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.pending[:self.max_batch]
+                del self.pending[:self.max_batch]
+            self.executor.submit(self.flush, batch)
+
+    def acquire(self, count: int) -> bool:
+        if self.limiter is None:
+            return True
+        started = time.perf_counter()
+        acquired = self.limiter.acquire(count, self.max_rate_wait)
+        SMS_RATE_WAIT.observe(time.perf_counter() - started)
+        return acquired
+
+    def flush(self, batch: List[Tuple[str, str, Future]]) -> None:
+        # Задача, не дождавшаяся результата, отменяет своё сообщение; отменённые не отправляем,
+        # а остальные с этого момента отменить уже нельзя.
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            if self.acquire(len(batch)):
+                results = self.sender.send_batch([(phone_number, otp_code) for phone_number, otp_code, _ in batch])
+            else:
+                results = [{"detail": "Превышен лимит отправки смс.", "retryable": True} for _ in batch]
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, otp_code, future), result in zip(batch, results):
+            if "detail" not in result:
+                print(f"Код для входа в личный кабинет - {otp_code}")
+            future.set_result(result)
+
+
+_batcher: Optional[SMSBatcher] = None
+_batcher_pid: Optional[int] = None
+_batcher_lock = threading.Lock()
+
+
+def get_sms_batcher() -> SMSBatcher:
+    global _batcher, _batcher_pid
+    pid = os.getpid()
+    if _batcher is None or _batcher_pid != pid:
+        with _batcher_lock:
+            if _batcher is None or _batcher_pid != pid:
+                _batcher = SMSBatcher(
+                    SMSSender(),
+                    # Пакет списывает токены целиком, поэтому не может быть больше ёмкости корзины.
+                    max_batch=min(settings.SMS_BATCH_SIZE, settings.SMS_RATE_BURST),
+                    max_wait=settings.SMS_BATCH_WINDOW,
+                    max_inflight=settings.SMS_HTTP_POOL_SIZE,
+                    limiter=get_sms_limiter(),
+                    max_rate_wait=settings.SMS_RATE_MAX_WAIT,
+                )
+                _batcher_pid = pid
+    return _batcher
+
+
+def retry_countdown(retries: int) -> float:
+    delay = min(settings.SMS_RETRY_BACKOFF_MAX, settings.SMS_RETRY_BACKOFF * 2 ** retries)
+    # Случайная половина интервала разводит повторы сообщений, упавших одновременно.
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def sms_result_timeout() -> float:
+    # Окно пакета, ожидание лимита и HTTP-запрос с запасом в секунду.
+    return settings.SMS_HTTP_TIMEOUT + settings.SMS_BATCH_WINDOW + settings.SMS_RATE_MAX_WAIT + 1
+
+
+@shared_task(bind=True, max_retries=None)
+def send_sms_task(self, phone_number, otp_code, expires_at: Optional[float] = None) -> Dict[str, Any]:
+    if expires_at is not None and time.time() >= expires_at:
+        record_sms('expired')
+        return {"detail": "Код истёк до отправки."}
+
+    future = get_sms_batcher().submit(phone_number, otp_code)
+    try:
+        result = future.result(timeout=sms_result_timeout())
+    except FutureTimeout:
+        if not future.cancel():
+            # Сообщение уже ушло в пакет и может быть доставлено: повтор дал бы второе смс.
+            record_sms('unknown')
+            return {"detail": "Нет ответа об отправке смс, повтор не выполняется."}
+        result = {"detail": "Смс не отправлено вовремя.", "retryable": True}
+    except Exception as e:
+        result = {"detail": str(e), "retryable": True}
+    if not result.get("retryable"):
+        record_sms('failed' if "detail" in result else 'sent')
+        return result
+
+    # Код должен дойти, пока его ещё успеют ввести, иначе повтор только тратит лимит.
+    countdown = retry_countdown(self.request.retries)
+    if expires_at is not None and time.time() + countdown + settings.SMS_MIN_CODE_LIFETIME > expires_at:
+        record_sms('expired')
+        return result
+    if self.request.retries >= settings.SMS_MAX_RETRIES:
+        record_sms('exhausted')
+        return result
+    record_sms('retried')
+    raise self.retry(countdown=countdown)
+
 
 @shared_task
-def send_sms_task(phone_number, otp_code) -> Dict[str, Any]:
-    sender = SMSSender()
-    return sender.send_sms(phone_number, otp_code)
\ No newline at end of file
+def import_users_task(job_id: str, path: str, data_format: str) -> None:
+    jobs = ImportJobStore()
+    jobs.set(job_id, 'running')
+    try:
+        # newline='' нужен csv.reader для полей с переводами строк внутри кавычек.
+        with open(path, encoding='utf-8', newline='') as stream:
+            report = import_users(stream, data_format, progress=lambda report: jobs.set(job_id, 'running', report))
+    except Exception as exc:
+        jobs.set(job_id, 'failed', {'detail': str(exc)})
+        raise
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    jobs.set(job_id, 'done', report)
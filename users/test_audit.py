@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+
+from users.audit import LoginEventBuffer, login_event
+from users.models import LoginEvent, User
+
+
+class TestLoginEventBuffer(TestCase):
+    """Класс для тестирования пакетной записи событий входа"""
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='audit_test_username', password='audit_test_password', phone_number='81112223344')
+        self.request = RequestFactory().post('/api/sms/', HTTP_USER_AGENT='audit-test', REMOTE_ADDR='10.0.0.7')
+        # Поток не запускаем: в тестах пакеты пишутся вызовом flush в том же соединении.
+        self.buffer = LoginEventBuffer(batch_size=10, flush_interval=60, max_pending=3, put_timeout=0)
+        self.buffer.thread = object()
+
+    def test_flush_writes_events_and_last_login_in_bulk(self) -> None:
+        for outcome in ('failed', 'ok', 'ok'):
+            self.buffer.submit(login_event(self.request, outcome, self.user, self.user.username))
+
+        with self.assertNumQueries(5):
+            self.assertTrue(self.buffer.flush(self.buffer.take()))
+
+        events = LoginEvent.objects.filter(user=self.user)
+        self.assertEqual(sorted(events.values_list('outcome', flat=True)), ['failed', 'ok', 'ok'])
+        self.assertEqual(events.first().ip, '10.0.0.7')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, events.filter(outcome='ok').latest('created_at').created_at)
+
+    def test_full_buffer_drops_events(self) -> None:
+        accepted = [self.buffer.submit(login_event(self.request, 'failed', login=str(index))) for index in range(5)]
+        self.assertEqual(accepted, [True, True, True, False, False])
+
+    def test_failed_flush_keeps_events(self) -> None:
+        self.buffer.submit(login_event(self.request, 'ok', self.user))
+        batch = self.buffer.take()
+        with patch.object(LoginEventBuffer, 'write', side_effect=DatabaseError('down')):
+            self.assertFalse(self.buffer.flush(batch))
+        self.assertEqual(len(self.buffer.pending), 1)
+
+    def test_drain_writes_pending_and_later_events(self) -> None:
+        self.buffer.submit(login_event(self.request, 'ok', self.user))
+        self.buffer.drain()
+        self.buffer.submit(login_event(self.request, 'failed', self.user))
+
+        self.assertEqual(LoginEvent.objects.count(), 2)
+        self.assertEqual(len(self.buffer.pending), 0)
+
+    def test_deleted_user_does_not_break_batch(self) -> None:
+        event = login_event(self.request, 'ok', self.user)
+        self.user.delete()
+        self.buffer.submit(event)
+        self.assertTrue(self.buffer.flush(self.buffer.take()))
+        self.assertIsNone(LoginEvent.objects.get().user_id)
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_event_records_client_ip_behind_proxy(self) -> None:
+        request = RequestFactory().post('/api/sms/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.5')
+        self.assertEqual(login_event(request, 'ok')['ip'], '203.0.113.5')
+
+    def test_async_submit_after_drain_writes_off_the_event_loop(self) -> None:
+        self.buffer.drain()
+        with patch('users.audit.sync_to_async', wraps=sync_to_async) as wrapped:
+            self.assertTrue(async_to_sync(self.buffer.asubmit)(login_event(self.request, 'ok', self.user)))
+        wrapped.assert_called_once()
+        self.assertEqual(LoginEvent.objects.count(), 1)
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from users.blocklist import PasswordBlocklist, build_blocklist, password_digest
+from users.validators import BreachedPasswordValidator
+
+
+class TestPasswordBlocklist(SimpleTestCase):
+    """Класс для тестирования файла паролей из утечек"""
+
+    BREACHED = ['hunter2hunter2', 'correcthorse', 'Qwerty2024!']
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'blocklist.bin')
+        passwords = self.BREACHED + [f'filler-{index}' for index in range(1000)] + self.BREACHED
+        with open(self.path, 'wb') as output:
+            self.count = build_blocklist((password_digest(password) for password in passwords), output, run_size=100)
+
+    def test_build_deduplicates_and_sorts(self) -> None:
+        blocklist = PasswordBlocklist(self.path)
+        self.addCleanup(blocklist.close)
+        self.assertEqual(self.count, 1003)
+        self.assertEqual(blocklist.count, 1003)
+        records = [blocklist.record(index) for index in range(blocklist.count)]
+        self.assertEqual(records, sorted(records))
+        self.assertIn('correcthorse', blocklist)
+        self.assertIn('filler-999', blocklist)
+        self.assertNotIn('filler-1000', blocklist)
+
+    def test_validator_rejects_breached_password(self) -> None:
+        validator = BreachedPasswordValidator(path=self.path)
+        with self.assertRaises(ValidationError):
+            validator.validate('hunter2hunter2')
+        with self.assertRaises(ValidationError):
+            validator.validate('CorrectHorse')
+        validator.validate('a-unique-password-42')
+
+    def test_validator_falls_back_without_file(self) -> None:
+        validator = BreachedPasswordValidator(path=os.path.join(os.path.dirname(self.path), 'missing.bin'))
+        with self.assertRaises(ValidationError):
+            validator.validate('password')
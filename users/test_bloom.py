@@ -0,0 +1,43 @@
+import time
+from unittest.mock import patch
+
+from django.test import TestCase
+from rest_framework import serializers
+
+from users.bloom import UserBloomFilter
+from users.models import User
+from users.validators import BloomUniqueValidator
+
+
+class TestUserBloomFilter(TestCase):
+    """Класс для тестирования предварительной проверки уникальности"""
+
+    USERNAME = 'bloom_test_username'
+
+    def setUp(self) -> None:
+        self.bloom = UserBloomFilter(size=1 << 16, hashes=7, local_ttl=60)
+        self.bloom.bits = self.bloom.empty_bits()
+        self.bloom.checked_at = time.monotonic()
+        patcher = patch('users.validators.get_user_bloom', return_value=self.bloom)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.validator = BloomUniqueValidator(queryset=User.objects.all(), message='Пользователь с таким именем уже существует.')
+        self.field = serializers.CharField()
+        self.field.bind('username', serializers.Serializer())
+
+    def test_absent_value_skips_database(self) -> None:
+        self.assertFalse(self.bloom.might_contain(self.USERNAME))
+        with self.assertNumQueries(0):
+            self.validator(self.USERNAME, self.field)
+
+    def test_possible_hit_checks_database(self) -> None:
+        User.objects.create_user(username=self.USERNAME, password='bloom_test_password', phone_number='81231231231')
+        self.bloom.set_bits(self.bloom.bits, self.bloom.positions(self.USERNAME))
+        with self.assertRaises(serializers.ValidationError):
+            self.validator(self.USERNAME, self.field)
+
+    def test_not_built_filter_defers_to_database(self) -> None:
+        self.bloom.bits = None
+        self.assertTrue(self.bloom.might_contain(self.USERNAME))
+        with self.assertNumQueries(1):
+            self.validator(self.USERNAME, self.field)
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from users.cache import UserCache, UserIdCache, get_user_cache
+from users.models import User
+from users.services import UserService
+
+
+class TestUserCache(TestCase):
+    """Класс для тестирования кеша пользователей"""
+
+    USERNAME = 'cached_test_username'
+    PHONE = '86666666666'
+    NEW_PHONE = '85555555555'
+    PASSWORD = 'cached_test_password'
+
+    def setUp(self) -> None:
+        get_user_cache().local.clear()
+        self.user = User.objects.create_user(username=self.USERNAME, password=self.PASSWORD, phone_number=self.PHONE)
+
+    def test_repeated_lookup_skips_database(self) -> None:
+        UserService.get_user_by_phone_or_name(self.USERNAME)
+        with self.assertNumQueries(0):
+            by_name = UserService.get_user_by_phone_or_name(self.USERNAME)
+            by_phone = UserService.get_user_by_phone_or_name(self.PHONE)
+        self.assertEqual(by_name.pk, self.user.pk)
+        self.assertEqual(by_phone.phone_number, self.PHONE)
+        self.assertTrue(by_name.check_password(self.PASSWORD))
+
+    def test_save_invalidates_old_identifiers(self) -> None:
+        UserService.get_user_by_phone_or_name(self.PHONE)
+        self.user.phone_number = self.NEW_PHONE
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertIsNone(UserService.get_user_by_phone_or_name(self.PHONE))
+        self.assertEqual(UserService.get_user_by_phone_or_name(self.NEW_PHONE).pk, self.user.pk)
+
+    def test_invalidation_waits_for_commit(self) -> None:
+        UserService.get_user_by_phone_or_name(self.PHONE)
+        self.user.phone_number = self.NEW_PHONE
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            self.assertIsNotNone(get_user_cache().local.get(self.PHONE))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(get_user_cache().local.get(self.PHONE))
+
+    def test_save_of_loaded_user_skips_extra_select(self) -> None:
+        user = User.objects.get(pk=self.user.pk)
+        user.phone_number = self.NEW_PHONE
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertEqual(user._previous_identifiers, (self.USERNAME, self.PHONE))
+
+    def test_delete_invalidates_user(self) -> None:
+        UserService.get_user_by_phone_or_name(self.USERNAME)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(UserService.get_user_by_phone_or_name(self.USERNAME))
+
+
+class FakeCacheRedis:
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+
+    def pipeline(self, transaction: bool = True) -> 'FakeCacheRedis':
+        return self
+
+    def execute(self) -> None:
+        pass
+
+    def set(self, key: str, value: str, ex: int) -> None:
+        self.values[key] = value
+
+    def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.values.get(key) for key in keys]
+
+
+class TestUserCacheKeys(SimpleTestCase):
+    """Класс для тестирования разделения ключей кешей по логину и по id"""
+
+    def test_login_and_id_caches_do_not_overlap(self) -> None:
+        redis = FakeCacheRedis()
+        with patch('users.cache.get_redis_client', return_value=redis):
+            UserCache().set('id:5', None)
+            self.assertEqual(UserIdCache().get_many([5]), {})
+            UserIdCache().set_many({5: ('bulk_username', '81111111111')})
+            self.assertIsNone(UserCache().get('id:5'))
+            self.assertEqual(UserIdCache().get_many([5]), {5: ('bulk_username', '81111111111')})
+
+
+class TestUserLookupPlanner(TestCase):
+    """Класс для тестирования выбора индекса при поиске пользователя"""
+
+    def test_plan_by_identifier_shape(self) -> None:
+        self.assertEqual(UserService.plan_user_lookup('first_test_username'), [{'username': 'first_test_username'}])
+        self.assertEqual(UserService.plan_user_lookup('88888888888')[0], {'phone_number': '88888888888'})
+
+    def test_single_query_by_phone(self) -> None:
+        user = User.objects.create_user(username='planner_username', password='planner_password', phone_number='84444444444')
+        with self.assertNumQueries(1):
+            self.assertEqual(UserService.find_user('84444444444').pk, user.pk)
+
+    def test_phone_shaped_username_falls_back(self) -> None:
+        user = User.objects.create_user(username='83333333333', password='planner_password', phone_number='82222222222')
+        self.assertEqual(UserService.find_user('83333333333').pk, user.pk)
@@ -0,0 +1,136 @@
+from unittest.mock import MagicMock, patch
+
+import redis
+from django.db import DEFAULT_DB_ALIAS, OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from users.db_router import PrimaryReplicaRouter, ReadYourWritesPins, ReplicaMonitor, replica_reads
+from users.models import User
+
+
+class TestPrimaryReplicaRouter(SimpleTestCase):
+    """Класс для тестирования чтения с реплик"""
+
+    def setUp(self) -> None:
+        self.router = PrimaryReplicaRouter()
+        self.monitor = MagicMock()
+        self.monitor.choose.return_value = 'replica1'
+        self.pins = MagicMock()
+        self.pins.is_pinned.return_value = False
+        for target, value in (
+            ('users.db_router.replica_aliases', MagicMock(return_value=['replica1'])),
+            ('users.db_router.get_replica_monitor', MagicMock(return_value=self.monitor)),
+            ('users.db_router.get_read_pins', MagicMock(return_value=self.pins)),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_reads_outside_block_use_primary(self) -> None:
+        self.assertIsNone(self.router.db_for_read(User))
+        with replica_reads('router_test_username'):
+            self.assertEqual(self.router.db_for_write(User), DEFAULT_DB_ALIAS)
+
+    def test_lookup_reads_go_to_one_replica(self) -> None:
+        with replica_reads('router_test_username'):
+            self.assertEqual(self.router.db_for_read(User), 'replica1')
+            self.assertEqual(self.router.db_for_read(User), 'replica1')
+        self.monitor.choose.assert_called_once_with()
+        self.pins.is_pinned.assert_called_once_with(['router_test_username'])
+
+    def test_recent_write_is_read_from_primary(self) -> None:
+        self.pins.is_pinned.return_value = True
+        with replica_reads('router_test_username'):
+            self.assertIsNone(self.router.db_for_read(User))
+        self.monitor.choose.assert_not_called()
+
+    def test_failed_replica_is_marked_down(self) -> None:
+        with self.assertRaises(OperationalError):
+            with replica_reads('router_test_username'):
+                self.router.db_for_read(User)
+                raise OperationalError('replica is gone')
+        self.monitor.mark_down.assert_called_once_with('replica1')
+
+
+class TestReplicaMonitor(SimpleTestCase):
+    """Класс для тестирования проверки здоровья и отставания реплик"""
+
+    def make_monitor(self, lags: dict) -> ReplicaMonitor:
+        monitor = ReplicaMonitor(list(lags), interval=60, max_lag=2)
+
+        def measure(alias: str) -> float:
+            if lags[alias] is None:
+                raise OperationalError('connection refused')
+            return lags[alias]
+
+        patcher = patch.object(ReplicaMonitor, 'measure', side_effect=measure)
+        self.measure = patcher.start()
+        self.addCleanup(patcher.stop)
+        return monitor
+
+    def test_lagging_and_unavailable_replicas_are_skipped(self) -> None:
+        monitor = self.make_monitor({'replica1': 10.0, 'replica2': None, 'replica3': 0.5})
+        self.assertEqual(monitor.choose(), 'replica3')
+
+    def test_no_healthy_replica_falls_back_to_primary(self) -> None:
+        monitor = self.make_monitor({'replica1': 10.0, 'replica2': None})
+        self.assertIsNone(monitor.choose())
+
+    def test_checks_run_once_per_interval(self) -> None:
+        monitor = self.make_monitor({'replica1': 0.0})
+        monitor.choose()
+        monitor.choose()
+        self.assertEqual(self.measure.call_count, 1)
+        monitor.mark_down('replica1')
+        self.assertIsNone(monitor.choose())
+
+
+@patch('users.db_router.replica_aliases', MagicMock(return_value=['replica1']))
+class TestReadYourWritesPins(SimpleTestCase):
+    """Класс для тестирования чтения своих записей после регистрации"""
+
+    def test_pin_is_visible_in_process_without_redis(self) -> None:
+        pins = ReadYourWritesPins(seconds=5)
+        with patch('users.db_router.get_redis_client') as get_redis_client:
+            get_redis_client.return_value.pipeline.side_effect = redis.ConnectionError('down')
+            pins.pin(['pins_test_username', '81231231231'])
+            self.assertTrue(pins.is_pinned(['81231231231']))
+
+    def test_other_workers_pins_come_from_redis(self) -> None:
+        pins = ReadYourWritesPins(seconds=5)
+        with patch('users.db_router.get_redis_client') as get_redis_client:
+            get_redis_client.return_value.exists.return_value = 1
+            self.assertTrue(pins.is_pinned(['pins_test_username']))
+            get_redis_client.return_value.exists.return_value = 0
+            self.assertFalse(pins.is_pinned(['pins_test_username']))
+            get_redis_client.return_value.exists.side_effect = redis.ConnectionError('down')
+            self.assertTrue(pins.is_pinned(['pins_test_username']))
+
+
+class TestWritesPinReads(TestCase):
+    """Класс для тестирования закрепления чтений за основной базой после любой записи пользователя"""
+
+    def setUp(self) -> None:
+        patcher = patch('users.signals.get_read_pins')
+        self.pins = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='pinned_username', password='pinned_password', phone_number='81212121212')
+        self.pins.reset_mock()
+
+    def test_deactivation_pins_before_and_after_commit(self) -> None:
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save(update_fields=['is_active'])
+            self.assertEqual(self.pins.pin.call_count, 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.pins.pin.call_count, 2)
+        self.assertIn('pinned_username', self.pins.pin.call_args.args[0])
+
+    def test_rename_pins_old_and_new_identifiers(self) -> None:
+        self.user.username = 'renamed_username'
+        self.user.save()
+        self.assertEqual(
+            set(self.pins.pin.call_args.args[0]),
+            {'renamed_username', 'pinned_username', '81212121212'},
+        )
@@ -0,0 +1,61 @@
+import os
+import signal
+
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from users.hashing import HashingPool, HashingUnavailable, _timed_make_password
+
+
+class TestHashingPool(SimpleTestCase):
+    """Класс для тестирования пула хеширования паролей"""
+
+    PASSWORD = 'first_test_password'
+
+    def make_pool(self, workers: int, queue_depth: int) -> HashingPool:
+        pool = HashingPool(workers=workers, queue_depth=queue_depth)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_make_and_check_password_in_pool(self) -> None:
+        pool = self.make_pool(workers=1, queue_depth=1)
+        encoded = pool.make_password(self.PASSWORD)
+        self.assertTrue(check_password(self.PASSWORD, encoded))
+        self.assertTrue(pool.check_password(self.PASSWORD, encoded))
+        self.assertFalse(pool.check_password('wrong_password', encoded))
+
+        stats = pool.stats.snapshot()
+        self.assertEqual(stats['completed'], 3)
+        self.assertGreater(stats['compute_seconds_avg'], 0)
+
+    def test_full_pool_sheds_load(self) -> None:
+        pool = self.make_pool(workers=1, queue_depth=0)
+        pool.get_executor().submit(int).result()
+        future = pool.submit(_timed_make_password, self.PASSWORD)
+        with self.assertRaises(HashingUnavailable):
+            pool.submit(_timed_make_password, self.PASSWORD)
+        future.result()
+        self.assertEqual(pool.stats.snapshot()['rejected'], 1)
+
+    def test_inline_mode_without_workers(self) -> None:
+        pool = self.make_pool(workers=0, queue_depth=0)
+        self.assertTrue(pool.check_password(self.PASSWORD, pool.make_password(self.PASSWORD)))
+        self.assertEqual(pool.stats.snapshot()['wait_seconds_max'], 0)
+
+    def test_waits_are_exported_as_metrics(self) -> None:
+        count = REGISTRY.get_sample_value('password_hashing_compute_seconds_count') or 0
+        pool = self.make_pool(workers=0, queue_depth=0)
+        pool.make_password(self.PASSWORD)
+        self.assertEqual(REGISTRY.get_sample_value('password_hashing_compute_seconds_count'), count + 1)
+
+    def test_broken_pool_is_recreated(self) -> None:
+        pool = self.make_pool(workers=1, queue_depth=1)
+        broken = pool.get_executor()
+        os.kill(broken.submit(os.getpid).result(), signal.SIGKILL)
+        try:
+            pool.make_password(self.PASSWORD)
+        except HashingUnavailable:
+            pass
+        self.assertTrue(check_password(self.PASSWORD, pool.make_password(self.PASSWORD)))
+        self.assertIsNot(pool.get_executor(), broken)
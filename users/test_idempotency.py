@@ -0,0 +1,145 @@
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from django.test import override_settings
+
+from users.idempotency import LoginReplayStore
+from users.test_user import BaseTestUser
+
+
+class FakeReplayRedis:
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+
+    def register_script(self, script: str):
+        def run(keys: List[str], args: List[Any]):
+            current = self.values.get(keys[0])
+            if current is None:
+                self.values[keys[0]] = args[0]
+            return current
+        return run
+
+    def set(self, key: str, value: str, ex: int) -> None:
+        self.values[key] = value
+
+    def delete(self, key: str) -> None:
+        self.values.pop(key, None)
+
+
+@override_settings(LOGIN_REPLAY_TTL=10, LOGIN_IDEMPOTENCY_KEY_TTL=60)
+class TestLoginReplay(BaseTestUser):
+    """Класс для тестирования повторов запроса входа"""
+
+    def setUp(self) -> None:
+        self.create_user()
+        self.redis = FakeReplayRedis()
+        patchers = {
+            'otp_manager': patch(self.OTP_PATCH),
+            'send_sms_task': patch(self.OTP_TASK),
+            'redis': patch('users.idempotency.get_redis_client', return_value=self.redis),
+            'hashing_pool': patch('users.serializers.get_hashing_pool'),
+        }
+        mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+        self.send_sms_task = mocks['send_sms_task']
+        self.hashing_pool = mocks['hashing_pool'].return_value
+        self.hashing_pool.check_password.side_effect = lambda password, encoded: password == self.FIRST_VALID_PASSWORD
+
+    def post_login(self, password: str, **headers: str):
+        return self.client.post(
+            '/api/login/', {'username_or_phone': self.FIRST_VALID_USERNAME, 'password': password}, **headers,
+        )
+
+    def test_retry_replays_response_without_hashing(self) -> None:
+        first = self.post_login(self.FIRST_VALID_PASSWORD)
+        retry = self.post_login(self.FIRST_VALID_PASSWORD)
+
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(self.hashing_pool.check_password.call_count, 1)
+        self.send_sms_task.assert_called_once()
+
+    def test_wrong_password_is_replayed_and_other_password_is_checked(self) -> None:
+        self.assertEqual(self.post_login(self.SECOND_VALID_PASSWORD).status_code, 400)
+        self.assertEqual(self.post_login(self.SECOND_VALID_PASSWORD).json()['detail'][0], 'Введён неправильный пароль.')
+        self.assertEqual(self.post_login(self.FIRST_VALID_PASSWORD).status_code, 200)
+        self.assertEqual(self.hashing_pool.check_password.call_count, 2)
+
+    def test_idempotency_key_with_other_body_is_rejected(self) -> None:
+        self.post_login(self.FIRST_VALID_PASSWORD, HTTP_IDEMPOTENCY_KEY='login-1')
+        response = self.post_login(self.SECOND_VALID_PASSWORD, HTTP_IDEMPOTENCY_KEY='login-1')
+        self.assertEqual(response.status_code, 422)
+
+    def test_concurrent_duplicate_gets_conflict(self) -> None:
+        store = LoginReplayStore()
+        key = store.key_for({'username_or_phone': self.FIRST_VALID_USERNAME, 'password': self.FIRST_VALID_PASSWORD}, None)
+        self.redis.values[key.redis_key] = store.pending(key)
+
+        response = self.post_login(self.FIRST_VALID_PASSWORD)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.hashing_pool.check_password.assert_not_called()
+
+    def test_unavailable_redis_does_not_block_login(self) -> None:
+        broken = MagicMock()
+        broken.register_script.side_effect = redis.ConnectionError('down')
+        broken.set.side_effect = redis.ConnectionError('down')
+        with patch('users.idempotency.get_redis_client', return_value=broken):
+            self.assertEqual(self.post_login(self.FIRST_VALID_PASSWORD).status_code, 200)
+            self.assertEqual(self.post_login(self.FIRST_VALID_PASSWORD).status_code, 200)
+        self.assertEqual(self.hashing_pool.check_password.call_count, 2)
+
+
+    def test_non_object_body_is_a_validation_error(self) -> None:
+        response = self.client.post('/api/login/', [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/async/login/', [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeAsyncReplayRedis(FakeReplayRedis):
+    def register_script(self, script: str):
+        run = super().register_script(script)
+
+        async def arun(keys: List[str], args: List[Any]):
+            return run(keys, args)
+        return arun
+
+    async def set(self, key: str, value: str, ex: int) -> None:
+        super().set(key, value, ex)
+
+    async def delete(self, key: str) -> None:
+        super().delete(key)
+
+
+@override_settings(LOGIN_REPLAY_TTL=10, LOGIN_IDEMPOTENCY_KEY_TTL=60)
+class TestAsyncLoginReplay(BaseTestUser):
+    """Класс для тестирования повторов асинхронного запроса входа"""
+
+    def setUp(self) -> None:
+        self.create_user()
+        patchers = {
+            'otp_manager': patch('users.views.AsyncOTPManager'),
+            'send_sms_task': patch('users.views.send_sms_task.delay'),
+            'redis': patch('users.idempotency.get_async_redis_client', return_value=FakeAsyncReplayRedis()),
+            'hashing_pool': patch('users.views.get_hashing_pool'),
+        }
+        mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+        mocks['otp_manager'].return_value.save_otp = AsyncMock(return_value=None)
+        self.send_sms_task = mocks['send_sms_task']
+        self.hashing_pool = mocks['hashing_pool'].return_value
+        self.hashing_pool.acheck_password = AsyncMock(return_value=True)
+
+    def test_retry_replays_response_without_hashing(self) -> None:
+        payload = {'username_or_phone': self.FIRST_VALID_USERNAME, 'password': self.FIRST_VALID_PASSWORD}
+        first = self.client.post('/api/async/login/', payload, format='json')
+        retry = self.client.post('/api/async/login/', payload, format='json')
+
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(retry.json(), first.json())
+        self.hashing_pool.acheck_password.assert_awaited_once()
+        self.send_sms_task.assert_called_once()
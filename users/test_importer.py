@@ -0,0 +1,142 @@
+import io
+import json
+import tempfile
+from typing import Dict, Optional
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users.importer import import_users
+from users.models import User
+from users.tasks import import_users_task
+
+
+class FakeJobRedis:
+    def __init__(self) -> None:
+        self.values: Dict[str, str] = {}
+
+    def set(self, key: str, value: str, ex: int) -> None:
+        self.values[key] = value
+
+    def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+
+class TestUserImporter(TestCase):
+    """Класс для тестирования массового импорта пользователей"""
+
+    def setUp(self) -> None:
+        User.objects.create_user(username='existing_username', password='existing_password', phone_number='89999999999')
+
+    def test_import_reports_invalid_and_duplicate_rows(self) -> None:
+        rows = [
+            {'username': 'import_first', 'phone_number': '81111111111', 'password': 'import_password'},
+            {'username': 'import_second', 'phone_number': '82222222222', 'password_hash': make_password('hashed_password')},
+            {'username': 'existing_username', 'phone_number': '83333333333', 'password': 'import_password'},
+            {'username': 'import_third', 'phone_number': '81111111111', 'password': 'import_password'},
+            {'username': 'import_fourth', 'phone_number': '123', 'password': 'import_password'},
+            {'username': 'import_fifth', 'phone_number': '84444444444', 'password_hash': 'plain-text'},
+        ]
+        stream = io.StringIO('\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+        report = import_users(stream, 'ndjson', chunk_size=2)
+
+        self.assertEqual((report['total'], report['created'], report['failed']), (7, 2, 5))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4, 5, 6, 7])
+        self.assertIn('username', report['errors'][0]['errors'])
+        self.assertIn('phone_number', report['errors'][1]['errors'])
+        self.assertTrue(User.objects.get(username='import_first').check_password('import_password'))
+        self.assertTrue(User.objects.get(username='import_second').check_password('hashed_password'))
+
+    def test_import_csv(self) -> None:
+        stream = io.StringIO('username,phone_number,password\nimport_csv,85555555555,import_password\n')
+        report = import_users(stream, 'csv')
+        self.assertEqual(report['created'], 1)
+        self.assertTrue(User.objects.filter(phone_number='85555555555').exists())
+
+    def test_import_validates_plain_passwords(self) -> None:
+        rows = [
+            {'username': 'import_weak', 'phone_number': '81111111111', 'password': '12345'},
+            {'username': 'import_strong', 'phone_number': '82222222222', 'password': 'import_password'},
+        ]
+        stream = io.StringIO('\n'.join(json.dumps(row) for row in rows))
+        report = import_users(stream, 'ndjson')
+        self.assertEqual((report['created'], report['failed']), (1, 1))
+        self.assertEqual(report['errors'][0]['row'], 1)
+        self.assertIn('password', report['errors'][0]['errors'])
+        self.assertFalse(User.objects.filter(username='import_weak').exists())
+
+
+class TestUserImportView(APITestCase):
+    """Класс для тестирования эндпоинта импорта пользователей"""
+
+    url = reverse('users_import')
+    body = json.dumps({'username': 'import_api', 'phone_number': '86666666666', 'password': 'import_password'})
+
+    def setUp(self) -> None:
+        self.redis = FakeJobRedis()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(USER_IMPORT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = patch('users.importer.get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_requires_admin(self) -> None:
+        user = User.objects.create_user(username='regular_username', password='regular_password', phone_number='87777777777')
+        self.client.force_authenticate(user)
+        with patch('users.views.import_users_task.delay') as delay:
+            response = self.client.post(self.url, self.body, content_type='application/x-ndjson')
+        delay.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(User.objects.filter(username='import_api').exists())
+
+    def test_admin_import_runs_in_background(self) -> None:
+        admin = User.objects.create_superuser(username='admin_username', password='admin_password', phone_number='87777777777')
+        self.client.force_authenticate(admin)
+        with patch('users.views.import_users_task.delay') as delay:
+            response = self.client.post(self.url, self.body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        status_url = reverse('users_import_status', args=[job_id])
+        self.assertEqual(self.client.get(status_url).data['status'], 'queued')
+        self.assertFalse(User.objects.filter(username='import_api').exists())
+
+        import_users_task(*delay.call_args.args)
+        job = self.client.get(status_url).data
+        self.assertEqual((job['status'], job['created'], job['failed']), ('done', 1, 0))
+        self.assertTrue(User.objects.filter(username='import_api').exists())
+
+    def test_unknown_job(self) -> None:
+        admin = User.objects.create_superuser(username='admin_username', password='admin_password', phone_number='87777777777')
+        self.client.force_authenticate(admin)
+        response = self.client.get(reverse('users_import_status', args=['missing']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_csv_with_charset_and_quoted_newlines(self) -> None:
+        admin = User.objects.create_superuser(username='admin_username', password='admin_password', phone_number='87777777777')
+        self.client.force_authenticate(admin)
+        body = 'username,phone_number,password\r\nimport_csv,85555555555,"import\r\npassword"\r\n'
+        with patch('users.views.import_users_task.delay') as delay:
+            response = self.client.post(self.url, body, content_type='text/csv; charset=utf-8')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(delay.call_args.args[1].endswith('.csv'))
+
+        import_users_task(*delay.call_args.args)
+        self.assertEqual(self.client.get(reverse('users_import_status', args=[response.data['job_id']])).data['created'], 1)
+        self.assertTrue(User.objects.get(username='import_csv').check_password('import\r\npassword'))
+
+    def test_rejects_unknown_type_and_empty_body(self) -> None:
+        admin = User.objects.create_superuser(username='admin_username', password='admin_password', phone_number='87777777777')
+        self.client.force_authenticate(admin)
+        with patch('users.views.import_users_task.delay') as delay:
+            unsupported = self.client.post(self.url, self.body, content_type='application/json')
+            empty = self.client.post(self.url, '', content_type='application/x-ndjson')
+        self.assertEqual(unsupported.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(empty.status_code, status.HTTP_400_BAD_REQUEST)
+        delay.assert_not_called()
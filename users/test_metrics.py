@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from users.test_user import BaseTestUser
+
+
+class TestAuthMetrics(BaseTestUser):
+    """Класс для тестирования метрик этапов авторизации"""
+
+    def setUp(self) -> None:
+        self.create_user()
+        for target in (self.OTP_PATCH, self.OTP_TASK):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def sample(name: str, labels: dict) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def test_login_records_stages_and_outcomes(self) -> None:
+        wrong = self.sample('auth_outcomes_total', {'flow': 'login', 'outcome': 'wrong_password'})
+        ok = self.sample('auth_outcomes_total', {'flow': 'login', 'outcome': 'ok'})
+        enqueued = self.sample('auth_stage_seconds_count', {'stage': 'sms_enqueue'})
+
+        self.client.post('/api/login/', {'username_or_phone': self.FIRST_VALID_USERNAME, 'password': self.SECOND_VALID_PASSWORD})
+        self.client.post('/api/login/', {'username_or_phone': self.FIRST_VALID_USERNAME, 'password': self.FIRST_VALID_PASSWORD})
+
+        self.assertEqual(self.sample('auth_outcomes_total', {'flow': 'login', 'outcome': 'wrong_password'}), wrong + 1)
+        self.assertEqual(self.sample('auth_outcomes_total', {'flow': 'login', 'outcome': 'ok'}), ok + 1)
+        self.assertEqual(self.sample('auth_stage_seconds_count', {'stage': 'sms_enqueue'}), enqueued + 1)
+
+    def test_metrics_endpoint(self) -> None:
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'auth_stage_seconds_bucket{le="0.001",stage="check_password"}', response.content)
+
+    def test_redis_pool_is_exported(self) -> None:
+        stats = {'max': 50, 'created': 3, 'in_use': 1, 'idle': 2}
+        with patch('users.metrics.get_pool_stats', return_value=stats):
+            response = self.client.get('/metrics')
+        self.assertIn(b'redis_pool_connections{state="in_use"} 1.0', response.content)
+        self.assertEqual(self.sample('redis_pool_connections', {'state': 'max'}), 50)
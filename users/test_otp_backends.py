@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from users.otp_backends import LocalOTPBackend, get_otp_backend
+from users.utils import AsyncOTPManager, OTPManager, OTPSendError
+
+
+class TestLocalOTPBackend(SimpleTestCase):
+    """Класс для тестирования хранения кодов в памяти процесса"""
+
+    KEY = OTPManager.get_key('first_test_username')
+
+    def setUp(self) -> None:
+        self.backend = LocalOTPBackend(max_entries=3)
+
+    def test_issue_limit_and_consume(self) -> None:
+        self.assertEqual(self.backend.issue(self.KEY, '1234', 120, 60, 1), 0)
+        self.assertEqual(self.backend.get(self.KEY), '1234')
+        self.assertGreater(self.backend.issue(self.KEY, '5678', 120, 60, 1), 0)
+        self.assertEqual(self.backend.consume(self.KEY, '0000'), 0)
+        self.assertEqual(self.backend.consume(self.KEY, '1234'), 1)
+        self.assertEqual(self.backend.consume(self.KEY, '1234'), -1)
+        self.assertIsNone(self.backend.get(self.KEY))
+
+    def test_expired_code_is_rejected_and_evicted(self) -> None:
+        with patch('users.otp_backends.time.time', return_value=1000.0):
+            self.backend.issue(self.KEY, '1234', 120, 60, 1)
+        with patch('users.otp_backends.time.time', return_value=1121.0):
+            self.assertEqual(self.backend.consume(self.KEY, '1234'), -1)
+            self.backend.issue(OTPManager.get_key('second_test_username'), '1234', 120, 60, 1)
+        self.assertEqual(len(self.backend), 1)
+
+    def test_memory_is_bounded(self) -> None:
+        for index in range(10):
+            self.backend.issue(OTPManager.get_key(f'user{index}'), '1234', 120 + index, 60, 1)
+        self.assertEqual(len(self.backend), 3)
+        self.assertEqual(self.backend.get(OTPManager.get_key('user9')), '1234')
+        self.assertIsNone(self.backend.get(OTPManager.get_key('user0')))
+
+    @override_settings(OTP_BACKEND='users.otp_backends.LocalOTPBackend')
+    def test_managers_use_configured_backend(self) -> None:
+        self.assertIsInstance(get_otp_backend(), LocalOTPBackend)
+        manager = OTPManager()
+        manager.save_otp('local_test_username', '4321')
+        with self.assertRaises(OTPSendError):
+            manager.save_otp('local_test_username', '4321')
+
+        async def verify() -> bool:
+            return await AsyncOTPManager().verify_otp('local_test_username', '4321')
+
+        self.assertTrue(asyncio.run(verify()))
@@ -0,0 +1,62 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import override_settings
+
+from users.profiling import ProfilingMiddleware
+from users.test_user import BaseTestUser
+
+
+class TestProfilingMiddleware(BaseTestUser):
+    """Класс для тестирования профилирования запросов"""
+
+    def setUp(self) -> None:
+        self.patch_login_events()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profiled(self, **overrides):
+        options = {'PROFILING_ENABLED': True, 'PROFILING_DIR': self.directory, 'PROFILING_URL_NAMES': ['login']}
+        return override_settings(**{**options, **overrides})
+
+    def dumps(self):
+        return sorted(os.listdir(self.directory))
+
+    def login(self, **headers):
+        return self.client.post('/api/login/', {'username_or_phone': 'nobody', 'password': 'wrong'}, headers=headers)
+
+    def test_disabled_middleware_is_not_used(self) -> None:
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+
+    def test_sampled_requests_are_dumped_for_selected_urls(self) -> None:
+        with self.profiled(PROFILING_SAMPLE_RATE=1.0):
+            self.login()
+            self.client.get('/api/ready/')
+        dumps = self.dumps()
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].startswith('login-') and dumps[0].endswith('-x1.prof'))
+
+    def test_header_requires_token(self) -> None:
+        with self.profiled(PROFILING_TOKEN='profile-secret'):
+            self.login(**{'X-Profile': 'wrong'})
+            self.assertEqual(self.dumps(), [])
+            response = self.login(**{'X-Profile': 'profile-secret'})
+        self.assertEqual(self.dumps(), [response['X-Profile-Dump']])
+
+    def test_samples_are_aggregated_and_summarized(self) -> None:
+        with self.profiled(PROFILING_SAMPLE_RATE=1.0, PROFILING_AGGREGATE=2):
+            for _ in range(2):
+                self.login()
+        dumps = self.dumps()
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith('-x2.prof'))
+
+        out = StringIO()
+        call_command('profile_summary', dir=self.directory, url_name='login', limit=5, stdout=out)
+        self.assertIn('Дампов: 1, запросов: 2', out.getvalue())
+        self.assertIn('function calls', out.getvalue())
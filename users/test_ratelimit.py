@@ -0,0 +1,113 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import redis
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from prometheus_client import REGISTRY
+
+from users import ratelimit
+from users.loadtest import rate_limited_endpoints
+from users.ratelimit import client_ip, parse_rate, request_identifier
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_IP='5/60', RATE_LIMIT_IDENTIFIER='3/60', RATE_LIMIT_GLOBAL='100/1')
+class TestRateLimitMiddleware(TestCase):
+    """Класс для тестирования ограничения частоты запросов до DRF"""
+
+    PAYLOAD = {'username_or_phone': 'ratelimit_test_username', 'password': 'ratelimit_test_password'}
+
+    def setUp(self) -> None:
+        ratelimit._limiter = None
+        self.script = MagicMock(return_value=[1, 0, 0])
+        self.async_script = AsyncMock(return_value=[1, 0, 0])
+        for name, script in (('get_redis_client', self.script), ('get_async_redis_client', self.async_script)):
+            patcher = patch(f'users.ratelimit.{name}')
+            patcher.start().return_value.register_script.return_value = script
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def sample(result: str) -> float:
+        return REGISTRY.get_sample_value('rate_limit_requests_total', {'result': result}) or 0.0
+
+    def test_rejected_request_gets_429_with_retry_after(self) -> None:
+        self.script.return_value = [0, 17, 2]
+        response = self.client.post('/api/login/', self.PAYLOAD, content_type='application/json', REMOTE_ADDR='10.1.0.1')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '17')
+        self.script.assert_called_once_with(
+            keys=['rl:ip:10.1.0.1', 'rl:identifier:ratelimit_test_username', 'rl:global:all'],
+            args=[5, 60, 3, 60, 100, 1],
+        )
+
+    def test_blocked_ip_is_rejected_without_redis(self) -> None:
+        local = self.sample('local_ip')
+        self.script.return_value = [0, 30, 1]
+        self.client.post('/api/register/', {'username': 'other'}, REMOTE_ADDR='10.1.0.2')
+        response = self.client.post('/api/login/', self.PAYLOAD, REMOTE_ADDR='10.1.0.2')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.script.call_count, 1)
+        self.assertEqual(self.sample('local_ip'), local + 1)
+
+    def test_global_limit_is_not_cached_locally(self) -> None:
+        self.script.return_value = [0, 1, 3]
+        self.client.post('/api/sms/', self.PAYLOAD, REMOTE_ADDR='10.1.0.3')
+        self.client.post('/api/sms/', self.PAYLOAD, REMOTE_ADDR='10.1.0.3')
+        self.assertEqual(self.script.call_count, 2)
+
+    def test_other_paths_and_methods_are_not_limited(self) -> None:
+        self.client.get('/api/ready/')
+        self.client.get('/api/login/')
+        self.script.assert_not_called()
+
+    def test_unavailable_redis_lets_requests_through(self) -> None:
+        errors = self.sample('error')
+        self.script.side_effect = redis.ConnectionError('down')
+        response = self.client.post('/api/login/', self.PAYLOAD, REMOTE_ADDR='10.1.0.4')
+
+        self.assertNotEqual(response.status_code, 429)
+        self.assertEqual(self.sample('error'), errors + 1)
+
+    async def test_async_stack_is_limited(self) -> None:
+        self.async_script.return_value = [0, 5, 1]
+        response = await self.async_client.post(
+            '/api/async/login/', self.PAYLOAD, content_type='application/json', REMOTE_ADDR='10.1.0.5',
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        self.async_script.assert_awaited_once()
+
+
+class TestRateLimitParsing(SimpleTestCase):
+    """Класс для тестирования разбора лимитов"""
+
+    def test_parse_rate(self) -> None:
+        self.assertEqual(parse_rate('30/60'), (30, 60))
+        self.assertEqual(parse_rate('10'), (10, 1))
+        self.assertIsNone(parse_rate(''))
+
+    @override_settings(RATE_LIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR', RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_client_ip_ignores_spoofed_forwarded_entries(self) -> None:
+        request = RequestFactory().post('/api/login/', HTTP_X_FORWARDED_FOR='6.6.6.6, 10.1.0.9', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(client_ip(request), '10.1.0.9')
+        with self.settings(RATE_LIMIT_TRUSTED_PROXIES=2):
+            self.assertEqual(client_ip(request), '6.6.6.6')
+            request.META['HTTP_X_FORWARDED_FOR'] = '10.1.0.9'
+            self.assertEqual(client_ip(request), '10.1.0.9')
+
+    def test_malformed_content_length(self) -> None:
+        request = RequestFactory().post('/api/login/', {'username_or_phone': 'someone'})
+        request.META['CONTENT_LENGTH'] = 'abc'
+        self.assertEqual(request_identifier(request), '')
+
+
+class TestBenchRateLimitCheck(SimpleTestCase):
+    """Класс для тестирования проверки нагрузочных тестов на ответы 429"""
+
+    def test_endpoints_dominated_by_429(self) -> None:
+        summaries = {
+            'login': {'requests': 100, 'statuses': {'200': 30, '429': 70}},
+            'sms': {'requests': 100, 'statuses': {'200': 98, '429': 2}},
+            'register': {'requests': 0, 'statuses': {}},
+        }
+        self.assertEqual(rate_limited_endpoints(summaries, 0.05), ['login'])
@@ -0,0 +1,32 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from users import redis_client
+from users.otp_backends import RedisOTPBackend
+from users.utils import OTPManager
+
+
+class TestRedisPool(SimpleTestCase):
+    """Класс для тестирования общего пула соединений Redis"""
+
+    def setUp(self) -> None:
+        redis_client.reset_redis_pool()
+        self.addCleanup(redis_client.reset_redis_pool)
+
+    def test_pool_is_shared_between_managers(self) -> None:
+        first = RedisOTPBackend().client_for(OTPManager.get_key('first_test_username'))
+        second = RedisOTPBackend().client_for(OTPManager.get_key('second_test_username'))
+        self.assertIs(first.connection_pool, second.connection_pool)
+
+    def test_pool_is_rebuilt_in_forked_process(self) -> None:
+        pool = redis_client.get_redis_pool()
+        with patch('users.redis_client.os.getpid', return_value=pool.pid + 1):
+            self.assertIsNot(redis_client.get_redis_pool(), pool)
+
+    def test_pool_stats(self) -> None:
+        self.assertEqual(redis_client.get_pool_stats()['created'], 0)
+        redis_client.get_redis_pool()
+        stats = redis_client.get_pool_stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 0)
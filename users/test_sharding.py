@@ -0,0 +1,75 @@
+import os
+import unittest
+from collections import Counter
+
+from django.test import SimpleTestCase, override_settings
+
+from users import redis_client
+from users.otp_backends import RedisOTPBackend
+from users.sharding import HashRing, hash_tag
+from users.utils import OTPManager
+
+
+NODES = ['redis://127.0.0.1:6380/0', 'redis://127.0.0.1:6381/0', 'redis://127.0.0.1:6382/0']
+
+
+class TestHashRing(SimpleTestCase):
+    """Класс для тестирования консистентного хеширования ключей OTP"""
+
+    KEYS = [OTPManager.get_key(f'user{index}') for index in range(10000)]
+
+    def test_keys_of_one_user_share_node(self) -> None:
+        ring = HashRing(NODES)
+        self.assertEqual(hash_tag('otp:{first_test_username}'), 'first_test_username')
+        self.assertEqual(ring.get_node('otp:{first_test_username}'), ring.get_node('sms_limit:{first_test_username}'))
+
+    def test_keys_are_balanced(self) -> None:
+        counts = Counter(HashRing(NODES).get_node(key) for key in self.KEYS)
+        self.assertEqual(set(counts), set(NODES))
+        for count in counts.values():
+            self.assertLess(abs(count - len(self.KEYS) / len(NODES)), len(self.KEYS) * 0.1)
+
+    def test_adding_node_moves_only_its_share(self) -> None:
+        before = HashRing(NODES)
+        new_node = 'redis://127.0.0.1:6383/0'
+        after = HashRing(NODES + [new_node])
+        moved = [key for key in self.KEYS if before.get_node(key) != after.get_node(key)]
+        self.assertTrue(all(after.get_node(key) == new_node for key in moved))
+        self.assertLess(len(moved), len(self.KEYS) * 0.35)
+
+    @override_settings(OTP_REDIS_NODES=NODES)
+    def test_backend_routes_to_node(self) -> None:
+        self.addCleanup(redis_client.reset_redis_pool)
+        backend = RedisOTPBackend()
+        key = OTPManager.get_key('first_test_username')
+        node = backend.get_node(key)
+        client = backend.client_for(key)
+        self.assertEqual(client.connection_pool.connection_kwargs['port'], int(node.rsplit(':', 1)[1].split('/')[0]))
+        self.assertIs(client.connection_pool, backend.client_for(key).connection_pool)
+
+
+@unittest.skipUnless(os.environ.get('OTP_TEST_REDIS_NODES'), 'нужны запущенные redis-server, см. OTP_TEST_REDIS_NODES')
+class TestShardedOTPStorage(SimpleTestCase):
+    """Класс для проверки шардирования кодов на нескольких локальных redis-server"""
+
+    def setUp(self) -> None:
+        self.nodes = os.environ['OTP_TEST_REDIS_NODES'].split(',')
+        settings_override = override_settings(OTP_REDIS_NODES=self.nodes)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(redis_client.reset_redis_pool)
+
+    def test_codes_are_stored_on_ring_node(self) -> None:
+        backend = RedisOTPBackend()
+        manager = OTPManager(backend=backend)
+        usernames = [f'sharded_user_{index}' for index in range(50)]
+        for username in usernames:
+            manager.delete_otp(username)
+            manager.save_otp(username, '1234')
+        for username in usernames:
+            owner = backend.get_node(manager.get_key(username))
+            for node in self.nodes:
+                stored = redis_client.get_node_redis_client(node).exists(manager.get_key(username))
+                self.assertEqual(bool(stored), node == owner)
+            self.assertTrue(manager.verify_otp(username, '1234'))
+        self.assertGreater(len({backend.get_node(manager.get_key(username)) for username in usernames}), 1)
@@ -0,0 +1,79 @@
+import tempfile
+from io import StringIO
+
+import jwt
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from users.signing import KeyRing, get_keyring, load_keys_dir
+
+
+class TestKeyRing(SimpleTestCase):
+    """Класс для тестирования подписи токенов ключами с kid"""
+
+    PAYLOAD = {'user_id': 1, 'iss': 'auth_service'}
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.keys_dir = directory.name
+
+    def generate(self, kid: str, algorithm: str = 'EdDSA', retire: bool = False) -> None:
+        call_command(
+            'generate_jwt_key', algorithm=algorithm, kid=kid, keys_dir=self.keys_dir, retire=retire, stdout=StringIO(),
+        )
+
+    def test_tokens_carry_kid_and_verify_with_public_key(self) -> None:
+        for algorithm in ('EdDSA', 'RS256'):
+            with self.subTest(algorithm=algorithm):
+                self.generate(f'key-{algorithm}', algorithm)
+                keyring = KeyRing(load_keys_dir(self.keys_dir), active_kid=f'key-{algorithm}')
+                token = keyring.sign(self.PAYLOAD)
+
+                self.assertEqual(jwt.get_unverified_header(token), {'alg': algorithm, 'kid': f'key-{algorithm}', 'typ': 'JWT'})
+                self.assertEqual(keyring.decode(token, issuer='auth_service')['user_id'], 1)
+
+    def test_retired_key_still_verifies_old_tokens(self) -> None:
+        self.generate('2026a')
+        old_token = KeyRing(load_keys_dir(self.keys_dir)).sign(self.PAYLOAD)
+        self.generate('2026b', retire=True)
+        keyring = KeyRing(load_keys_dir(self.keys_dir))
+
+        self.assertEqual(keyring.active_kid, '2026b')
+        self.assertIsNone(keyring.keys['2026a'].private_key)
+        self.assertEqual(keyring.decode(old_token)['user_id'], 1)
+        with self.assertRaises(ValueError):
+            KeyRing(load_keys_dir(self.keys_dir), active_kid='2026a')
+
+    def test_unknown_kid_and_forged_algorithm_are_rejected(self) -> None:
+        self.generate('current')
+        keyring = KeyRing(load_keys_dir(self.keys_dir))
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.decode(jwt.encode(self.PAYLOAD, 'secret', algorithm='HS256', headers={'kid': 'other'}))
+        # Без общего секрета токен HS256 не принимается, даже если в заголовке указан существующий kid.
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.decode(jwt.encode(self.PAYLOAD, 'secret', algorithm='HS256', headers={'kid': 'current'}))
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyring.decode(jwt.encode(self.PAYLOAD, 'secret', algorithm='HS256'))
+
+    def test_shared_secret_is_used_without_keys(self) -> None:
+        keyring = KeyRing({}, secret='test-secret')
+        token = keyring.sign(self.PAYLOAD)
+
+        self.assertNotIn('kid', jwt.get_unverified_header(token))
+        self.assertEqual(keyring.decode(token)['user_id'], 1)
+        self.assertEqual(keyring.jwks_body, b'{"keys": []}')
+
+    def test_jwks_endpoint_is_cacheable(self) -> None:
+        self.generate('published')
+        with override_settings(JWT_KEYS_DIR=self.keys_dir, JWT_ACTIVE_KID=''):
+            response = self.client.get('/.well-known/jwks.json')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('max-age', response['Cache-Control'])
+            [key] = response.json()['keys']
+            self.assertEqual((key['kid'], key['alg'], key['kty'], key['crv']), ('published', 'EdDSA', 'OKP', 'Ed25519'))
+            self.assertNotIn('d', key)
+
+            not_modified = self.client.get('/.well-known/jwks.json', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertIs(get_keyring(), get_keyring())
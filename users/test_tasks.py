@@ -0,0 +1,185 @@
+import threading
+import time
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+import redis
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+
+from users.loadtest import StubSMSServer
+from users.sms_limiter import SMSRateLimiter
+from users.tasks import SMSBatcher, SMSSender, send_sms_task
+
+
+class TestSMSBatcher(SimpleTestCase):
+    """Класс для тестирования пакетной отправки смс"""
+
+    def setUp(self) -> None:
+        self.server = StubSMSServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def make_batcher(self, max_batch: int, max_wait: float) -> SMSBatcher:
+        with override_settings(SMS_API_URL=self.server.url):
+            sender = SMSSender()
+        return SMSBatcher(sender, max_batch=max_batch, max_wait=max_wait, max_inflight=1)
+
+    def test_messages_are_sent_in_one_request(self) -> None:
+        batcher = self.make_batcher(max_batch=3, max_wait=5)
+        futures = [batcher.submit(f'8000000000{index}', '1234') for index in range(3)]
+        results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(len(self.server.payloads), 1)
+        self.assertEqual(len(self.server.payloads[0]['messages']), 3)
+        self.assertEqual([result['recipient'] for result in results], [f'8000000000{index}' for index in range(3)])
+
+    def test_window_flushes_partial_batch_over_keep_alive(self) -> None:
+        batcher = self.make_batcher(max_batch=50, max_wait=0.01)
+        first = batcher.submit('80000000001', '1234').result(timeout=5)
+        second = batcher.submit('80000000002', '5678').result(timeout=5)
+
+        self.assertEqual(first['status'], 'ok')
+        self.assertEqual(second['recipient'], '80000000002')
+        self.assertEqual(len(self.server.payloads), 2)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_request_error_is_reported_per_recipient(self) -> None:
+        with override_settings(SMS_API_URL='http://127.0.0.1:1/sms'):
+            sender = SMSSender()
+        results = sender.send_batch([('80000000001', '1234'), ('80000000002', '5678')])
+        self.assertEqual(len(results), 2)
+        self.assertIn('detail', results[1])
+
+    def test_server_errors_are_retryable_and_client_errors_are_not(self) -> None:
+        with override_settings(SMS_API_URL=self.server.url):
+            sender = SMSSender()
+        self.server.status = 503
+        self.assertTrue(sender.send_sms('80000000001', '1234')['retryable'])
+        self.server.status = 400
+        self.assertFalse(sender.send_sms('80000000001', '1234')['retryable'])
+
+    def test_rate_limited_batch_is_not_sent(self) -> None:
+        limiter = MagicMock()
+        limiter.acquire.return_value = False
+        with override_settings(SMS_API_URL=self.server.url):
+            batcher = SMSBatcher(SMSSender(), max_batch=2, max_wait=0.01, max_inflight=1, limiter=limiter, max_rate_wait=0.1)
+        result = batcher.submit('80000000001', '1234').result(timeout=5)
+
+        self.assertTrue(result['retryable'])
+        self.assertEqual(self.server.payloads, [])
+        limiter.acquire.assert_called_once_with(1, 0.1)
+
+    def test_cancelled_message_is_not_sent(self) -> None:
+        batcher = self.make_batcher(max_batch=2, max_wait=0.2)
+        cancelled = batcher.submit('80000000001', '1234')
+        self.assertTrue(cancelled.cancel())
+        batcher.submit('80000000002', '5678').result(timeout=5)
+
+        self.assertEqual([message['recipient'] for message in self.server.payloads[0]['messages']], ['80000000002'])
+
+
+class TestSMSRateLimiter(SimpleTestCase):
+    """Класс для тестирования общего лимита отправки смс"""
+
+    def test_acquire_waits_for_tokens(self) -> None:
+        limiter = SMSRateLimiter(rate=10, burst=5)
+        with patch.object(limiter, 'try_acquire', side_effect=[0.01, 0.0]) as try_acquire:
+            self.assertTrue(limiter.acquire(3, timeout=1))
+        self.assertEqual(try_acquire.call_count, 2)
+
+    def test_acquire_gives_up_when_wait_exceeds_timeout(self) -> None:
+        limiter = SMSRateLimiter(rate=10, burst=5)
+        with patch.object(limiter, 'try_acquire', return_value=5.0):
+            self.assertFalse(limiter.acquire(3, timeout=1))
+
+    def test_unavailable_redis_does_not_block_sending(self) -> None:
+        limiter = SMSRateLimiter(rate=10, burst=5)
+        with patch('users.sms_limiter.get_redis_client') as get_redis_client:
+            get_redis_client.return_value.register_script.side_effect = redis.ConnectionError('down')
+            self.assertEqual(limiter.try_acquire(1), 0.0)
+
+    def test_zero_rate_disables_limit(self) -> None:
+        with patch('users.sms_limiter.get_redis_client') as get_redis_client:
+            self.assertEqual(SMSRateLimiter(rate=0, burst=5).try_acquire(100), 0.0)
+        get_redis_client.assert_not_called()
+
+
+@override_settings(SMS_RETRY_BACKOFF=0.01, SMS_RETRY_BACKOFF_MAX=0.01, SMS_MIN_CODE_LIFETIME=15, SMS_MAX_RETRIES=3)
+class TestSendSMSTask(SimpleTestCase):
+    """Класс для тестирования повторов отправки смс"""
+
+    RETRYABLE = {'detail': 'timeout', 'retryable': True}
+    SENT = {'recipient': '80000000001', 'status': 'ok'}
+
+    def setUp(self) -> None:
+        patcher = patch('users.tasks.get_sms_batcher')
+        self.batcher = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def done(result) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def reply(self, *results) -> None:
+        self.batcher.submit.side_effect = [self.done(result) for result in results]
+
+    @staticmethod
+    def sent(outcome: str) -> float:
+        return REGISTRY.get_sample_value('sms_messages_total', {'outcome': outcome}) or 0.0
+
+    def test_temporary_error_is_retried(self) -> None:
+        retried = self.sent('retried')
+        self.reply(self.RETRYABLE, self.SENT)
+        result = send_sms_task.apply(args=('80000000001', '1234', time.time() + 120)).get()
+
+        self.assertEqual(result, self.SENT)
+        self.assertEqual(self.batcher.submit.call_count, 2)
+        self.assertEqual(self.sent('retried'), retried + 1)
+
+    def test_expired_code_is_dropped(self) -> None:
+        expired = self.sent('expired')
+        result = send_sms_task.apply(args=('80000000001', '1234', time.time() - 1)).get()
+
+        self.assertIn('detail', result)
+        self.batcher.submit.assert_not_called()
+        self.assertEqual(self.sent('expired'), expired + 1)
+
+    def test_no_retry_when_code_expires_before_delivery(self) -> None:
+        self.reply(self.RETRYABLE)
+        result = send_sms_task.apply(args=('80000000001', '1234', time.time() + 10)).get()
+
+        self.assertTrue(result['retryable'])
+        self.assertEqual(self.batcher.submit.call_count, 1)
+
+    def test_retries_are_bounded(self) -> None:
+        exhausted = self.sent('exhausted')
+        self.reply(*[self.RETRYABLE] * 4)
+        send_sms_task.apply(args=('80000000001', '1234', time.time() + 120)).get()
+
+        self.assertEqual(self.batcher.submit.call_count, 4)
+        self.assertEqual(self.sent('exhausted'), exhausted + 1)
+
+    @patch('users.tasks.sms_result_timeout', return_value=0.05)
+    def test_timeout_cancels_pending_message_and_retries(self, _) -> None:
+        pending = Future()
+        self.batcher.submit.side_effect = [pending, self.done(self.SENT)]
+        result = send_sms_task.apply(args=('80000000001', '1234', time.time() + 120)).get()
+
+        self.assertTrue(pending.cancelled())
+        self.assertEqual(result, self.SENT)
+
+    @patch('users.tasks.sms_result_timeout', return_value=0.05)
+    def test_no_retry_when_message_may_be_dispatched(self, _) -> None:
+        unknown = self.sent('unknown')
+        dispatched = Future()
+        dispatched.set_running_or_notify_cancel()
+        self.batcher.submit.side_effect = [dispatched]
+        result = send_sms_task.apply(args=('80000000001', '1234', time.time() + 120)).get()
+
+        self.assertNotIn('retryable', result)
+        self.assertEqual(self.batcher.submit.call_count, 1)
+        self.assertEqual(self.sent('unknown'), unknown + 1)
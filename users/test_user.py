@@ -1,14 +1,52 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+
+import jwt
+import redis
+from django.test import TestCase, override_settings
 
 from rest_framework.test import APITestCase
 from rest_framework.response import Response
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
+from .cache import get_user_id_cache
 from .models import User
+from .tokens import RefreshTokenStore, TokenService, get_verified_token_cache
 
 from users.serializers import OTPSendError
 
+class FakeRefreshTokenStore:
+    """Хранилище семейств refresh-токенов в памяти"""
+
+    def __init__(self) -> None:
+        self.families = {}
+        self.user_families = {}
+        self.ttls = []
+
+    def create(self, family_id: str, user_id: int, expires_at: int) -> None:
+        self.families[family_id] = 0
+        self.user_families.setdefault(user_id, set()).add(family_id)
+
+    async def acreate(self, family_id: str, user_id: int, expires_at: int) -> None:
+        self.create(family_id, user_id, expires_at)
+
+    def rotate(self, family_id: str, generation: int, ttl: int) -> int:
+        self.ttls.append(ttl)
+        if family_id not in self.families:
+            return -1
+        if self.families[family_id] != generation:
+            del self.families[family_id]
+            return -2
+        self.families[family_id] += 1
+        return self.families[family_id]
+
+    def revoke_user(self, user_id: int) -> None:
+        for family_id in self.user_families.pop(user_id, ()):
+            self.families.pop(family_id, None)
+
+
+@override_settings(LOGIN_REPLAY_TTL=0, LOGIN_IDEMPOTENCY_KEY_TTL=0, RATE_LIMIT_ENABLED=False)
 class BaseTestUser(APITestCase):
     """Базовый класс для тестов"""
 
@@ -34,6 +72,23 @@ class BaseTestUser(APITestCase):
     OTP_PATCH = 'users.serializers.OTPManager'
     OTP_TASK = 'users.serializers.send_sms_task.delay'
 
+    REFRESH_STORE_PATCH = 'users.tokens.RefreshTokenStore'
+    LOGIN_EVENTS_PATCH = 'users.views.get_login_events'
+
+    def patch_refresh_store(self) -> 'FakeRefreshTokenStore':
+        store = FakeRefreshTokenStore()
+        patcher = patch(self.REFRESH_STORE_PATCH, return_value=store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return store
+
+    def patch_login_events(self) -> MagicMock:
+        patcher = patch(self.LOGIN_EVENTS_PATCH)
+        get_login_events = patcher.start()
+        self.addCleanup(patcher.stop)
+        get_login_events.return_value.asubmit = AsyncMock(return_value=True)
+        return get_login_events.return_value
+
     def create_user(self) -> User:
         return User.objects.create_user(
             username=self.FIRST_VALID_USERNAME,
@@ -170,8 +225,9 @@ class TestUserSMS(BaseTestUser):
         self.mock_otp_manager = MagicMock()
         self.mock_otp_manager_class.return_value = self.mock_otp_manager
 
-        self.mock_otp_manager.get_otp.return_value = '0000'
-        self.mock_otp_manager.delete_otp.return_value = None
+        self.mock_otp_manager.verify_otp.side_effect = lambda username, otp: otp == self.VALID_SMS
+        self.patch_refresh_store()
+        self.login_events = self.patch_login_events()
 
 
     def base_user_sms(self, username: str, otp: str):
@@ -189,13 +245,18 @@ class TestUserSMS(BaseTestUser):
         self.assertIsInstance(response.data['access_token'], str)
         self.assertIsInstance(response.data['refresh_token'], str)
 
+        event = self.login_events.submit.call_args.args[0]
+        self.assertEqual((event['user_id'], event['outcome']), (self.user.pk, 'ok'))
+
     def test_user_invalid_sms(self) -> None:
         response = self.base_user_sms(self.FIRST_VALID_USERNAME, self.INVALID_SMS)
         self.assertEqual(response.status_code, 400)   
         self.assertEqual(response.data['detail'][0], 'Введён неверный код.') 
+        event = self.login_events.submit.call_args.args[0]
+        self.assertEqual((event['user_id'], event['login'], event['outcome']), (None, self.FIRST_VALID_USERNAME, 'failed'))
 
     def test_user_expired_sms(self) -> None:
-        self.mock_otp_manager.get_otp.side_effect = OTPSendError('Получите новый код или проверьте данные.')
+        self.mock_otp_manager.verify_otp.side_effect = OTPSendError('Получите новый код или проверьте данные.')
         
         response = self.base_user_sms(self.FIRST_VALID_USERNAME, self.VALID_SMS)
         self.assertEqual(response.status_code, 400)
@@ -212,4 +273,285 @@ class TestUserSMS(BaseTestUser):
         self.assertEqual(response.data['username_or_phone'][0], self.NULL_FIELD)
         self.assertEqual(response.data['sms_code'][0], self.NULL_FIELD)
 
-          
\ No newline at end of file
+    def test_user_sms_non_object_body(self) -> None:
+        response = self.client.post('/api/sms/', [1, 2], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.login_events.submit.call_args.args[0]['login'], '')
+
+
+class TestAsyncUserLogin(BaseTestUser):
+    """Класс для тестирования асинхронной авторизации"""
+
+    ASYNC_OTP_PATCH = 'users.views.AsyncOTPManager'
+    ASYNC_OTP_TASK = 'users.views.send_sms_task.delay'
+
+    def setUp(self) -> None:
+        self.user = self.create_user()
+
+        patcher_otp = patch(self.ASYNC_OTP_PATCH)
+        patcher_tasks = patch(self.ASYNC_OTP_TASK)
+        self.mock_otp_manager_class = patcher_otp.start()
+        self.addCleanup(patcher_otp.stop)
+
+        self.mock_otp_manager = MagicMock()
+        self.mock_otp_manager_class.return_value = self.mock_otp_manager
+        self.mock_otp_manager.create_otp.return_value = '123456'
+        self.mock_otp_manager.save_otp = AsyncMock(return_value=None)
+        self.mock_otp_manager.expires_at.return_value = 1000.0
+
+        self.send_sms_task = patcher_tasks.start()
+        self.addCleanup(patcher_tasks.stop)
+
+    def base_user_login(self, test_user_login: str, test_password_login: str) -> Response:
+        response = self.client.post('/api/async/login/', {
+            'username_or_phone': test_user_login,
+            'password': test_password_login
+        })
+        return response
+
+    def test_user_login(self) -> None:
+        response = self.base_user_login(self.FIRST_VALID_USERNAME, self.FIRST_VALID_PASSWORD)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['detail'], "Отправка кода на телефон запущена.")
+        self.send_sms_task.assert_called_once_with(self.FIRST_VALID_PHONE, '123456', 1000.0)
+
+    def test_user_login_repeat(self) -> None:
+        self.mock_otp_manager.save_otp.side_effect = OTPSendError('Новый код можно получить через 59 сек.')
+        response = self.base_user_login(self.FIRST_VALID_USERNAME, self.FIRST_VALID_PASSWORD)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Новый код можно получить", response.json()['detail'][0])
+
+    def test_user_login_invalid_password(self) -> None:
+        response = self.base_user_login(self.FIRST_VALID_USERNAME, self.FIRST_INVALID_PASSWORD)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'][0], "Введён неправильный пароль.")
+
+    def test_user_login_null(self) -> None:
+        response = self.base_user_login('', '')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['username_or_phone'][0], self.NULL_FIELD)
+
+
+class TestAsyncUserSMS(BaseTestUser):
+    """Класс для тестирования асинхронной проверки смс кода"""
+
+    def setUp(self) -> None:
+        self.user = self.create_user()
+
+        patcher = patch('users.views.AsyncOTPManager')
+        self.mock_otp_manager_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.mock_otp_manager = MagicMock()
+        self.mock_otp_manager_class.return_value = self.mock_otp_manager
+        self.mock_otp_manager.verify_otp = AsyncMock(side_effect=lambda username, otp: otp == self.VALID_SMS)
+        self.patch_refresh_store()
+        self.login_events = self.patch_login_events()
+
+    def base_user_sms(self, username: str, otp: str) -> Response:
+        return self.client.post('/api/async/sms/', {'username_or_phone': username, 'sms_code': otp}, format='json')
+
+    def test_user_sms(self) -> None:
+        response = self.base_user_sms(self.FIRST_VALID_USERNAME, self.VALID_SMS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['detail'], 'Успешная авторизация')
+        self.assertIsInstance(response.json()['access_token'], str)
+        self.assertEqual(self.login_events.asubmit.call_args.args[0]['outcome'], 'ok')
+
+    def test_user_invalid_sms(self) -> None:
+        response = self.base_user_sms(self.FIRST_VALID_USERNAME, self.INVALID_SMS)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['detail'][0], 'Введён неверный код.')
+
+
+class TestTokenIntrospection(BaseTestUser):
+    """Класс для тестирования проверки токенов"""
+
+    def setUp(self) -> None:
+        self.user = self.create_user()
+        self.patch_refresh_store()
+        self.tokens = TokenService.issue_pair(self.user)
+
+    def base_introspect(self, tokens) -> Response:
+        return self.client.post('/api/introspect/', {'tokens': tokens}, format='json')
+
+    def test_introspect_batch(self) -> None:
+        response = self.base_introspect([self.tokens['access_token'], self.tokens['refresh_token'], 'invalid'])
+        self.assertEqual(response.status_code, 200)
+        access, refresh, invalid = response.data['results']
+        self.assertTrue(access['active'])
+        self.assertEqual(access['username'], self.FIRST_VALID_USERNAME)
+        self.assertFalse(refresh['active'])
+        self.assertFalse(invalid['active'])
+
+    def test_introspect_uses_cache(self) -> None:
+        hits = get_verified_token_cache().stats()['hits']
+        self.base_introspect([self.tokens['access_token']])
+        response = self.base_introspect([self.tokens['access_token']])
+        self.assertTrue(response.data['results'][0]['active'])
+        self.assertEqual(get_verified_token_cache().stats()['hits'], hits + 1)
+
+    def test_introspect_empty(self) -> None:
+        response = self.base_introspect([])
+        self.assertEqual(response.status_code, 400)
+
+    def test_cache_stats_require_admin(self) -> None:
+        self.assertEqual(self.client.get('/api/introspect/').status_code, 403)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/introspect/').status_code, 403)
+        admin = User.objects.create_superuser(username='admin_username', password='admin_password', phone_number='87777777777')
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/introspect/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hits', response.data)
+
+
+class TestTokenRefresh(BaseTestUser):
+    """Класс для тестирования обновления токенов"""
+
+    def setUp(self) -> None:
+        self.user = self.create_user()
+        self.store = self.patch_refresh_store()
+        self.tokens = TokenService.issue_pair(self.user)
+
+    def base_refresh(self, refresh_token: str) -> Response:
+        return self.client.post('/api/token/refresh/', {'refresh_token': refresh_token}, format='json')
+
+    def test_refresh_rotates_token(self) -> None:
+        response = self.base_refresh(self.tokens['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh_token'], self.tokens['refresh_token'])
+        claims = TokenService.decode_access(response.data['access_token'])
+        self.assertEqual(claims['username'], self.FIRST_VALID_USERNAME)
+
+        second = self.base_refresh(response.data['refresh_token'])
+        self.assertEqual(second.status_code, 200)
+
+    def test_refresh_reuse_revokes_family(self) -> None:
+        rotated = self.base_refresh(self.tokens['refresh_token']).data['refresh_token']
+        reused = self.base_refresh(self.tokens['refresh_token'])
+        self.assertEqual(reused.status_code, 401)
+        self.assertEqual(reused.data['detail'], 'Токен уже был использован. Войдите заново.')
+        self.assertEqual(self.base_refresh(rotated).status_code, 401)
+
+    def test_refresh_rejects_access_token(self) -> None:
+        response = self.base_refresh(self.tokens['access_token'])
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_does_not_extend_family(self) -> None:
+        family_expires_at = jwt.decode(self.tokens['refresh_token'], options={'verify_signature': False})['fexp']
+        with patch('users.tokens.time.time', return_value=family_expires_at - 60):
+            response = self.base_refresh(self.tokens['refresh_token'])
+        claims = jwt.decode(response.data['refresh_token'], options={'verify_signature': False})
+        self.assertEqual(claims['fexp'], family_expires_at)
+        self.assertEqual(claims['exp'], family_expires_at)
+        self.assertEqual(self.store.ttls[-1], 60)
+
+        with patch('users.tokens.time.time', return_value=family_expires_at + 1):
+            self.assertEqual(self.base_refresh(response.data['refresh_token']).status_code, 401)
+
+    def test_refresh_rejects_inactive_user(self) -> None:
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.store.families, {})
+        response = self.base_refresh(self.tokens['refresh_token'])
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_rejects_deleted_user(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.store.families, {})
+        response = self.base_refresh(self.tokens['refresh_token'])
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_skips_database(self) -> None:
+        with self.assertNumQueries(0):
+            response = self.base_refresh(self.tokens['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_families_are_trimmed_on_login(self) -> None:
+        client = MagicMock()
+        pipeline = client.pipeline.return_value
+        with patch('users.tokens.get_redis_client', return_value=client), patch('users.tokens.time.time', return_value=1000):
+            RefreshTokenStore(TokenService.REFRESH_TOKEN_LIFETIME).create('family', self.user.pk, 2000)
+        user_key = RefreshTokenStore.get_user_key(self.user.pk)
+        pipeline.zadd.assert_called_once_with(user_key, {'family': 2000})
+        pipeline.zremrangebyscore.assert_called_once_with(user_key, '-inf', 1000)
+
+
+class TestBulkUsers(BaseTestUser):
+    """Класс для тестирования выдачи пользователей списком id"""
+
+    def setUp(self) -> None:
+        get_user_id_cache().local.clear()
+        patcher = patch('users.cache.get_redis_client', side_effect=redis.ConnectionError('down'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.create_user()
+        self.second_user = User.objects.create_user(
+            username=self.SECOND_VALID_USERNAME,
+            password=self.SECOND_VALID_PASSWORD,
+            phone_number=self.SECOND_VALID_PHONE,
+        )
+        service_token = TokenService.issue_service_token('billing', ['users:bulk'], timedelta(minutes=5))
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + service_token)
+        self.missing_id = self.second_user.pk + 100
+
+    def base_bulk(self, ids, **kwargs) -> Response:
+        return self.client.post('/api/users/bulk/', {'ids': ids}, format='json', **kwargs)
+
+    def test_bulk_requires_access_token(self) -> None:
+        self.client.credentials()
+        self.assertEqual(self.base_bulk([self.user.pk]).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(self.base_bulk([self.user.pk]).status_code, 401)
+
+    def test_bulk_rejects_user_tokens(self) -> None:
+        self.patch_refresh_store()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + TokenService.issue_pair(self.user)['access_token'])
+        self.assertEqual(self.base_bulk([self.user.pk]).status_code, 403)
+        other_scope = TokenService.issue_service_token('billing', ['users:read'], timedelta(minutes=5))
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + other_scope)
+        self.assertEqual(self.base_bulk([self.user.pk]).status_code, 403)
+
+    def test_bulk_returns_compact_rows(self) -> None:
+        response = self.base_bulk([self.second_user.pk, self.missing_id, self.user.pk, self.second_user.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['fields'], ['id', 'username', 'phone_number'])
+        self.assertEqual(response.data['users'], [
+            [self.second_user.pk, self.SECOND_VALID_USERNAME, self.SECOND_VALID_PHONE],
+            [self.user.pk, self.FIRST_VALID_USERNAME, self.FIRST_VALID_PHONE],
+        ])
+        self.assertEqual(response.data['missing'], [self.missing_id])
+
+    def test_bulk_serves_cached_users_without_queries(self) -> None:
+        self.base_bulk([self.user.pk])
+        with self.assertNumQueries(1):
+            self.base_bulk([self.user.pk, self.second_user.pk])
+        with self.assertNumQueries(0):
+            response = self.base_bulk([self.user.pk, self.second_user.pk])
+        self.assertEqual(len(response.data['users']), 2)
+
+    def test_bulk_cache_is_invalidated_on_rename(self) -> None:
+        self.base_bulk([self.user.pk])
+        self.user.username = 'renamed_test_username'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.base_bulk([self.user.pk])
+        self.assertEqual(response.data['users'][0][1], 'renamed_test_username')
+
+    def test_bulk_rejects_invalid_ids(self) -> None:
+        for ids in ([], ['1'], [True], [0], 'not a list'):
+            self.assertEqual(self.base_bulk(ids).status_code, 400)
+
+    @override_settings(USERS_BULK_STREAM_CHUNK=1)
+    def test_bulk_streams_ndjson(self) -> None:
+        response = self.base_bulk([self.user.pk, self.missing_id], HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [
+            {'id': self.user.pk, 'username': self.FIRST_VALID_USERNAME, 'phone_number': self.FIRST_VALID_PHONE},
+            {'id': self.missing_id, 'missing': True},
+        ])
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from users import warmup
+from users.services import UserService
+
+
+class TestReadiness(APITestCase):
+    """Класс для тестирования прогрева и проверки готовности"""
+
+    def setUp(self) -> None:
+        state = dict(warmup._state)
+        self.addCleanup(warmup._state.update, state)
+        warmup._state.update(ready=False, warmup_seconds=None)
+        patcher = patch('users.warmup.get_redis_client', return_value=MagicMock())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_not_ready_before_warm_up(self) -> None:
+        response = self.client.get('/api/ready/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(response.data['ready'])
+
+    def test_ready_after_warm_up(self) -> None:
+        with patch('users.warmup.get_hashing_pool') as get_hashing_pool:
+            warmup.warm_up()
+        get_hashing_pool.return_value.warm_up.assert_called_once()
+
+        response = self.client.get('/api/ready/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['database'])
+        self.assertIsNotNone(response.data['warmup_seconds'])
+
+    def test_redis_failure_is_not_ready(self) -> None:
+        warmup.mark_ready()
+        with patch('users.warmup.get_redis_client', side_effect=warmup.redis.ConnectionError('down')):
+            response = self.client.get('/api/ready/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(response.data['redis'])
+
+    def test_preload_leaves_no_open_connections(self) -> None:
+        with self.assertNumQueries(0):
+            UserService.get_users()
+        with patch('users.warmup.connections') as connections:
+            warmup.preload()
+        connections.close_all.assert_called_once()
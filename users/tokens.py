@@ -0,0 +1,248 @@
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import jwt
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .cache import LRUCache
+from .models import User
+from .redis_client import get_async_redis_client, get_redis_client
+from .signing import get_keyring
+
+
+class InvalidToken(APIException):
+    status_code = status.HTTP_401_UNAUTHORIZED
+    default_detail = 'Токен недействителен или истёк.'
+    default_code = 'invalid_token'
+
+
+class VerifiedTokenCache(LRUCache):
+    def __init__(self, max_size: int, ttl: float) -> None:
+        super().__init__(max_size, ttl)
+        self.lookups = 0
+        self.lookups_seconds_total = 0.0
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        super().set(key, value, float(value.get('exp', 0)))
+
+    def observe(self, seconds: float) -> None:
+        with self.lock:
+            self.lookups += 1
+            self.lookups_seconds_total += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self.lock:
+            stats['lookups'] = self.lookups
+            stats['lookup_seconds_avg'] = self.lookups_seconds_total / self.lookups if self.lookups else 0.0
+        return stats
+
+
+_verified_token_cache: Optional[VerifiedTokenCache] = None
+_verified_token_cache_lock = threading.Lock()
+
+
+def get_verified_token_cache() -> VerifiedTokenCache:
+    global _verified_token_cache
+    if _verified_token_cache is None:
+        with _verified_token_cache_lock:
+            if _verified_token_cache is None:
+                _verified_token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+    return _verified_token_cache
+
+
+REFRESH_ROTATE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return -1
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+local generation = tonumber(current) + 1
+redis.call('SET', KEYS[1], generation, 'EX', ARGV[2])
+return generation
+"""
+
+
+class RefreshTokenStore:
+    def __init__(self, lifetime: timedelta) -> None:
+        self.ttl = int(lifetime.total_seconds())
+
+    @staticmethod
+    def get_key(family_id: str) -> str:
+        return f'rt:{family_id}'
+
+    @staticmethod
+    def get_user_key(user_id: int) -> str:
+        return f'rt:user:{user_id}'
+
+    def create_commands(self, pipeline, family_id: str, user_id: int, expires_at: int) -> None:
+        # Семейства пользователя собраны в ZSET по сроку семейства, чтобы завершить их все при удалении
+        # или блокировке; истёкшие убираются при каждом входе, и набор не растёт у активных пользователей.
+        user_key = self.get_user_key(user_id)
+        pipeline.set(self.get_key(family_id), 0, ex=self.ttl)
+        pipeline.zadd(user_key, {family_id: expires_at})
+        pipeline.zremrangebyscore(user_key, '-inf', int(time.time()))
+        pipeline.expire(user_key, self.ttl)
+
+    def create(self, family_id: str, user_id: int, expires_at: int) -> None:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        self.create_commands(pipeline, family_id, user_id, expires_at)
+        pipeline.execute()
+
+    async def acreate(self, family_id: str, user_id: int, expires_at: int) -> None:
+        pipeline = get_async_redis_client().pipeline(transaction=False)
+        self.create_commands(pipeline, family_id, user_id, expires_at)
+        await pipeline.execute()
+
+    def rotate(self, family_id: str, generation: int, ttl: int) -> int:
+        # ttl — остаток срока семейства: ротация его не продлевает.
+        client = get_redis_client()
+        script = client.register_script(REFRESH_ROTATE_SCRIPT)
+        return script(keys=[self.get_key(family_id)], args=[generation, ttl])
+
+    def revoke_user(self, user_id: int) -> None:
+        client = get_redis_client()
+        family_ids = client.zrange(self.get_user_key(user_id), 0, -1)
+        client.delete(self.get_user_key(user_id), *(self.get_key(family_id) for family_id in family_ids))
+
+
+class TokenService:
+    ACCESS_TOKEN_LIFETIME = timedelta(minutes=15)
+    REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+
+    @staticmethod
+    def build_pair(claims: Dict[str, Any], family_id: str, generation: int, family_expires_at: int) -> Dict[str, str]:
+        keyring = get_keyring()
+        access_payload = {
+            'user_id': claims['user_id'],
+            'username': claims['username'],
+            'phone_number': claims['phone_number'],
+            'exp': datetime.utcnow() + TokenService.ACCESS_TOKEN_LIFETIME,
+            'iat': datetime.utcnow(),
+            'iss': 'auth_service',
+            'token_type': 'access'
+        }
+        access_token = keyring.sign(access_payload)
+
+        refresh_payload = {
+            'user_id': claims['user_id'],
+            'username': claims['username'],
+            'phone_number': claims['phone_number'],
+            'fid': family_id,
+            'gen': generation,
+            'fexp': family_expires_at,
+            'exp': min(int(time.time() + TokenService.REFRESH_TOKEN_LIFETIME.total_seconds()), family_expires_at),
+            'iat': datetime.utcnow(),
+            'iss': 'auth_service',
+            'token_type': 'refresh'
+        }
+        refresh_token = keyring.sign(refresh_payload)
+
+        return {
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+        }
+
+    @staticmethod
+    def issue_service_token(service: str, scopes: List[str], lifetime: timedelta) -> str:
+        # Токен другого сервиса: без пользователя, права задаются списком scope.
+        return get_keyring().sign({
+            'sub': f'service:{service}',
+            'service': service,
+            'scope': ' '.join(scopes),
+            'exp': datetime.utcnow() + lifetime,
+            'iat': datetime.utcnow(),
+            'iss': 'auth_service',
+            'token_type': 'access',
+        })
+
+    @staticmethod
+    def user_claims(user: User) -> Dict[str, Any]:
+        return {'user_id': user.id, 'username': user.username, 'phone_number': user.phone_number}
+
+    @staticmethod
+    def family_expires_at() -> int:
+        return int(time.time() + TokenService.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+    @staticmethod
+    def issue_pair(user: User) -> Dict[str, str]:
+        family_id = secrets.token_urlsafe(16)
+        expires_at = TokenService.family_expires_at()
+        RefreshTokenStore(TokenService.REFRESH_TOKEN_LIFETIME).create(family_id, user.id, expires_at)
+        return TokenService.build_pair(TokenService.user_claims(user), family_id, 0, expires_at)
+
+    @staticmethod
+    async def aissue_pair(user: User) -> Dict[str, str]:
+        family_id = secrets.token_urlsafe(16)
+        expires_at = TokenService.family_expires_at()
+        await RefreshTokenStore(TokenService.REFRESH_TOKEN_LIFETIME).acreate(family_id, user.id, expires_at)
+        return TokenService.build_pair(TokenService.user_claims(user), family_id, 0, expires_at)
+
+    @staticmethod
+    def refresh(token: str) -> Dict[str, str]:
+        try:
+            claims = get_keyring().decode(
+                token,
+                issuer='auth_service',
+                options={'require': ['exp', 'fid', 'gen']},
+            )
+        except jwt.InvalidTokenError:
+            raise InvalidToken()
+        if claims.get('token_type') != 'refresh':
+            raise InvalidToken()
+
+        # Срок семейства отсчитывается от входа по паролю; у старых токенов без fexp — их собственный exp.
+        family_expires_at = int(claims.get('fexp', claims['exp']))
+        remaining = family_expires_at - int(time.time())
+        if remaining <= 0:
+            raise InvalidToken('Сессия завершена. Войдите заново.')
+
+        # В базу не ходим: при удалении или блокировке сигналы удаляют семейства, и rotate вернёт -1.
+        generation = RefreshTokenStore(TokenService.REFRESH_TOKEN_LIFETIME).rotate(claims['fid'], claims['gen'], remaining)
+        if generation == -2:
+            raise InvalidToken('Токен уже был использован. Войдите заново.')
+        if generation < 0:
+            raise InvalidToken('Сессия завершена. Войдите заново.')
+        return TokenService.build_pair(claims, claims['fid'], generation, family_expires_at)
+
+    @staticmethod
+    def revoke_sessions(user_id: int) -> None:
+        RefreshTokenStore(TokenService.REFRESH_TOKEN_LIFETIME).revoke_user(user_id)
+
+    @staticmethod
+    def decode_access(token: str) -> Optional[Dict[str, Any]]:
+        try:
+            claims = get_keyring().decode(token, issuer='auth_service')
+        except jwt.InvalidTokenError:
+            return None
+        if claims.get('token_type') != 'access':
+            return None
+        return claims
+
+    @staticmethod
+    def verify_access(token: str) -> Optional[Dict[str, Any]]:
+        cache = get_verified_token_cache()
+        started = time.perf_counter()
+        claims = cache.get(token)
+        if claims is None:
+            claims = TokenService.decode_access(token)
+            if claims is not None:
+                cache.set(token, claims)
+        cache.observe(time.perf_counter() - started)
+        return claims
+
+    @staticmethod
+    def introspect(tokens: List[str]) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for token in tokens:
+            claims = TokenService.verify_access(token)
+            results.append({'active': True, **claims} if claims is not None else {'active': False})
+        return results
@@ -1,8 +1,16 @@
 from django.urls import path
-from .views import RegisterView, LoginView, SMSView
+from .views import RegisterView, LoginView, SMSView, AsyncLoginView, AsyncSMSView, IntrospectView, TokenRefreshView, UserImportView, UserImportStatusView, BulkUserView, ReadyView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('sms/', SMSView.as_view(), name='sms'),
+    path('users/import/', UserImportView.as_view(), name='users_import'),
+    path('users/import/<str:job_id>/', UserImportStatusView.as_view(), name='users_import_status'),
+    path('users/bulk/', BulkUserView.as_view(), name='users_bulk'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('introspect/', IntrospectView.as_view(), name='introspect'),
+    path('async/login/', AsyncLoginView.as_view(), name='async_login'),
+    path('async/sms/', AsyncSMSView.as_view(), name='async_sms'),
+    path('ready/', ReadyView.as_view(), name='ready'),
 ]
\ No newline at end of file
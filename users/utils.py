@@ -1,45 +1,72 @@
 import random
-import redis
-import os
+import time
+from typing import Optional
+
+from .otp_backends import BaseOTPBackend, get_otp_backend
+
 
 class OTPSendError(Exception):
     pass
 
-class OTPManager:
-    def __init__(self) -> None:
-        self.redis_client = redis.Redis(
-            host = os.getenv('REDIS_HOST'),
-            port = int(os.getenv('REDIS_PORT')),
-            decode_responses=True
-        )
+class BaseOTPManager:
+    def __init__(self, backend: Optional[BaseOTPBackend] = None) -> None:
+        self.backend = backend or get_otp_backend()
         self.otp_expire = 120
         self.sms_interval = 60
         self.sms_limit = 1
 
+    @staticmethod
+    def get_key(username) -> str:
+        return f'otp:{{{username}}}'
+
     def create_otp(self) -> str:
         return str(random.randint(1000, 9999))
 
-    def can_send_sms(self, username) -> bool:
-        key = f'sms_limit:{username}'
-        data = self.redis_client.incr(key)
-        if (data) == 1:
-            self.redis_client.expire(key, self.sms_interval)
-        if data > self.sms_limit:
-            return False
-        return True
-        
+    def expires_at(self) -> float:
+        return time.time() + self.otp_expire
+
+    def issue_args(self, otp) -> list:
+        return [otp, self.otp_expire, self.sms_interval, self.sms_limit]
+
+    @staticmethod
+    def check_issue_result(retry_after) -> None:
+        if retry_after:
+            raise OTPSendError(f'Новый код можно получить через {retry_after} сек.')
+
+    @staticmethod
+    def check_consume_result(result) -> bool:
+        if result < 0:
+            raise OTPSendError('Получите новый код или проверьте данные.')
+        return result == 1
+
+
+class OTPManager(BaseOTPManager):
     def save_otp(self, username, otp) -> None:
-        if not self.can_send_sms(username):
-            raise OTPSendError(f'Новый код можно получить через {self.redis_client.ttl(f"sms_limit:{username}")} сек.')
-        self.redis_client.set(username, otp, ex=self.otp_expire)
+        retry_after = self.backend.issue(self.get_key(username), *self.issue_args(otp))
+        self.check_issue_result(retry_after)
+
+    def verify_otp(self, username, otp) -> bool:
+        result = self.backend.consume(self.get_key(username), otp)
+        return self.check_consume_result(result)
 
-    def get_otp(self, username) -> str:
-        otp_code = self.redis_client.get(username)
-        if not otp_code:
-            raise OTPSendError(f'Получите новый код или проверьте данные.')
-        return otp_code
+    def get_otp(self, username) -> Optional[str]:
+        return self.backend.get(self.get_key(username))
 
     def delete_otp(self, username) -> None:
-        self.redis_client.delete(username)
+        self.backend.delete(self.get_key(username))
+
+
+class AsyncOTPManager(BaseOTPManager):
+    async def save_otp(self, username, otp) -> None:
+        retry_after = await self.backend.aissue(self.get_key(username), *self.issue_args(otp))
+        self.check_issue_result(retry_after)
+
+    async def verify_otp(self, username, otp) -> bool:
+        result = await self.backend.aconsume(self.get_key(username), otp)
+        return self.check_consume_result(result)
+
+    async def get_otp(self, username) -> Optional[str]:
+        return await self.backend.aget(self.get_key(username))
 
-        
\ No newline at end of file
+    async def delete_otp(self, username) -> None:
+        await self.backend.adelete(self.get_key(username))
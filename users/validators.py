@@ -0,0 +1,40 @@
+import os
+from typing import Any, Optional
+
+from django.conf import settings
+from django.contrib.auth.password_validation import CommonPasswordValidator
+from django.core.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
+
+from .blocklist import get_password_blocklist
+from .bloom import get_user_bloom
+from .db_router import replica_reads
+
+
+class BloomUniqueValidator(UniqueValidator):
+    def __call__(self, value, serializer_field) -> None:
+        # Фильтр отвечает только «точно свободно»; возможное совпадение проверяет база.
+        if not get_user_bloom().might_contain(str(value)):
+            return
+        with replica_reads(str(value)):
+            super().__call__(value, serializer_field)
+
+
+class BreachedPasswordValidator:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or settings.PASSWORD_BLOCKLIST_PATH
+        self.fallback = None
+        if not self.path or not os.path.exists(self.path):
+            # Без собранного файла ведём себя как стандартный валидатор Django.
+            self.fallback = CommonPasswordValidator()
+
+    def validate(self, password: str, user: Any = None) -> None:
+        if self.fallback is not None:
+            self.fallback.validate(password, user)
+            return
+        blocklist = get_password_blocklist(self.path)
+        if password in blocklist or password.lower() in blocklist:
+            raise ValidationError('Этот пароль встречается в утечках. Выберите другой.', code='password_too_common')
+
+    def get_help_text(self) -> str:
+        return 'Пароль не должен встречаться в известных утечках.'
@@ -1,16 +1,39 @@
-from django.shortcuts import render
-from django.conf import settings
-
-from .serializers import RegisterSerializer, LoginSerializer, SMSSerializer
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
 
-from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
-import jwt
+from .audit import get_login_events, login_event
+from .authentication import AccessTokenAuthentication, HasTokenScope
+from .hashing import get_hashing_pool
+from .idempotency import get_login_replay_store
+from .importer import ImportJobStore
+from .metrics import record_outcome, render_metrics, stage
+from .models import User
+from .serializers import RegisterSerializer, LoginSerializer, SMSSerializer, LoginRequestSerializer, SMSRequestSerializer, IntrospectSerializer, TokenRefreshSerializer, BulkUserSerializer
+from .services import UserService
+from .signing import get_keyring
+from .tasks import import_users_task, send_sms_task
+from .tokens import TokenService, get_verified_token_cache
+from .utils import AsyncOTPManager, OTPSendError
+from .warmup import check_dependencies, get_warmup_state
 
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework import serializers
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.exceptions import APIException
 from rest_framework.generics import CreateAPIView, GenericAPIView
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import status
 
 class RegisterView(CreateAPIView):
@@ -22,9 +45,25 @@ class LoginView(GenericAPIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
+        # Повтор того же входа в течение нескольких секунд получает прежний ответ без хеширования пароля.
+        replay_store = get_login_replay_store()
+        key = replay_store.key_for(request.data, request.headers.get('Idempotency-Key'))
+        replay = replay_store.begin(key)
+        if replay is not None:
+            record_outcome('login', 'replayed')
+            return Response(replay['body'], status=replay['status'])
+
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        return Response({"detail": "Отправка кода на телефон запущена."}, status=status.HTTP_200_OK)
+        try:
+            if serializer.is_valid():
+                status_code, body = status.HTTP_200_OK, {"detail": "Отправка кода на телефон запущена."}
+            else:
+                status_code, body = status.HTTP_400_BAD_REQUEST, serializer.errors
+        except Exception:
+            replay_store.abort(key)
+            raise
+        replay_store.finish(key, status_code, body)
+        return Response(body, status=status_code)
 
 class SMSView(GenericAPIView):
     serializer_class = SMSSerializer
@@ -32,33 +71,335 @@ class SMSView(GenericAPIView):
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except serializers.ValidationError:
+            login = request.data.get('username_or_phone') if isinstance(request.data, dict) else ''
+            get_login_events().submit(login_event(request, 'failed', login=login))
+            raise
 
         user = serializer.validated_data['user']
-
-        access_payload = {
-            'user_id': user.id,
-            'username': user.username,
-            'phone_number': user.phone_number,
-            'exp': datetime.utcnow() + timedelta(minutes=15),
-            'iat': datetime.utcnow(),
-            'iss': 'auth_service',
-            'token_type': 'access'
-        }
-        access_token = jwt.encode(access_payload, settings.SECRET_KEY_JWT, algorithm='HS256')
-
-        refresh_payload = {
-            'user_id': user.id,
-            'exp': datetime.utcnow() + timedelta(days=7),
-            'iat': datetime.utcnow(),
-            'iss': 'auth_service',
-            'token_type': 'refresh'
-        }
-        refresh_token = jwt.encode(refresh_payload, settings.SECRET_KEY_JWT, algorithm='HS256')
+        with stage('jwt_issue'):
+            tokens = TokenService.issue_pair(user)
+        record_outcome('sms', 'ok')
+        get_login_events().submit(login_event(request, 'ok', user, user.username))
 
         return Response({
             'detail': 'Успешная авторизация',
-            'access_token': access_token,
-            'refresh_token': refresh_token,
+            **tokens,
+        }, status=status.HTTP_200_OK)
+
+
+class UserImportView(APIView):
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = []
+    FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+
+    def post(self, request, *args, **kwargs):
+        # content_type — заголовок целиком, вместе с параметрами вроде charset.
+        data_format = self.FORMATS.get(request.content_type.split(';')[0].strip().lower())
+        if data_format is None:
+            return Response(
+                {'detail': 'Поддерживаются только text/csv и application/x-ndjson.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        if request.stream is None:
+            return Response({'detail': 'Пустой файл импорта.'}, status=status.HTTP_400_BAD_REQUEST)
+        job_id = uuid.uuid4().hex
+        # Файл кладём на общий с воркером диск и отвечаем сразу: большой импорт не держит запрос.
+        os.makedirs(settings.USER_IMPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.USER_IMPORT_DIR, f'{job_id}.{data_format}')
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(request.stream, target)
+        ImportJobStore().set(job_id, 'queued')
+        import_users_task.delay(job_id, path, data_format)
+        return Response({'job_id': job_id, 'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+
+
+class UserImportStatusView(APIView):
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = ImportJobStore().get(job_id)
+        if job is None:
+            return Response({'detail': 'Задача импорта не найдена.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'job_id': job_id, **job}, status=status.HTTP_200_OK)
+
+
+class TokenRefreshView(GenericAPIView):
+    serializer_class = TokenRefreshSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(TokenService.refresh(serializer.validated_data['refresh_token']), status=status.HTTP_200_OK)
+
+
+class IntrospectView(GenericAPIView):
+    serializer_class = IntrospectSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get_authenticators(self):
+        # Статистика кеша — внутренние счётчики, её видят только администраторы.
+        if self.request.method == 'GET':
+            return [SessionAuthentication(), BasicAuthentication()]
+        return super().get_authenticators()
+
+    def get_permissions(self):
+        if self.request.method == 'GET':
+            return [IsAdminUser()]
+        return super().get_permissions()
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_verified_token_cache().stats(), status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({
+            'results': TokenService.introspect(serializer.validated_data['tokens']),
         }, status=status.HTTP_200_OK)
 
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        # Сюда попадают только ошибки: данные отдаются потоком мимо рендерера.
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode()
+
+
+class BulkUserView(GenericAPIView):
+    serializer_class = BulkUserSerializer
+    authentication_classes = [AccessTokenAuthentication]
+    permission_classes = [IsAuthenticated, HasTokenScope]
+    renderer_classes = [JSONRenderer, NDJSONRenderer]
+    required_scope = 'users:bulk'
+    FIELDS = ['id', 'username', 'phone_number']
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['ids']
+        if request.accepted_renderer.format == 'ndjson':
+            return StreamingHttpResponse(self.stream(user_ids), content_type=NDJSONRenderer.media_type)
+        users = UserService.get_users_by_ids(user_ids)
+        return Response({
+            'fields': self.FIELDS,
+            'users': [[user_id, *users[user_id]] for user_id in user_ids if user_id in users],
+            'missing': [user_id for user_id in user_ids if user_id not in users],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def stream(user_ids: List[int]) -> Iterator[bytes]:
+        # Большие списки читаются частями, первые строки уходят клиенту до конца выборки.
+        chunk_size = settings.USERS_BULK_STREAM_CHUNK
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            users = UserService.get_users_by_ids(chunk)
+            lines = []
+            for user_id in chunk:
+                if user_id in users:
+                    username, phone_number = users[user_id]
+                    row = {'id': user_id, 'username': username, 'phone_number': phone_number}
+                else:
+                    row = {'id': user_id, 'missing': True}
+                lines.append(json.dumps(row, ensure_ascii=False))
+            yield ('\n'.join(lines) + '\n').encode()
+
+
+class ReadyView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        checks = check_dependencies()
+        state = get_warmup_state()
+        ready = state['ready'] and all(checks.values())
+        return Response(
+            {'ready': ready, 'warmup_seconds': state['warmup_seconds'], **checks},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
+class MetricsView(View):
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
+
+
+class JWKSView(View):
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        # Тело собрано один раз при загрузке ключей; потребители кешируют его и сверяют ETag.
+        keyring = get_keyring()
+        if request.headers.get('If-None-Match') == keyring.jwks_etag:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(keyring.jwks_body, content_type='application/json')
+        response['ETag'] = keyring.jwks_etag
+        response['Cache-Control'] = f'public, max-age={settings.JWKS_MAX_AGE}'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncAPIView(View):
+    http_method_names = ['post']
+    request_serializer_class = None
+
+    @staticmethod
+    def parse_data(request) -> Optional[Dict[str, Any]]:
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'{}')
+            except ValueError:
+                return None
+        return request.POST
+
+    @staticmethod
+    def json_response(data: Dict[str, Any], status_code: int) -> JsonResponse:
+        return JsonResponse(data, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+    async def post(self, request, *args, **kwargs) -> JsonResponse:
+        data = self.parse_data(request)
+        if data is None:
+            return self.json_response({'detail': ['Некорректный JSON.']}, status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.request_serializer_class(data=data)
+        if not serializer.is_valid():
+            return self.json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payload = await self.handle(serializer.validated_data)
+        except serializers.ValidationError as exc:
+            return self.json_response(serializers.as_serializer_error(exc), status.HTTP_400_BAD_REQUEST)
+        except APIException as exc:
+            response = self.json_response({'detail': exc.detail}, exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+        return self.json_response(payload, status.HTTP_200_OK)
+
+    async def handle(self, validated_data: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class AsyncLoginView(AsyncAPIView):
+    request_serializer_class = LoginRequestSerializer
+
+    async def post(self, request, *args, **kwargs) -> JsonResponse:
+        replay_store = get_login_replay_store()
+        key = replay_store.key_for(self.parse_data(request) or {}, request.headers.get('Idempotency-Key'))
+        try:
+            replay = await replay_store.abegin(key)
+        except APIException as exc:
+            response = self.json_response({'detail': exc.detail}, exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+        if replay is not None:
+            record_outcome('login', 'replayed')
+            return self.json_response(replay['body'], replay['status'])
+
+        try:
+            response = await super().post(request, *args, **kwargs)
+        except Exception:
+            await replay_store.aabort(key)
+            raise
+        if response.status_code >= 500:
+            await replay_store.aabort(key)
+        else:
+            await replay_store.afinish(key, response.status_code, json.loads(response.content))
+        return response
+
+    async def handle(self, validated_data: Dict[str, Any]) -> Dict[str, Any]:
+        username_or_phone: str = validated_data['username_or_phone']
+        password: str = validated_data['password']
+        try:
+            with stage('user_lookup'):
+                user: Optional[User] = await UserService.aget_user_by_phone_or_name(username_or_phone)
+        except Exception:
+            record_outcome('login', 'lookup_error')
+            raise serializers.ValidationError({"detail": "Ошибка при поиске пользователя."})
+
+        if not user:
+            record_outcome('login', 'user_not_found')
+            raise serializers.ValidationError({"detail": "Пользователь не существует, пройдите регистрацию."})
+
+        with stage('check_password'):
+            is_valid_password: bool = await get_hashing_pool().acheck_password(password, user.password)
+        if not is_valid_password:
+            record_outcome('login', 'wrong_password')
+            raise serializers.ValidationError({"detail": "Введён неправильный пароль."})
+
+        otp_manager = AsyncOTPManager()
+        try:
+            otp_code: str = otp_manager.create_otp()
+            with stage('otp_issue'):
+                await otp_manager.save_otp(username_or_phone, otp_code)
+        except OTPSendError as e:
+            record_outcome('login', 'rate_limited')
+            raise serializers.ValidationError({"detail": str(e)})
+        except Exception:
+            record_outcome('login', 'otp_error')
+            raise serializers.ValidationError({"detail": "Не удалось подготовить код подтверждения."})
+
+        if getattr(user, "phone_number", None):
+            with stage('sms_enqueue'):
+                await sync_to_async(send_sms_task.delay, thread_sensitive=False)(user.phone_number, otp_code, otp_manager.expires_at())
+
+        record_outcome('login', 'ok')
+        return {"detail": "Отправка кода на телефон запущена."}
+
+
+class AsyncSMSView(AsyncAPIView):
+    request_serializer_class = SMSRequestSerializer
+
+    async def handle(self, validated_data: Dict[str, Any]) -> Dict[str, Any]:
+        username_or_phone: str = validated_data['username_or_phone']
+        try:
+            user = await self.verify(username_or_phone, validated_data['sms_code'])
+        except serializers.ValidationError:
+            await get_login_events().asubmit(login_event(self.request, 'failed', login=username_or_phone))
+            raise
+
+        with stage('jwt_issue'):
+            tokens: Dict[str, str] = await TokenService.aissue_pair(user)
+        record_outcome('sms', 'ok')
+        await get_login_events().asubmit(login_event(self.request, 'ok', user, user.username))
+        return {
+            'detail': 'Успешная авторизация',
+            **tokens,
+        }
+
+    @staticmethod
+    async def verify(username_or_phone: str, sms_code: str) -> User:
+        otp_manager = AsyncOTPManager()
+        try:
+            with stage('otp_verify'):
+                is_valid_code: bool = await otp_manager.verify_otp(username_or_phone, sms_code)
+        except OTPSendError as e:
+            record_outcome('sms', 'expired_code')
+            raise serializers.ValidationError({'detail': str(e)})
+
+        if not is_valid_code:
+            record_outcome('sms', 'bad_code')
+            raise serializers.ValidationError({'detail': 'Введён неверный код.'})
+
+        with stage('user_lookup'):
+            user: Optional[User] = await UserService.aget_user_by_phone_or_name(username_or_phone)
+        if not user:
+            record_outcome('sms', 'user_not_found')
+            raise serializers.ValidationError({'detail': 'Не удалось найти данные пользователя. Попробуйте войти заново.'})
+        return user
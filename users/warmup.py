@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+import redis
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.db import DatabaseError, connection, connections
+
+from .bloom import get_user_bloom
+from .hashing import get_hashing_pool
+from .redis_client import get_redis_client
+from .signing import get_keyring
+
+
+logger = logging.getLogger(__name__)
+
+_state: Dict[str, Any] = {'preloaded': False, 'ready': False, 'warmup_seconds': None}
+_state_lock = threading.Lock()
+
+
+def preload() -> None:
+    # Выполняется до fork: только импорты и данные, которые воркеры разделят через copy-on-write.
+    from . import serializers, views  # noqa: F401
+
+    for validator in get_default_password_validators():
+        try:
+            validator.validate('warm-up-password-8d3f')
+        except Exception:
+            pass
+    get_hasher()
+    get_keyring().sign({'warmup': True})
+    # Если что-то всё же открыло соединение, воркеры не должны унаследовать общий сокет.
+    connections.close_all()
+    _state['preloaded'] = True
+
+
+def warm_up() -> None:
+    started = time.perf_counter()
+    if not _state['preloaded']:
+        preload()
+    # Запросы обслуживаются в других потоках, поэтому соединение только проверяем и закрываем.
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    connection.close()
+    try:
+        get_redis_client().ping()
+    except redis.RedisError as exc:
+        logger.warning('Redis is unavailable during warm-up: %s', exc)
+    get_user_bloom().refresh()
+    get_hashing_pool().warm_up()
+    with _state_lock:
+        _state['ready'] = True
+        _state['warmup_seconds'] = time.perf_counter() - started
+
+
+def mark_ready() -> None:
+    with _state_lock:
+        _state['ready'] = True
+
+
+def is_ready() -> bool:
+    return _state['ready']
+
+
+def get_warmup_state() -> Dict[str, Any]:
+    with _state_lock:
+        return dict(_state)
+
+
+def check_dependencies() -> Dict[str, bool]:
+    checks = {'database': True, 'redis': True}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        checks['database'] = False
+    try:
+        get_redis_client().ping()
+    except redis.RedisError:
+        checks['redis'] = False
+    return checks